@@ -0,0 +1,720 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlencode
+import asyncio
+import json
+import re
+import time
+
+from app_utils.storage import SQLiteStorage
+from app_utils.decoding import loads
+from core.http import HttpCachePolicy
+
+
+class DocumentCache(SQLiteStorage):
+    """
+    Постоянный кэш json документов сайтов по URL ресурса.
+
+    Для каждого типа документа задается свое время жизни. Устаревший документ
+    хранится еще max_stale секунд, чтобы отдать его, если сайт недоступен.
+    Когда общий размер кэша превышает max_size_bytes, удаляются документы,
+    которые дольше всех не запрашивались.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS documents (
+            url TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            body TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS documents_accessed_at
+            ON documents (accessed_at);
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: Dict[str, int],
+        max_size_bytes: int,
+        max_stale: int = 0,
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            path (Path): Путь до файла базы данных
+            ttl (Dict[str, int]): Время жизни документа в секундах по его типу
+            max_size_bytes (int): Максимальный размер кэша в байтах
+            max_stale (int, optional): Сколько секунд устаревший документ еще
+            можно отдать вместо ошибки сайта. По умолчанию 0
+        """
+        super().__init__(path=path)
+        self.ttl: Dict[str, int] = ttl
+        self.max_size_bytes: int = max_size_bytes
+        self.max_stale: int = max_stale
+
+    def get_sync(self, url: str, allow_stale: bool = False) -> Optional[Any]:
+        """
+        Возвращает документ из кэша или None если его нет или он устарел.
+
+        Args:
+            url (str): URL ресурса
+            allow_stale (bool, optional): Вернуть устаревший документ, если с
+            истечения его времени жизни прошло не больше max_stale секунд. По
+            умолчанию False
+
+        Returns:
+            Optional[Any]: Документ
+        """
+        rows = self.execute(
+            "SELECT kind, body, created_at FROM documents WHERE url = ?",
+            (url,),
+        )
+        if not rows:
+            return None
+
+        kind, body, created_at = rows[0]
+        now: float = time.time()
+        ttl: int = self.ttl.get(kind, 0)
+        if now - created_at > ttl + self.max_stale:
+            self.execute("DELETE FROM documents WHERE url = ?", (url,))
+            return None
+        if now - created_at > ttl and not allow_stale:
+            return None
+
+        self.execute(
+            "UPDATE documents SET accessed_at = ? WHERE url = ?",
+            (now, url),
+        )
+        return loads(body)
+
+    def set_sync(self, url: str, kind: str, document: Any) -> None:
+        """
+        Сохраняет документ в кэш и удаляет старые документы при переполнении.
+
+        Args:
+            url (str): URL ресурса
+            kind (str): Тип документа(определяет время жизни)
+            document (Any): Документ
+        """
+        body: str = json.dumps(document, ensure_ascii=False)
+        now: float = time.time()
+        self.execute(
+            "INSERT OR REPLACE INTO documents "
+            "(url, kind, body, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, kind, body, len(body), now, now),
+        )
+        # Удаляем давно не запрашиваемые документы сверх лимита размера
+        self.execute(
+            "DELETE FROM documents WHERE url IN ("
+            "SELECT url FROM (SELECT url, SUM(size) OVER "
+            "(ORDER BY accessed_at DESC) AS total FROM documents) "
+            "WHERE total > ?)",
+            (self.max_size_bytes,),
+        )
+
+    async def get(self, url: str, allow_stale: bool = False) -> Optional[Any]:
+        """Асинхронная версия get_sync."""
+        return await self.run(self.get_sync, url, allow_stale)
+
+    async def set(self, url: str, kind: str, document: Any) -> None:
+        """Асинхронная версия set_sync."""
+        await self.run(self.set_sync, url, kind, document)
+
+
+class SnapshotStore(SQLiteStorage):
+    """
+    Постоянное хранилище готовых результатов(снимков) по строковому ключу.
+
+    Используется для результатов, которые дорого вычислять и которые можно
+    отдавать пользователю сразу, пока они не устарели.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            key TEXT PRIMARY KEY,
+            body TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """
+
+    def get_sync(self, key: str, max_age: int) -> Optional[Any]:
+        """
+        Возвращает снимок или None если его нет или он старше max_age секунд.
+
+        Args:
+            key (str): Ключ снимка
+            max_age (int): Максимальный возраст снимка в секундах
+
+        Returns:
+            Optional[Any]: Снимок
+        """
+        rows = self.execute(
+            "SELECT body, created_at FROM snapshots WHERE key = ?",
+            (key,),
+        )
+        if not rows:
+            return None
+
+        body, created_at = rows[0]
+        if time.time() - created_at > max_age:
+            return None
+        return loads(body)
+
+    def set_sync(self, key: str, snapshot: Any) -> None:
+        """
+        Сохраняет снимок.
+
+        Args:
+            key (str): Ключ снимка
+            snapshot (Any): Снимок
+        """
+        self.execute(
+            "INSERT OR REPLACE INTO snapshots (key, body, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(snapshot, ensure_ascii=False), time.time()),
+        )
+
+    async def get(self, key: str, max_age: int) -> Optional[Any]:
+        """Асинхронная версия get_sync."""
+        return await self.run(self.get_sync, key, max_age)
+
+    async def set(self, key: str, snapshot: Any) -> None:
+        """Асинхронная версия set_sync."""
+        await self.run(self.set_sync, key, snapshot)
+
+
+class ResolutionMap(SQLiteStorage):
+    """
+    Постоянное соответствие одного числового идентификатора другому.
+
+    Хранит только пары идентификаторов без документов, поэтому занимает мало
+    места и не вытесняется вместе с кэшем документов.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS resolutions (
+            source INTEGER PRIMARY KEY,
+            target INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def get_sync(self, source: int) -> Optional[Tuple[int, float]]:
+        """
+        Возвращает идентификатор соответствия и возраст записи в секундах.
+
+        Args:
+            source (int): Исходный идентификатор
+
+        Returns:
+            Optional[Tuple[int, float]]: Идентификатор соответствия и возраст
+            записи или None если записи нет
+        """
+        rows = self.execute(
+            "SELECT target, updated_at FROM resolutions WHERE source = ?",
+            (source,),
+        )
+        if not rows:
+            return None
+
+        target, updated_at = rows[0]
+        return target, time.time() - updated_at
+
+    def set_sync(self, source: int, target: int) -> None:
+        """
+        Сохраняет соответствие идентификаторов.
+
+        Args:
+            source (int): Исходный идентификатор
+            target (int): Идентификатор соответствия
+        """
+        self.execute(
+            "INSERT OR REPLACE INTO resolutions (source, target, updated_at) "
+            "VALUES (?, ?, ?)",
+            (source, target, time.time()),
+        )
+
+    async def get(self, source: int) -> Optional[Tuple[int, float]]:
+        """Асинхронная версия get_sync."""
+        return await self.run(self.get_sync, source)
+
+    async def set(self, source: int, target: int) -> None:
+        """Асинхронная версия set_sync."""
+        await self.run(self.set_sync, source, target)
+
+
+class QueryCache:
+    """
+    Кэш результатов запросов по нормализованному тексту запроса.
+
+    Хранит последние max_items результатов в памяти(LRU) с временем жизни ttl.
+    Если передан disk - результаты дополнительно сохраняются в постоянный
+    DocumentCache и переживают перезапуск бота.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl: int,
+        disk: Optional[DocumentCache] = None,
+        kind: str = "query",
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            max_items (int): Максимальное количество результатов в памяти
+            ttl (int): Время жизни результата в памяти в секундах
+            disk (Optional[DocumentCache], optional): Постоянный уровень кэша.
+            По умолчанию None
+            kind (str, optional): Тип документов в постоянном кэше(определяет
+            время жизни на диске и префикс ключа). По умолчанию "query"
+        """
+        self.max_items: int = max_items
+        self.ttl: int = ttl
+        self.disk: Optional[DocumentCache] = disk
+        self.kind: str = kind
+        self._items: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        Приводит запрос к единому виду: без регистра, с одиночными пробелами и е вместо ё.
+
+        Args:
+            query (str): Текст запроса
+
+        Returns:
+            str: Нормализованный запрос
+        """
+        query = query.casefold().replace("ё", "е")
+        return re.sub(r"\s+", " ", query).strip()
+
+    def get_key(self, query: str, params: Tuple = ()) -> str:
+        """
+        Возвращает ключ результата по запросу и параметрам, от которых он зависит.
+
+        Args:
+            query (str): Текст запроса
+            params (Tuple, optional): Параметры запроса(например количество
+            результатов). По умолчанию ()
+
+        Returns:
+            str: Ключ результата
+        """
+        return "|".join([self.normalize(query), *map(str, params)])
+
+    async def get(self, query: str, params: Tuple = ()) -> Optional[Any]:
+        """
+        Возвращает результат запроса или None если его нет в кэше.
+
+        Args:
+            query (str): Текст запроса
+            params (Tuple, optional): Параметры запроса, от которых зависит
+            результат. По умолчанию ()
+
+        Returns:
+            Optional[Any]: Результат запроса
+        """
+        key: str = self.get_key(query, params)
+        item: Optional[Tuple[float, Any]] = self._items.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._items[key]
+
+        if self.disk is not None:
+            value = await self.disk.get(f"{self.kind}:{key}")
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, query: str, value: Any, params: Tuple = ()) -> None:
+        """
+        Сохраняет результат запроса.
+
+        Args:
+            query (str): Текст запроса
+            value (Any): Результат запроса
+            params (Tuple, optional): Параметры запроса, от которых зависит
+            результат. По умолчанию ()
+        """
+        key: str = self.get_key(query, params)
+        self._remember(key, value)
+        if self.disk is not None:
+            await self.disk.set(f"{self.kind}:{key}", self.kind, value)
+
+    def _remember(self, key: str, value: Any) -> None:
+        """Сохраняет результат в памяти и удаляет самые старые при переполнении."""
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Размер кэша в памяти, количество попаданий и промахов и доля попаданий."""
+        total: int = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+        }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Кэш в памяти, отдающий устаревшие значения сразу и обновляющий их в фоне.
+
+    Значение младше fresh_ttl отдается как есть. Значение младше stale_ttl
+    отдается сразу, а в фоне запускается его обновление. Более старое или
+    отсутствующее значение запрашивается, одновременные запросы одного ключа
+    объединяются в один.
+    """
+
+    def __init__(self, max_items: int, fresh_ttl: int, stale_ttl: int) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            max_items (int): Максимальное количество значений в кэше
+            fresh_ttl (int): Время в секундах, пока значение не требует обновления
+            stale_ttl (int): Время в секундах, пока значение можно отдавать
+        """
+        self.max_items: int = max_items
+        self.fresh_ttl: int = fresh_ttl
+        self.stale_ttl: int = stale_ttl
+        self._items: OrderedDict = OrderedDict()
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.misses: int = 0
+
+    async def get(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable],
+        is_valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Возвращает значение по ключу, запрашивая его через fetch при необходимости.
+
+        Args:
+            key (Hashable): Ключ значения
+            fetch (Callable[[], Awaitable]): Функция получения значения
+            is_valid (Optional[Callable[[Any], bool]], optional): Проверяет можно ли
+            сохранить полученное значение(например не является ли оно ошибкой).
+            По умолчанию сохраняются все значения кроме None
+
+        Returns:
+            Any: Значение
+        """
+        item: Optional[Tuple[float, Any]] = self._items.get(key)
+        if item is not None:
+            fetched_at, value = item
+            age: float = time.monotonic() - fetched_at
+            if age <= self.stale_ttl:
+                self._items.move_to_end(key)
+                if age <= self.fresh_ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._refresh(key=key, fetch=fetch, is_valid=is_valid)
+                return value
+            del self._items[key]
+
+        self.misses += 1
+        # Запрос продолжается даже если ожидающий его отменен - значение
+        # понадобится следующим пользователям
+        return await asyncio.shield(
+            self._refresh(key=key, fetch=fetch, is_valid=is_valid)
+        )
+
+    def _refresh(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable],
+        is_valid: Optional[Callable[[Any], bool]],
+    ) -> asyncio.Task:
+        """Запускает получение значения, если оно еще не запущено, и возвращает его задачу."""
+        task: Optional[asyncio.Task] = self._tasks.get(key)
+        if task is not None:
+            return task
+
+        async def update() -> Any:
+            try:
+                value: Any = await fetch()
+                valid: bool = is_valid(value) if is_valid else value is not None
+                if valid:
+                    self._items[key] = (time.monotonic(), value)
+                    self._items.move_to_end(key)
+                    while len(self._items) > self.max_items:
+                        self._items.popitem(last=False)
+                return value
+            finally:
+                self._tasks.pop(key, None)
+
+        task = asyncio.ensure_future(update())
+        # Ошибка фонового обновления не должна теряться молча
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._tasks[key] = task
+        return task
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Размер кэша, количество попаданий(свежих и устаревших) и промахов."""
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+
+@dataclass
+class CachedResponse:
+    """Сохраненный ответ сайта с валидаторами для условного запроса."""
+
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Заголовки условного запроса для проверки актуальности ответа."""
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache(SQLiteStorage):
+    """
+    Постоянный кэш тел ответов GET-запросов с валидаторами ETag и Last-Modified.
+
+    Кэшируются только URL, подходящие под одно из правил policies, время
+    свежести и хранения ответа задается правилом. Когда общий размер кэша
+    превышает max_size_bytes, удаляются ответы, которые дольше всех не
+    запрашивались.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed_at
+            ON responses (accessed_at);
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        policies: List[HttpCachePolicy],
+        max_size_bytes: int,
+        enabled: bool = True,
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            path (Path): Путь до файла базы данных
+            policies (List[HttpCachePolicy]): Правила кэширования, применяется
+            первое подходящее под URL
+            max_size_bytes (int): Максимальный размер кэша в байтах
+            enabled (bool, optional): Если False - ответы не кэшируются.
+            По умолчанию True
+        """
+        super().__init__(path=path)
+        self.enabled: bool = enabled
+        self.max_size_bytes: int = max_size_bytes
+        self.policies: List[Tuple[re.Pattern, HttpCachePolicy]] = [
+            (re.compile(policy.pattern), policy) for policy in policies
+        ]
+        self.hits: int = 0
+        self.revalidated: int = 0
+        self.stale_hits: int = 0
+        self.misses: int = 0
+
+    def get_policy(self, url: str) -> Optional[HttpCachePolicy]:
+        """
+        Возвращает правило кэширования для URL.
+
+        Args:
+            url (str): URL запроса
+
+        Returns:
+            Optional[HttpCachePolicy]: Правило или None, если URL не кэшируется
+        """
+        if not self.enabled:
+            return None
+        for pattern, policy in self.policies:
+            if pattern.search(url):
+                return policy
+        return None
+
+    @staticmethod
+    def get_key(url: str, params: Optional[Dict] = None) -> str:
+        """
+        Возвращает ключ ответа по URL и параметрам запроса.
+
+        Args:
+            url (str): URL запроса
+            params (Optional[Dict], optional): Параметры запроса. По умолчанию None
+
+        Returns:
+            str: Ключ ответа
+        """
+        if not params:
+            return url
+        query: str = urlencode(sorted(params.items()), doseq=True)
+        return f"{url}{'&' if '?' in url else '?'}{query}"
+
+    def get_sync(self, key: str, max_age: int) -> Optional[CachedResponse]:
+        """
+        Возвращает сохраненный ответ или None если его нет или он старше max_age.
+
+        Args:
+            key (str): Ключ ответа
+            max_age (int): Максимальный возраст ответа в секундах
+
+        Returns:
+            Optional[CachedResponse]: Сохраненный ответ
+        """
+        rows = self.execute(
+            "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+            (key,),
+        )
+        if not rows:
+            return None
+
+        body, etag, last_modified, stored_at = rows[0]
+        now: float = time.time()
+        if now - stored_at > max_age:
+            self.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+        self.execute(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            (now, key),
+        )
+        return CachedResponse(
+            body=bytes(body),
+            etag=etag,
+            last_modified=last_modified,
+            stored_at=stored_at,
+        )
+
+    def set_sync(
+        self,
+        key: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        """
+        Сохраняет ответ и удаляет старые ответы при переполнении.
+
+        Args:
+            key (str): Ключ ответа
+            body (bytes): Тело ответа
+            etag (Optional[str]): Заголовок ETag ответа
+            last_modified (Optional[str]): Заголовок Last-Modified ответа
+        """
+        now: float = time.time()
+        self.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, body, etag, last_modified, size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, body, etag, last_modified, len(body), now, now),
+        )
+        # Удаляем давно не запрашиваемые ответы сверх лимита размера
+        self.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER "
+            "(ORDER BY accessed_at DESC) AS total FROM responses) "
+            "WHERE total > ?)",
+            (self.max_size_bytes,),
+        )
+
+    def refresh_sync(
+        self,
+        key: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        """
+        Отмечает сохраненный ответ актуальным после ответа 304.
+
+        Args:
+            key (str): Ключ ответа
+            etag (Optional[str]): Новый ETag, если сайт его передал
+            last_modified (Optional[str]): Новый Last-Modified, если сайт его передал
+        """
+        now: float = time.time()
+        self.execute(
+            "UPDATE responses SET stored_at = ?, accessed_at = ?, "
+            "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+            "WHERE key = ?",
+            (now, now, etag, last_modified, key),
+        )
+
+    async def get(self, key: str, max_age: int) -> Optional[CachedResponse]:
+        """Асинхронная версия get_sync."""
+        return await self.run(self.get_sync, key, max_age)
+
+    async def set(
+        self,
+        key: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        """Асинхронная версия set_sync."""
+        await self.run(self.set_sync, key, body, etag, last_modified)
+
+    async def refresh(
+        self,
+        key: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        """Асинхронная версия refresh_sync."""
+        await self.run(self.refresh_sync, key, etag, last_modified)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Количество ответов без запроса, подтвержденных ответом 304, устаревших
+        ответов вместо ошибки сайта и загруженных заново."""
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
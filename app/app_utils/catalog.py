@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import time
+
+from app_utils.storage import SQLiteStorage
+from app_utils.decoding import loads
+
+
+def parse_rating_range(rating: str) -> Tuple[float, float]:
+    """
+    Возвращает границы диапазона рейтинга.
+
+    Args:
+        rating (str): Диапазон рейтинга в формате API(например "6-10" или "7")
+
+    Returns:
+        Tuple[float, float]: Нижняя и верхняя граница диапазона
+    """
+    low, _, high = str(rating).partition("-")
+    return float(low), float(high or low)
+
+
+class MovieCatalog(SQLiteStorage):
+    """
+    Локальный каталог фильмов с инвертированными индексами.
+
+    Каталог наполняется документами фильмов из ответов API. Фильмы ищутся по
+    жанру(таблица movie_genres - жанр -> фильмы), типу, году и рейтингу без
+    обращения к API.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            type TEXT,
+            year INTEGER,
+            rating REAL,
+            document TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS movie_genres (
+            genre TEXT NOT NULL,
+            movie_id INTEGER NOT NULL,
+            PRIMARY KEY (genre, movie_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS movies_type_rating ON movies (type, rating);
+        CREATE INDEX IF NOT EXISTS movies_year ON movies (year);
+        CREATE INDEX IF NOT EXISTS movie_genres_movie ON movie_genres (movie_id);
+    """
+
+    def add_sync(self, documents: List[Dict]) -> int:
+        """
+        Добавляет или обновляет документы фильмов в каталоге.
+
+        Документы без id пропускаются.
+
+        Args:
+            documents (List[Dict]): Документы фильмов из ответа API
+
+        Returns:
+            int: Количество сохраненных документов
+        """
+        now: float = time.time()
+        movies: List[Tuple] = []
+        genres: List[Tuple] = []
+        for document in documents:
+            movie_id: Optional[int] = document.get("id")
+            if movie_id is None:
+                continue
+            rating: Dict = document.get("rating") or {}
+            movies.append(
+                (
+                    movie_id,
+                    document.get("type"),
+                    document.get("year"),
+                    rating.get("kp"),
+                    json.dumps(document, ensure_ascii=False),
+                    now,
+                )
+            )
+            for genre in document.get("genres") or []:
+                if genre.get("name"):
+                    genres.append((genre.get("name"), movie_id))
+
+        if not movies:
+            return 0
+
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "DELETE FROM movie_genres WHERE movie_id = ?",
+                [(movie[0],) for movie in movies],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO movies "
+                "(id, type, year, rating, document, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                movies,
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO movie_genres (genre, movie_id) VALUES (?, ?)",
+                genres,
+            )
+            connection.commit()
+        return len(movies)
+
+    def _where(
+        self,
+        genres: List[str],
+        type_video: Optional[str],
+        rating: Optional[str],
+        years: Optional[Tuple[int, int]],
+        max_age: Optional[int],
+    ) -> Tuple[str, List]:
+        """Возвращает условие выборки фильмов и его параметры."""
+        conditions: List[str] = []
+        parameters: List = []
+        if genres:
+            conditions.append(
+                "m.id IN (SELECT movie_id FROM movie_genres WHERE genre IN "
+                f"({', '.join('?' for _ in genres)}))"
+            )
+            parameters.extend(genres)
+        if type_video:
+            conditions.append("m.type = ?")
+            parameters.append(type_video)
+        if rating:
+            conditions.append("m.rating BETWEEN ? AND ?")
+            parameters.extend(parse_rating_range(rating))
+        if years:
+            conditions.append("m.year BETWEEN ? AND ?")
+            parameters.extend(years)
+        if max_age is not None:
+            conditions.append("m.updated_at >= ?")
+            parameters.append(time.time() - max_age)
+        return " AND ".join(conditions) or "1", parameters
+
+    def find_sync(
+        self,
+        genres: List[str],
+        type_video: Optional[str] = None,
+        rating: Optional[str] = None,
+        years: Optional[Tuple[int, int]] = None,
+        max_age: Optional[int] = None,
+        limit: int = 250,
+    ) -> List[Dict]:
+        """
+        Возвращает случайные фильмы каталога, подходящие под условия.
+
+        Args:
+            genres (List[str]): Жанры - фильм должен иметь хотя бы один из них
+            type_video (Optional[str], optional): Тип видео. По умолчанию None
+            rating (Optional[str], optional): Диапазон рейтинга кинопоиска
+            (например "6-10"). По умолчанию None
+            years (Optional[Tuple[int, int]], optional): Диапазон годов выхода.
+            По умолчанию None
+            max_age (Optional[int], optional): Максимальный возраст документа в
+            секундах. По умолчанию None - любой
+            limit (int, optional): Максимальное количество фильмов. По умолчанию 250
+
+        Returns:
+            List[Dict]: Документы фильмов
+        """
+        where, parameters = self._where(genres, type_video, rating, years, max_age)
+        rows = self.execute(
+            f"SELECT m.document FROM movies m WHERE {where} "
+            "ORDER BY random() LIMIT ?",
+            tuple(parameters) + (limit,),
+        )
+        return [loads(document) for document, in rows]
+
+    def count_sync(
+        self,
+        genres: List[str],
+        type_video: Optional[str] = None,
+        rating: Optional[str] = None,
+        years: Optional[Tuple[int, int]] = None,
+        max_age: Optional[int] = None,
+    ) -> int:
+        """
+        Возвращает количество фильмов каталога, подходящих под условия find_sync.
+
+        Returns:
+            int: Количество фильмов
+        """
+        where, parameters = self._where(genres, type_video, rating, years, max_age)
+        rows = self.execute(
+            f"SELECT COUNT(*) FROM movies m WHERE {where}",
+            tuple(parameters),
+        )
+        return rows[0][0]
+
+    async def add(self, documents: List[Dict]) -> int:
+        """Асинхронная версия add_sync."""
+        return await self.run(self.add_sync, documents)
+
+    async def find(
+        self,
+        genres: List[str],
+        type_video: Optional[str] = None,
+        rating: Optional[str] = None,
+        years: Optional[Tuple[int, int]] = None,
+        max_age: Optional[int] = None,
+        limit: int = 250,
+    ) -> List[Dict]:
+        """Асинхронная версия find_sync."""
+        return await self.run(
+            self.find_sync, genres, type_video, rating, years, max_age, limit
+        )
+
+    async def count(
+        self,
+        genres: List[str],
+        type_video: Optional[str] = None,
+        rating: Optional[str] = None,
+        years: Optional[Tuple[int, int]] = None,
+        max_age: Optional[int] = None,
+    ) -> int:
+        """Асинхронная версия count_sync."""
+        return await self.run(
+            self.count_sync, genres, type_video, rating, years, max_age
+        )
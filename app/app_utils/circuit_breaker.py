@@ -0,0 +1,190 @@
+from typing import Deque, Dict, Optional, Tuple
+from collections import deque
+from logging import Logger
+from urllib.parse import urlsplit
+import time
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель запросов к одному хосту.
+
+    closed - запросы идут, результаты последних запросов запоминаются. Если
+    среди них доля ошибок и слишком медленных ответов достигает
+    failure_rate, выключатель переходит в open.
+    open - запросы сразу отклоняются open_seconds секунд, затем half-open.
+    half-open - пропускается half_open_calls пробных запросов. Успех пробного
+    запроса возвращает closed, ошибка - снова open.
+    """
+
+    CLOSED: str = "closed"
+    OPEN: str = "open"
+    HALF_OPEN: str = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_size: int = 20,
+        window_seconds: float = 60,
+        slow_call_seconds: float = 10,
+        open_seconds: float = 30,
+        half_open_calls: int = 1,
+        logger: Optional[Logger] = None,
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            name (str): Имя выключателя(хост) для логов
+            failure_rate (float, optional): Доля неудачных запросов для
+            перехода в open. По умолчанию 0.5
+            min_calls (int, optional): Минимальное количество запросов в окне для
+            оценки доли ошибок. По умолчанию 5
+            window_size (int, optional): Количество последних запросов в окне.
+            По умолчанию 20
+            window_seconds (float, optional): Запросы старше этого времени в
+            секундах не учитываются. По умолчанию 60
+            slow_call_seconds (float, optional): Успешный запрос дольше этого
+            времени считается неудачным. По умолчанию 10
+            open_seconds (float, optional): Время в состоянии open в секундах.
+            По умолчанию 30
+            half_open_calls (int, optional): Количество одновременных пробных
+            запросов в half-open. По умолчанию 1
+            logger (Optional[Logger], optional): Логгер смены состояний.
+            По умолчанию None
+        """
+        self.name: str = name
+        self.failure_rate: float = failure_rate
+        self.min_calls: int = min_calls
+        self.window_seconds: float = window_seconds
+        self.slow_call_seconds: float = slow_call_seconds
+        self.open_seconds: float = open_seconds
+        self.half_open_calls: int = half_open_calls
+        self.logger: Optional[Logger] = logger
+
+        self._state: str = self.CLOSED
+        self._opened_at: float = 0.0
+        self._probes: int = 0
+        # Результаты последних запросов: (время, был ли запрос неудачным)
+        self._calls: Deque[Tuple[float, bool]] = deque(maxlen=window_size)
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние выключателя."""
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.open_seconds
+        ):
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        """Меняет состояние выключателя и пишет смену в лог."""
+        if state == self._state:
+            return
+        if self.logger:
+            self.logger.warning(
+                f"Выключатель запросов {self.name}: {self._state} -> {state}"
+            )
+        self._state = state
+        self._probes = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == self.CLOSED:
+            self._calls.clear()
+
+    def allow(self) -> bool:
+        """
+        Проверяет можно ли выполнить запрос и занимает место пробного запроса в half-open.
+
+        Returns:
+            bool: True если запрос можно выполнять
+        """
+        state: str = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """Освобождает место пробного запроса, если запрос был отменен."""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, failed: bool, duration: float) -> None:
+        """
+        Учитывает результат запроса.
+
+        Args:
+            failed (bool): Запрос завершился ошибкой сети или сервера
+            duration (float): Длительность запроса в секундах
+        """
+        failed = failed or duration >= self.slow_call_seconds
+        if self._state == self.HALF_OPEN:
+            self._set_state(self.OPEN if failed else self.CLOSED)
+            return
+
+        now: float = time.monotonic()
+        self._calls.append((now, failed))
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+        if self._state == self.CLOSED and len(self._calls) >= self.min_calls:
+            failures: int = sum(1 for _, call_failed in self._calls if call_failed)
+            if failures / len(self._calls) >= self.failure_rate:
+                self._set_state(self.OPEN)
+
+    @property
+    def stats(self) -> Dict:
+        """Состояние выключателя для мониторинга."""
+        failures: int = sum(1 for _, call_failed in self._calls if call_failed)
+        return {
+            "state": self.state,
+            "calls": len(self._calls),
+            "failures": failures,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Выключатели запросов, создаваемые для каждого хоста при первом запросе."""
+
+    def __init__(self, enabled: bool = True, **settings) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            enabled (bool, optional): Если False - запросы не ограничиваются.
+            По умолчанию True
+            settings: Параметры CircuitBreaker для всех хостов
+        """
+        self.enabled: bool = enabled
+        self.settings: Dict = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> Optional[CircuitBreaker]:
+        """
+        Возвращает выключатель хоста из url.
+
+        Args:
+            url (str): URL запроса
+
+        Returns:
+            Optional[CircuitBreaker]: Выключатель или None, если выключатели отключены
+        """
+        if not self.enabled:
+            return None
+        host: str = urlsplit(url).netloc
+        breaker: Optional[CircuitBreaker] = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(name=host, **self.settings)
+            self._breakers[host] = breaker
+        return breaker
+
+    @property
+    def stats(self) -> Dict[str, Dict]:
+        """Состояние выключателей всех хостов для мониторинга."""
+        return {host: breaker.stats for host, breaker in self._breakers.items()}
@@ -0,0 +1,64 @@
+from typing import Any, Dict, Optional, Union
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен - без него используется json
+    orjson = None
+
+
+def loads(body: Union[bytes, str]) -> Any:
+    """
+    Разбирает json быстрым декодером orjson, если он установлен.
+
+    Args:
+        body (Union[bytes, str]): Текст json
+
+    Returns:
+        Any: Разобранный документ
+
+    Raises:
+        ValueError: body не является json
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def project(document: Any, schema: Optional[Dict]) -> Any:
+    """
+    Оставляет в документе только поля из схемы.
+
+    Схема - словарь поле -> вложенная схема. None вместо вложенной схемы
+    оставляет значение поля целиком. Для списков схема применяется к каждому
+    элементу, пустая схема {} оставляет от элемента пустой словарь(например,
+    чтобы сохранить только количество элементов). Отсутствующие в документе
+    поля не добавляются.
+
+    Проекция выполняется после полного разбора и добавляет время на обход
+    документа. Она не ускоряет разбор, а уменьшает память, которую документ
+    занимает в кэшах, каталоге и состоянии пользователя.
+
+    Args:
+        document (Any): Разобранный json документ
+        schema (Optional[Dict]): Схема полей. None - документ не меняется
+
+    Returns:
+        Any: Документ только с полями из схемы
+    """
+    if schema is None:
+        return document
+    if isinstance(document, list):
+        return [project(item, schema) for item in document]
+    if not isinstance(document, dict):
+        return document
+
+    result: Dict = {}
+    for field, field_schema in schema.items():
+        if field in document:
+            value: Any = document[field]
+            # Поля без вложенной схемы копируются без рекурсивного вызова
+            result[field] = (
+                value if field_schema is None else project(value, field_schema)
+            )
+    return result
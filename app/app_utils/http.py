@@ -0,0 +1,55 @@
+from typing import Dict, Optional
+
+import aiohttp
+
+from core.http import HttpClientSettings
+
+
+def get_client_timeout(settings: HttpClientSettings) -> aiohttp.ClientTimeout:
+    """
+    Возвращает таймауты запросов сессии по настройкам клиента.
+
+    Args:
+        settings (HttpClientSettings): Настройки клиента
+
+    Returns:
+        aiohttp.ClientTimeout: Таймауты запроса
+    """
+    return aiohttp.ClientTimeout(
+        total=settings.total_timeout,
+        connect=settings.connect_timeout,
+        sock_read=settings.read_timeout,
+    )
+
+
+def create_client_session(
+    settings: HttpClientSettings,
+    headers: Optional[Dict] = None,
+) -> aiohttp.ClientSession:
+    """
+    Создает сессию с пулом соединений по настройкам сервиса.
+
+    Сессия должна создаваться внутри работающего event loop и закрываться
+    после работы(async with).
+
+    Args:
+        settings (HttpClientSettings): Настройки пула соединений и таймаутов
+        headers (Optional[Dict], optional): Заголовки всех запросов сессии.
+        По умолчанию None
+
+    Returns:
+        aiohttp.ClientSession: Сессия для запросов
+    """
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+        limit=settings.limit,
+        limit_per_host=settings.limit_per_host,
+        keepalive_timeout=settings.keepalive_timeout,
+        use_dns_cache=settings.use_dns_cache,
+        ttl_dns_cache=settings.ttl_dns_cache,
+        happy_eyeballs_delay=settings.happy_eyeballs_delay,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=get_client_timeout(settings),
+        headers=headers,
+    )
@@ -0,0 +1,259 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import time
+
+from app_utils.storage import SQLiteStorage
+
+
+class JobStore(SQLiteStorage):
+    """
+    Постоянное хранилище незавершенных фоновых задач.
+
+    Для каждой задачи хранится ее курсор(state) и список чатов, ожидающих
+    результат, чтобы после перезапуска бота продолжить задачу и отправить
+    результат пользователям.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            key TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            chats TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def get_sync(self, key: str, max_age: int) -> Optional[Dict]:
+        """
+        Возвращает курсор задачи или None если задачи нет или она старше max_age секунд.
+
+        Args:
+            key (str): Ключ задачи
+            max_age (int): Максимальный возраст задачи в секундах
+
+        Returns:
+            Optional[Dict]: Курсор задачи
+        """
+        rows = self.execute(
+            "SELECT state, updated_at FROM jobs WHERE key = ?",
+            (key,),
+        )
+        if not rows:
+            return None
+
+        state, updated_at = rows[0]
+        if time.time() - updated_at > max_age:
+            return None
+        return json.loads(state)
+
+    def save_sync(self, key: str, state: Dict) -> None:
+        """
+        Сохраняет курсор задачи, не изменяя список ожидающих чатов.
+
+        Args:
+            key (str): Ключ задачи
+            state (Dict): Курсор задачи
+        """
+        self.execute(
+            "INSERT INTO jobs (key, state, chats, updated_at) VALUES (?, ?, '[]', ?) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+            "updated_at = excluded.updated_at",
+            (key, json.dumps(state, ensure_ascii=False), time.time()),
+        )
+
+    def add_chat_sync(self, key: str, chat_id: int, user_id: int) -> None:
+        """
+        Добавляет чат в список ожидающих результат задачи.
+
+        Args:
+            key (str): Ключ задачи
+            chat_id (int): id чата
+            user_id (int): id пользователя
+        """
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                "SELECT chats FROM jobs WHERE key = ?", (key,)
+            ).fetchall()
+            chats: List = json.loads(rows[0][0]) if rows else []
+            if [chat_id, user_id] not in chats:
+                chats.append([chat_id, user_id])
+            connection.execute(
+                "INSERT INTO jobs (key, state, chats, updated_at) VALUES (?, '{}', ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET chats = excluded.chats",
+                (key, json.dumps(chats), time.time()),
+            )
+            connection.commit()
+
+    def remove_chat_sync(self, key: str, chat_id: int) -> None:
+        """
+        Удаляет чат из списка ожидающих результат задачи.
+
+        Args:
+            key (str): Ключ задачи
+            chat_id (int): id чата
+        """
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                "SELECT chats FROM jobs WHERE key = ?", (key,)
+            ).fetchall()
+            if not rows:
+                return
+            chats: List = [chat for chat in json.loads(rows[0][0]) if chat[0] != chat_id]
+            connection.execute(
+                "UPDATE jobs SET chats = ? WHERE key = ?",
+                (json.dumps(chats), key),
+            )
+            connection.commit()
+
+    def delete_sync(self, key: str) -> None:
+        """
+        Удаляет задачу.
+
+        Args:
+            key (str): Ключ задачи
+        """
+        self.execute("DELETE FROM jobs WHERE key = ?", (key,))
+
+    def pending_sync(self, max_age: int) -> List[Tuple[str, Dict, List]]:
+        """
+        Возвращает задачи, результат которых ждет хотя бы один чат.
+
+        Задачи старше max_age секунд удаляются.
+
+        Args:
+            max_age (int): Максимальный возраст задачи в секундах
+
+        Returns:
+            List[Tuple[str, Dict, List]]: Ключ, курсор и список [chat_id, user_id]
+        """
+        self.execute(
+            "DELETE FROM jobs WHERE updated_at < ?",
+            (time.time() - max_age,),
+        )
+        rows = self.execute("SELECT key, state, chats FROM jobs WHERE chats != '[]'")
+        return [(key, json.loads(state), json.loads(chats)) for key, state, chats in rows]
+
+    async def get(self, key: str, max_age: int) -> Optional[Dict]:
+        """Асинхронная версия get_sync."""
+        return await self.run(self.get_sync, key, max_age)
+
+    async def save(self, key: str, state: Dict) -> None:
+        """Асинхронная версия save_sync."""
+        await self.run(self.save_sync, key, state)
+
+    async def add_chat(self, key: str, chat_id: int, user_id: int) -> None:
+        """Асинхронная версия add_chat_sync."""
+        await self.run(self.add_chat_sync, key, chat_id, user_id)
+
+    async def remove_chat(self, key: str, chat_id: int) -> None:
+        """Асинхронная версия remove_chat_sync."""
+        await self.run(self.remove_chat_sync, key, chat_id)
+
+    async def delete(self, key: str) -> None:
+        """Асинхронная версия delete_sync."""
+        await self.run(self.delete_sync, key)
+
+    async def pending(self, max_age: int) -> List[Tuple[str, Dict, List]]:
+        """Асинхронная версия pending_sync."""
+        return await self.run(self.pending_sync, max_age)
+
+
+class CrawlCheckpoint:
+    """
+    Курсор обхода, сохраняемый в JobStore.
+
+    Хранит параметры обхода(params), результаты поиска(results), индексы уже
+    обработанных результатов(processed) и собранные элементы(items).
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        key: str,
+        params: Optional[Dict] = None,
+        state: Optional[Dict] = None,
+        save_every: int = 5,
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            store (JobStore): Хранилище задач
+            key (str): Ключ задачи
+            params (Optional[Dict], optional): Параметры обхода, нужные для его
+            продолжения после перезапуска. По умолчанию None
+            state (Optional[Dict], optional): Сохраненный курсор. По умолчанию None
+            save_every (int, optional): Сохранять курсор после каждых
+            save_every обработанных результатов. По умолчанию 5
+        """
+        state = state or {}
+        self.store: JobStore = store
+        self.key: str = key
+        self.params: Dict = params or state.get("params", {})
+        self.results: Optional[List] = state.get("results")
+        self.processed: set = set(state.get("processed", []))
+        self.items: List = state.get("items", [])
+        self.save_every: int = save_every
+        self._unsaved: int = 0
+
+    @classmethod
+    async def load(
+        cls,
+        store: JobStore,
+        key: str,
+        params: Dict,
+        max_age: int,
+        save_every: int = 5,
+    ) -> "CrawlCheckpoint":
+        """
+        Возвращает сохраненный курсор задачи или новый, если сохраненного нет.
+
+        Args:
+            store (JobStore): Хранилище задач
+            key (str): Ключ задачи
+            params (Dict): Параметры обхода
+            max_age (int): Максимальный возраст сохраненного курсора в секундах
+            save_every (int, optional): Частота сохранения курсора. По умолчанию 5
+
+        Returns:
+            CrawlCheckpoint: Курсор обхода
+        """
+        state: Optional[Dict] = await store.get(key, max_age)
+        return cls(
+            store=store,
+            key=key,
+            params=params,
+            state=state,
+            save_every=save_every,
+        )
+
+    async def save(self) -> None:
+        """Сохраняет курсор в хранилище."""
+        self._unsaved = 0
+        await self.store.save(
+            self.key,
+            {
+                "params": self.params,
+                "results": self.results,
+                "processed": sorted(self.processed),
+                "items": list(self.items),
+            },
+        )
+
+    async def add(self, index: int, item: Any = None) -> None:
+        """
+        Отмечает результат обработанным и сохраняет курсор каждые save_every результатов.
+
+        Args:
+            index (int): Индекс обработанного результата
+            item (Any, optional): Собранный элемент. По умолчанию None
+        """
+        self.processed.add(index)
+        if item is not None:
+            self.items.append(item)
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            await self.save()
@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+import hashlib
+
+from app_utils.storage import SQLiteStorage
+
+
+class ApiKeyPool(SQLiteStorage):
+    """
+    Пул ключей API с дневной квотой на каждый ключ.
+
+    Запросы распределяются на наименее использованный за текущие сутки ключ.
+    Счетчики использования хранятся в sqlite, чтобы квота учитывалась и после
+    перезапуска бота. Вместо самих ключей хранятся их хэши.
+    """
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS key_usage (
+            key_hash TEXT PRIMARY KEY,
+            period TEXT NOT NULL,
+            used INTEGER NOT NULL,
+            exhausted INTEGER NOT NULL
+        );
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        keys: List[str],
+        daily_quota: int,
+        reset_utc_offset: int = 0,
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            path (Path): Путь до файла базы данных
+            keys (List[str]): Ключи API
+            daily_quota (int): Количество запросов на один ключ в сутки
+            reset_utc_offset (int, optional): Смещение от UTC в часах часового
+            пояса, в полночь которого квота сбрасывается. По умолчанию 0
+        """
+        super().__init__(path=path)
+        self.keys: List[str] = list(dict.fromkeys(key for key in keys if key))
+        self.daily_quota: int = daily_quota
+        self.reset_timezone: timezone = timezone(timedelta(hours=reset_utc_offset))
+        self._period: Optional[str] = None
+        self._used: Dict[str, int] = {}
+        self._exhausted: set = set()
+
+    @staticmethod
+    def get_hash(key: str) -> str:
+        """Возвращает хэш ключа для хранения в базе данных."""
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get_period(self) -> str:
+        """Возвращает текущие сутки квоты в формате YYYY-MM-DD."""
+        return datetime.now(self.reset_timezone).strftime("%Y-%m-%d")
+
+    def load_sync(self, period: str) -> Dict[str, tuple]:
+        """
+        Возвращает сохраненные счетчики ключей за сутки period.
+
+        Args:
+            period (str): Сутки квоты
+
+        Returns:
+            Dict[str, tuple]: Хэш ключа -> (количество запросов, исчерпан ли ключ)
+        """
+        rows = self.execute(
+            "SELECT key_hash, used, exhausted FROM key_usage WHERE period = ?",
+            (period,),
+        )
+        return {key_hash: (used, bool(exhausted)) for key_hash, used, exhausted in rows}
+
+    def save_sync(self, key: str, period: str, used: int, exhausted: bool) -> None:
+        """
+        Сохраняет счетчик ключа за сутки period.
+
+        Сохранения выполняются в executor и могут прийти не по порядку, поэтому
+        в пределах одних суток счетчик только увеличивается.
+
+        Args:
+            key (str): Ключ API
+            period (str): Сутки квоты
+            used (int): Количество запросов по ключу
+            exhausted (bool): Исчерпан ли ключ
+        """
+        self.execute(
+            "INSERT INTO key_usage (key_hash, period, used, exhausted) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT(key_hash) DO UPDATE SET "
+            "used = CASE WHEN period = excluded.period "
+            "THEN MAX(used, excluded.used) ELSE excluded.used END, "
+            "exhausted = CASE WHEN period = excluded.period "
+            "THEN MAX(exhausted, excluded.exhausted) ELSE excluded.exhausted END, "
+            "period = excluded.period",
+            (self.get_hash(key), period, used, int(exhausted)),
+        )
+
+    async def _save(self, key: str) -> None:
+        """Сохраняет текущий счетчик ключа."""
+        await self.run(
+            self.save_sync,
+            key,
+            self._period,
+            self._used.get(key, 0),
+            key in self._exhausted,
+        )
+
+    async def _refresh(self) -> None:
+        """Загружает счетчики при первом обращении и сбрасывает их в новые сутки."""
+        period: str = self.get_period()
+        if period == self._period:
+            return
+
+        saved: Dict[str, tuple] = await self.run(self.load_sync, period)
+        # Пока счетчики загружались, их мог загрузить другой запрос
+        if period == self._period:
+            return
+        self._period = period
+        self._used = {}
+        self._exhausted = set()
+        for key in self.keys:
+            used, exhausted = saved.get(self.get_hash(key), (0, False))
+            self._used[key] = used
+            if exhausted or used >= self.daily_quota:
+                self._exhausted.add(key)
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Возвращает наименее использованный ключ и учитывает запрос по нему.
+
+        Returns:
+            Optional[str]: Ключ API или None, если квота всех ключей исчерпана
+        """
+        await self._refresh()
+        available: List[str] = [key for key in self.keys if key not in self._exhausted]
+        if not available:
+            return None
+
+        key: str = min(available, key=lambda key: self._used[key])
+        self._used[key] += 1
+        if self._used[key] >= self.daily_quota:
+            self._exhausted.add(key)
+        await self._save(key)
+        return key
+
+    async def mark_exhausted(self, key: str) -> None:
+        """
+        Отмечает ключ исчерпанным до конца текущих суток.
+
+        Args:
+            key (str): Ключ API
+        """
+        await self._refresh()
+        self._exhausted.add(key)
+        await self._save(key)
+
+    @property
+    def stats(self) -> Dict:
+        """Статистика пула: количество ключей, исчерпанных ключей и запросов за сутки."""
+        return {
+            "keys": len(self.keys),
+            "exhausted": len(self._exhausted),
+            "used": sum(self._used.values()),
+            "period": self._period,
+        }
@@ -0,0 +1,208 @@
+from typing import Optional, Dict
+from dataclasses import dataclass
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket для ограничения количества запросов к API.
+
+    Один экземпляр разделяется всеми пользователями бота, поэтому квота сайта
+    распределяется между ними по очереди обращения, а не через фиксированные паузы.
+    """
+
+    def __init__(self, rate_per_minute: int, capacity: Optional[int] = None) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            rate_per_minute (int): Количество токенов, восстанавливаемых за минуту
+            capacity (Optional[int], optional): Максимальный запас токенов(размер всплеска).
+            По умолчанию равен rate_per_minute
+        """
+        self.rate_per_minute: int = rate_per_minute
+        self.capacity: int = capacity or rate_per_minute
+        self._tokens: float = float(self.capacity)
+        self._updated_at: float = time.monotonic()
+        # Всего начислено токенов - по нему ожидающие запросы проверяют, что
+        # подошла их очередь
+        self._credited: float = 0.0
+        # До этого момента(time.monotonic) токены не начисляются и не выдаются
+        self._paused_until: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Скорость восстановления токенов в секунду."""
+        return self.rate_per_minute / 60
+
+    @property
+    def tokens(self) -> float:
+        """Текущее количество доступных токенов."""
+        self._refill()
+        return self._tokens
+
+    def _refill(self) -> None:
+        """Пополняет запас токенов за прошедшее время без учета паузы."""
+        now: float = time.monotonic()
+        started_at: float = max(self._updated_at, self._paused_until)
+        if now > started_at:
+            tokens: float = min(
+                float(self.capacity),
+                self._tokens + (now - started_at) * self.rate,
+            )
+            self._credited += max(0.0, tokens - self._tokens)
+            self._tokens = tokens
+        self._updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает начисление и выдачу токенов.
+
+        Args:
+            seconds (float): Длительность паузы в секундах
+        """
+        self._refill()
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Ожидает пока в хранилище появятся токены и забирает их.
+
+        Токен резервируется сразу, поэтому одновременные вызовы обслуживаются
+        в порядке обращения. Скорость и пауза могут измениться, пока запрос
+        ждет, поэтому после пробуждения очередь проверяется заново. При отмене
+        ожидания токены возвращаются в хранилище.
+
+        Args:
+            tokens (int, optional): Количество токенов для запроса. По умолчанию 1
+        """
+        self._refill()
+        self._tokens -= tokens
+        # Очередь запроса подойдет, когда будет начислен его долг
+        target: float = self._credited - min(self._tokens, 0.0)
+
+        try:
+            while True:
+                delay: float = max(
+                    self._paused_until - time.monotonic(),
+                    (target - self._credited) / self.rate,
+                )
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+                self._refill()
+        except asyncio.CancelledError:
+            self._tokens += tokens
+            raise
+
+
+@dataclass
+class RateLimitBudget:
+    """Текущее состояние квоты сайта по данным заголовков ответа."""
+
+    limit: Optional[int] = None
+    used: Optional[int] = None
+    remaining: Optional[int] = None
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket, подстраивающий темп запросов под заголовки квоты сайта.
+
+    Пока квоты много - работает на максимальной скорости, по мере расходования
+    квоты плавно снижает скорость до min_rate_per_minute. При ответе 429
+    приостанавливает выдачу токенов.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: int,
+        capacity: Optional[int] = None,
+        min_rate_per_minute: int = 5,
+        slowdown_threshold: float = 0.5,
+        limit_header: str = "X-Discogs-Ratelimit",
+        used_header: str = "X-Discogs-Ratelimit-Used",
+        remaining_header: str = "X-Discogs-Ratelimit-Remaining",
+    ) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            rate_per_minute (int): Максимальное количество запросов в минуту
+            capacity (Optional[int], optional): Максимальный запас токенов(размер всплеска).
+            По умолчанию равен rate_per_minute
+            min_rate_per_minute (int, optional): Минимальная скорость при почти
+            израсходованной квоте. По умолчанию 5
+            slowdown_threshold (float, optional): Доля оставшейся квоты, ниже которой
+            начинается замедление. По умолчанию 0.5
+            limit_header (str, optional): Заголовок с размером квоты
+            used_header (str, optional): Заголовок с израсходованной квотой
+            remaining_header (str, optional): Заголовок с оставшейся квотой
+        """
+        super().__init__(rate_per_minute=rate_per_minute, capacity=capacity)
+        self.max_rate_per_minute: int = rate_per_minute
+        self.min_rate_per_minute: int = min_rate_per_minute
+        self.slowdown_threshold: float = slowdown_threshold
+        self.limit_header: str = limit_header.lower()
+        self.used_header: str = used_header.lower()
+        self.remaining_header: str = remaining_header.lower()
+        self.budget: RateLimitBudget = RateLimitBudget()
+
+    def update_from_headers(self, headers: Optional[Dict]) -> RateLimitBudget:
+        """
+        Обновляет скорость выдачи токенов по заголовкам квоты из ответа сайта.
+
+        Args:
+            headers (Optional[Dict]): Заголовки ответа
+
+        Returns:
+            RateLimitBudget: Текущее состояние квоты
+        """
+        if not headers:
+            return self.budget
+
+        headers = {key.lower(): value for key, value in headers.items()}
+        try:
+            limit: int = int(headers[self.limit_header])
+            remaining: int = int(headers[self.remaining_header])
+            used: int = int(headers.get(self.used_header, limit - remaining))
+        except (KeyError, TypeError, ValueError):
+            return self.budget
+
+        self.budget = RateLimitBudget(limit=limit, used=used, remaining=remaining)
+        if limit <= 0:
+            return self.budget
+
+        # Не превышаем квоту сайта, даже если в настройках указано больше
+        max_rate: int = min(self.max_rate_per_minute, limit)
+        ratio: float = remaining / limit
+        if ratio >= self.slowdown_threshold:
+            rate: float = max_rate
+        else:
+            # Плавно снижаем скорость пропорционально оставшейся квоте
+            rate = self.min_rate_per_minute + (
+                max_rate - self.min_rate_per_minute
+            ) * (ratio / self.slowdown_threshold)
+
+        self._refill()
+        self.rate_per_minute = max(self.min_rate_per_minute, rate)
+        # Нельзя потратить больше токенов чем осталось в квоте сайта
+        self._tokens = min(self._tokens, float(remaining))
+        return self.budget
+
+    def on_too_many_requests(self, retry_after: float) -> None:
+        """
+        Приостанавливает выдачу токенов после ответа 429.
+
+        Args:
+            retry_after (float): Пауза в секундах перед следующим запросом
+        """
+        self.pause(retry_after)
+        self.rate_per_minute = self.min_rate_per_minute
+        self._tokens = min(self._tokens, 0.0)
+        self.budget = RateLimitBudget(
+            limit=self.budget.limit,
+            used=self.budget.limit,
+            remaining=0,
+        )
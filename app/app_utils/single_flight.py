@@ -0,0 +1,117 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+import asyncio
+
+
+class Flight:
+    """
+    Выполняемая задача, к которой могут присоединяться несколько подписчиков.
+
+    Подписчики получают общий прогресс(progress), общий поток промежуточных
+    результатов(items) и общий результат задачи.
+    """
+
+    def __init__(self, key: Hashable) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            key (Hashable): Ключ задачи
+        """
+        self.key: Hashable = key
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: int = 0
+        self.progress: int = 0
+        self.items: List = []
+
+    async def update_progress(self, data_state: Optional[int] = None) -> bool:
+        """
+        Функция прогресса для задачи.
+
+        Сохраняет data_state как общий прогресс. Возвращает False когда
+        не осталось ни одного подписчика, чтобы задача могла завершиться.
+        """
+        if data_state is not None:
+            self.progress = data_state
+        return self.subscribers > 0
+
+    def add_item(self, item: Any) -> None:
+        """Добавляет промежуточный результат задачи, доступный всем подписчикам."""
+        self.items.append(item)
+
+
+class SingleFlight:
+    """
+    Объединяет одинаковые одновременные задачи в одну.
+
+    Первый вызов subscribe с ключом запускает задачу, следующие вызовы с тем же
+    ключом присоединяются к ней. Задача отменяется только когда от нее
+    отписались все подписчики.
+    """
+
+    def __init__(self) -> None:
+        """Инициализация параметров."""
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def subscribe(
+        self,
+        key: Hashable,
+        factory: Callable[[Flight], Awaitable],
+    ) -> Flight:
+        """
+        Присоединяется к задаче по ключу или запускает новую.
+
+        Args:
+            key (Hashable): Ключ задачи
+            factory (Callable[[Flight], Awaitable]): Функция, принимающая
+            задачу(для flight.update_progress и flight.add_item) и возвращающая
+            корутину задачи
+
+        Returns:
+            Flight: Задача, к которой присоединился подписчик
+        """
+        flight: Optional[Flight] = self._flights.get(key)
+        if flight is None or flight.task.done():
+            flight = Flight(key=key)
+            flight.task = asyncio.ensure_future(factory(flight))
+            flight.task.add_done_callback(lambda _: self._forget(flight))
+            self._flights[key] = flight
+
+        flight.subscribers += 1
+        return flight
+
+    def unsubscribe(self, flight: Flight) -> None:
+        """
+        Отписывается от задачи и отменяет ее, если подписчиков не осталось.
+
+        Args:
+            flight (Flight): Задача
+        """
+        flight.subscribers = max(0, flight.subscribers - 1)
+        if flight.subscribers == 0 and not flight.task.done():
+            flight.task.cancel()
+            self._forget(flight)
+
+    async def wait(self, flight: Flight) -> Any:
+        """
+        Ожидает результат задачи.
+
+        Отмена ожидающего подписчика отписывает его, но не отменяет задачу,
+        пока на нее подписаны другие.
+
+        Args:
+            flight (Flight): Задача
+
+        Returns:
+            Any: Результат задачи
+        """
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                self.unsubscribe(flight)
+            raise
+
+    def _forget(self, flight: Flight) -> None:
+        """Удаляет задачу из списка выполняемых."""
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
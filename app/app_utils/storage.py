@@ -0,0 +1,97 @@
+from typing import Any, Callable, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import functools
+import sqlite3
+import threading
+
+
+class SQLiteStorage:
+    """
+    Базовый класс для локальных хранилищ на sqlite.
+
+    Соединение создается при первом обращении, запросы выполняются под
+    блокировкой, а асинхронные методы наследников уносят их в executor,
+    чтобы не блокировать цикл событий бота.
+    """
+
+    # Схема таблиц хранилища, выполняется при первом подключении
+    SCHEMA: str = ""
+
+    def __init__(self, path: Path) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            path (Path): Путь до файла базы данных
+        """
+        self.path: Path = Path(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Возвращает соединение с базой данных, создавая его при необходимости."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection: sqlite3.Connection = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def execute(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        """
+        Выполняет запрос к базе данных и возвращает все строки результата.
+
+        Args:
+            sql (str): SQL запрос
+            parameters (Tuple, optional): Параметры запроса
+
+        Returns:
+            List[Tuple]: Строки результата запроса
+        """
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            cursor: sqlite3.Cursor = connection.execute(sql, parameters)
+            rows: List[Tuple] = cursor.fetchall()
+            connection.commit()
+            return rows
+
+    def executemany(self, sql: str, seq_parameters: List[Tuple]) -> None:
+        """
+        Выполняет запрос для каждого набора параметров в одной транзакции.
+
+        Args:
+            sql (str): SQL запрос
+            seq_parameters (List[Tuple]): Список параметров запроса
+        """
+        with self._lock:
+            connection: sqlite3.Connection = self._connect()
+            connection.executemany(sql, seq_parameters)
+            connection.commit()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполняет синхронный метод хранилища в executor.
+
+        Args:
+            func (Callable): Синхронная функция для выполнения
+
+        Returns:
+            Any: Результат функции
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(func, *args, **kwargs),
+        )
+
+    def close(self) -> None:
+        """Закрывает соединение с базой данных."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
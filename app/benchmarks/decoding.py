@@ -0,0 +1,409 @@
+"""
+Сравнение разбора json ответов api: json, orjson и orjson со схемой полей.
+
+Документы собираются по образцу ответов discogs(поиск, master, release) и
+кинопоиска(страница фильмов). Сначала проверяется, что функции бота, читающие
+ответы, работают с документами после project() - иначе схема в настройках
+отбрасывает нужное поле. Затем для каждого документа выводится время разбора и
+память, которую занимает разобранный документ, пока бот его хранит.
+
+Быстрее разбирает только orjson. Схема полей добавляет время на проекцию
+после разбора и уменьшает только память документа.
+
+Запуск из папки app: python -m benchmarks.decoding
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from app_utils.decoding import orjson, project
+from bot.config.models.music import Discogs
+from bot.config.models.video import Kinopoisk
+from bot.functions.music.new_music import (
+    get_album_from_release,
+    get_album_from_search_result,
+)
+from bot.functions.video.viewing_advice import get_description_video_from_kinopoisk
+
+
+def get_discogs_release() -> Dict:
+    """Документ release с треками, участниками и изображениями."""
+    credits: List[Dict] = [
+        {
+            "name": f"Artist {index}",
+            "anv": "",
+            "join": "",
+            "role": "Guitar, Vocals",
+            "tracks": "A1 to B6",
+            "id": 100000 + index,
+            "resource_url": f"https://api.discogs.com/artists/{100000 + index}",
+        }
+        for index in range(12)
+    ]
+    return {
+        "id": 1234567,
+        "status": "Accepted",
+        "year": 1984,
+        "resource_url": "https://api.discogs.com/releases/1234567",
+        "uri": "https://www.discogs.com/release/1234567-Artist-Album",
+        "artists": credits[:2],
+        "artists_sort": "Artist 0",
+        "labels": [
+            {"name": f"Label {index}", "catno": f"CAT-{index}", "id": index}
+            for index in range(3)
+        ],
+        "series": [],
+        "companies": [
+            {
+                "name": f"Company {index}",
+                "entity_type_name": "Pressed By",
+                "id": index,
+                "resource_url": f"https://api.discogs.com/labels/{index}",
+            }
+            for index in range(8)
+        ],
+        "formats": [{"name": "Vinyl", "qty": "1", "descriptions": ["LP", "Album"]}],
+        "data_quality": "Needs Vote",
+        "community": {
+            "have": 1500,
+            "want": 900,
+            "rating": {"count": 120, "average": 4.5},
+            "contributors": [
+                {"username": f"user{index}", "resource_url": "https://api.discogs.com"}
+                for index in range(30)
+            ],
+        },
+        "format_quantity": 1,
+        "date_added": "2008-01-01T00:00:00-08:00",
+        "date_changed": "2023-05-01T00:00:00-07:00",
+        "num_for_sale": 25,
+        "lowest_price": 30.5,
+        "master_id": 54321,
+        "master_url": "https://api.discogs.com/masters/54321",
+        "title": "Album",
+        "country": "US",
+        "released": "1984-05-00",
+        "notes": "Recorded at Studio. " * 60,
+        "released_formatted": "May 1984",
+        "identifiers": [
+            {"type": "Matrix / Runout", "value": f"CAT-{index} A", "description": ""}
+            for index in range(10)
+        ],
+        "videos": [
+            {
+                "uri": f"https://www.youtube.com/watch?v={index}",
+                "title": f"Video {index}",
+                "description": "Video description " * 5,
+                "duration": 180,
+                "embed": True,
+            }
+            for index in range(8)
+        ],
+        "genres": ["Rock"],
+        "styles": ["Hardcore", "Punk"],
+        "tracklist": [
+            {
+                "position": f"A{index}",
+                "type_": "track",
+                "title": f"Track {index}",
+                "duration": "2:30",
+                "extraartists": credits[:4],
+            }
+            for index in range(16)
+        ],
+        "extraartists": credits,
+        "images": [
+            {
+                "type": "primary" if index == 0 else "secondary",
+                "uri": f"https://i.discogs.com/{index}.jpg",
+                "resource_url": f"https://i.discogs.com/{index}.jpg",
+                "uri150": f"https://i.discogs.com/{index}-150.jpg",
+                "width": 600,
+                "height": 600,
+            }
+            for index in range(10)
+        ],
+        "thumb": "https://i.discogs.com/thumb.jpg",
+        "estimated_weight": 230,
+        "blocked_from_sale": False,
+    }
+
+
+def get_discogs_master() -> Dict:
+    """Документ master с треками и изображениями."""
+    release: Dict = get_discogs_release()
+    return {
+        "id": 54321,
+        "main_release": 1234567,
+        "most_recent_release": 7654321,
+        "resource_url": "https://api.discogs.com/masters/54321",
+        "uri": "https://www.discogs.com/master/54321-Artist-Album",
+        "versions_url": "https://api.discogs.com/masters/54321/versions",
+        "main_release_url": "https://api.discogs.com/releases/1234567",
+        "most_recent_release_url": "https://api.discogs.com/releases/7654321",
+        "num_for_sale": 120,
+        "lowest_price": 10.5,
+        "images": release["images"],
+        "genres": release["genres"],
+        "styles": release["styles"],
+        "year": release["year"],
+        "tracklist": release["tracklist"],
+        "artists": release["artists"],
+        "title": release["title"],
+        "data_quality": "Correct",
+        "videos": release["videos"],
+    }
+
+
+def get_discogs_search() -> Dict:
+    """Страница поиска discogs из 100 результатов."""
+    return {
+        "pagination": {
+            "page": 1,
+            "pages": 10,
+            "per_page": 100,
+            "items": 1000,
+            "urls": {"last": "https://api.discogs.com/database/search?page=10"},
+        },
+        "results": [
+            {
+                "country": "US",
+                "year": "1984",
+                "format": ["Vinyl", "LP", "Album"],
+                "label": ["Label 1", "Label 2"],
+                "type": "release",
+                "genre": ["Rock"],
+                "style": ["Hardcore", "Punk"],
+                "id": 1000 + index,
+                "barcode": [f"{index}0000000000", "CAT-1 A", "CAT-1 B"],
+                "user_data": {"in_wantlist": False, "in_collection": False},
+                "master_id": 500 + index,
+                "master_url": f"https://api.discogs.com/masters/{500 + index}",
+                "uri": f"/release/{1000 + index}-Artist-Album",
+                "catno": f"CAT-{index}",
+                "title": f"Artist {index} - Album {index}",
+                "thumb": f"https://i.discogs.com/{index}-150.jpg",
+                "cover_image": f"https://i.discogs.com/{index}.jpg",
+                "resource_url": f"https://api.discogs.com/releases/{1000 + index}",
+                "community": {"want": 10, "have": 20},
+                "format_quantity": 1,
+                "formats": [
+                    {"name": "Vinyl", "qty": "1", "descriptions": ["LP", "Album"]}
+                ],
+            }
+            for index in range(100)
+        ],
+    }
+
+
+def get_kinopoisk_movies() -> Dict:
+    """Страница фильмов кинопоиска из 50 документов без выбора полей."""
+    return {
+        "docs": [
+            {
+                "id": 300 + index,
+                "name": f"Фильм {index}",
+                "alternativeName": f"Movie {index}",
+                "enName": None,
+                "type": "movie",
+                "typeNumber": 1,
+                "year": 2000 + index % 20,
+                "description": "Описание фильма. " * 30,
+                "shortDescription": "Короткое описание фильма.",
+                "slogan": "Слоган фильма",
+                "status": None,
+                "rating": {"kp": 7.5, "imdb": 7.1, "filmCritics": 6.8, "await": None},
+                "votes": {"kp": 150000, "imdb": 90000, "filmCritics": 100},
+                "movieLength": 120,
+                "ageRating": 16,
+                "poster": {
+                    "url": f"https://image.openmoviedb.com/{index}.jpg",
+                    "previewUrl": f"https://image.openmoviedb.com/{index}-p.jpg",
+                },
+                "backdrop": {"url": "https://image.openmoviedb.com/b.jpg"},
+                "genres": [{"name": "драма"}, {"name": "криминал"}],
+                "countries": [{"name": "США"}],
+                "persons": [
+                    {
+                        "id": 1000 + person,
+                        "photo": f"https://image.openmoviedb.com/p{person}.jpg",
+                        "name": f"Актер {person}",
+                        "enName": f"Actor {person}",
+                        "description": f"Роль {person}",
+                        "profession": "актеры",
+                        "enProfession": "actor",
+                    }
+                    for person in range(40)
+                ],
+                "facts": [
+                    {"value": "Факт о фильме. " * 10, "type": "FACT", "spoiler": False}
+                    for _ in range(10)
+                ],
+                "similarMovies": [
+                    {"id": similar, "name": f"Похожий {similar}", "type": "movie"}
+                    for similar in range(10)
+                ],
+                "names": [{"name": f"Название {name}"} for name in range(5)],
+                "isSeries": False,
+                "top250": None,
+            }
+            for index in range(50)
+        ],
+        "total": 10000,
+        "limit": 50,
+        "page": 1,
+        "pages": 200,
+    }
+
+
+def check_schemas() -> List[str]:
+    """
+    Вызывает функции бота, читающие ответы api, на документах после project().
+
+    Returns:
+        List[str]: Ошибки вида "ответ: ошибка". Пустой список - схемы оставляют
+        все поля, которые читает бот
+    """
+    discogs: Discogs = Discogs()
+    search: Dict = project(get_discogs_search(), discogs.DECODE_SCHEMAS["search"])
+    master: Dict = project(get_discogs_master(), discogs.DECODE_SCHEMAS["master"])
+    release: Dict = project(get_discogs_release(), discogs.DECODE_SCHEMAS["release"])
+    movies: Dict = project(get_kinopoisk_movies(), Kinopoisk().DECODE_SCHEMAS["movies"])
+
+    checks: List[Tuple[str, Callable[[], Any]]] = [
+        (
+            "discogs search",
+            lambda: [
+                search["pagination"]["items"],
+                search["pagination"]["pages"],
+                *(
+                    get_album_from_search_result(result, discogs)
+                    for result in search["results"]
+                ),
+            ],
+        ),
+        (
+            "discogs master",
+            lambda: (master["main_release"], master["main_release_url"]),
+        ),
+        (
+            "discogs release",
+            lambda: get_album_from_release(release, search["results"][0], discogs),
+        ),
+        (
+            "kinopoisk movies",
+            lambda: [
+                movies["pages"],
+                *(get_description_video_from_kinopoisk(doc) for doc in movies["docs"]),
+            ],
+        ),
+    ]
+    errors: List[str] = []
+    for name, check in checks:
+        try:
+            check()
+        except Exception as err:
+            errors.append(f"{name}: {type(err).__name__} {err}")
+    return errors
+
+
+def measure_time(function: Callable[[], Any], repeat: int = 200) -> float:
+    """Возвращает медианное время выполнения function в миллисекундах."""
+    timings: List[float] = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started_at: float = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started_at)
+    finally:
+        gc.enable()
+    return statistics.median(timings) * 1000
+
+
+def measure_memory(function: Callable[[], Any]) -> int:
+    """Возвращает размер в байтах, который занимает результат function."""
+    gc.collect()
+    tracemalloc.start()
+    result: Any = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run_benchmark(
+    name: str,
+    document: Dict,
+    schema: Optional[Dict],
+    count: int = 1,
+) -> None:
+    """
+    Печатает время разбора и размер документа для каждого способа разбора.
+
+    Args:
+        name (str): Название ответа
+        document (Dict): Ответ api
+        schema (Optional[Dict]): Схема полей ответа
+        count (int, optional): Количество документов в ответе. По умолчанию 1
+    """
+    body: bytes = json.dumps(document, ensure_ascii=False).encode()
+    decoders: List[Tuple[str, Callable[[], Any]]] = [
+        ("json", lambda: json.loads(body)),
+        ("json + схема", lambda: project(json.loads(body), schema)),
+    ]
+    if orjson is not None:
+        decoders += [
+            ("orjson", lambda: orjson.loads(body)),
+            ("orjson + схема", lambda: project(orjson.loads(body), schema)),
+        ]
+
+    results: List[Tuple[str, float, int]] = [
+        (decoder_name, measure_time(decode), measure_memory(decode))
+        for decoder_name, decode in decoders
+    ]
+    _, baseline_time, baseline_memory = results[0]
+    print(
+        f"\n{name}: {len(body) / 1024:.1f} КБ, документов {count}"
+        " (время и память на один документ)"
+    )
+    for decoder_name, elapsed, memory in results:
+        print(
+            f"  {decoder_name:<16} {elapsed * 1000 / count:8.1f} мкс"
+            f" ({baseline_time / elapsed:3.1f}x)"
+            f"  {memory / 1024 / count:7.1f} КБ ({memory / baseline_memory:4.0%})"
+        )
+
+
+def main() -> None:
+    """Проверяет схемы и запускает сравнение для всех типов документов."""
+    errors: List[str] = check_schemas()
+    if errors:
+        print("Схемы DECODE_SCHEMAS отбрасывают поля, которые читает бот:")
+        print("\n".join(f"  {error}" for error in errors))
+        sys.exit(1)
+
+    discogs_schemas: Dict = Discogs().DECODE_SCHEMAS
+    kinopoisk_schemas: Dict = Kinopoisk().DECODE_SCHEMAS
+    if orjson is None:
+        print("orjson не установлен - сравнивается только json")
+    run_benchmark("discogs release", get_discogs_release(), discogs_schemas["release"])
+    run_benchmark(
+        "discogs search", get_discogs_search(), discogs_schemas["search"], count=100
+    )
+    run_benchmark(
+        "kinopoisk movies",
+        get_kinopoisk_movies(),
+        kinopoisk_schemas["movies"],
+        count=50,
+    )
+
+
+if __name__ == "__main__":
+    main()
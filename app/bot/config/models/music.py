@@ -1,7 +1,11 @@
-from typing import Optional
+from typing import Optional, Dict
+from pathlib import Path
 
 from pydantic import BaseModel
 
+from core.retry import RetryPolicy
+from core.http import HttpClientSettings
+
 
 class Discogs(BaseModel):
     """Модель для сайта https://www.discogs.com/"""
@@ -40,7 +44,130 @@ class Discogs(BaseModel):
     STYLES: Optional[str] = None
     TRACKLIST: Optional[int] = None
     IMG: Optional[str] = None
+    # Ссылки для загрузки подробностей альбома по результату поиска
+    RESOURCE_URL: Optional[str] = None
+    MASTER_URL: Optional[str] = None
     COUNT_ALBUMS_SEARCH: int = 50
+    # Размер страницы поиска(не больше 100) и период поиска в месяцах.
+    # Страницы и годы периода запрашиваются одновременно
+    SEARCH_PAGE_SIZE: int = 100
+    SEARCH_MONTHS: int = 12
+    # Обход останавливается как только найдено столько разных альбомов.
+    # None - обходятся все результаты поиска
+    TARGET_COUNT_ALBUMS: Optional[int] = 30
+
+    # Ограничения запросов к API - квота discogs 60 запросов в минуту
+    RATE_LIMIT_PER_MINUTE: int = 55
+    RATE_LIMIT_BURST: int = 5
+    # Минимальная скорость при почти израсходованной квоте
+    RATE_LIMIT_MIN_PER_MINUTE: int = 5
+    # Повторы запроса при ответе 429 и пауза перед ними в секундах
+    RATE_LIMIT_RETRIES: int = 3
+    RATE_LIMIT_BACKOFF: int = 10
+    # Повторы запроса при ошибках сети и сервера. 429 повторяется через
+    # ограничитель запросов(RATE_LIMIT_RETRIES)
+    RETRY: RetryPolicy = RetryPolicy(
+        attempts=4,
+        base_delay=2,
+        max_delay=60,
+        budget=180,
+        statuses=[500, 502, 503, 504],
+    )
+    # Пул соединений к api.discogs.com. Скорость запросов ограничена
+    # RATE_LIMIT_PER_MINUTE, поэтому соединений немного и они держатся открытыми
+    # между запросами. Ответы поиска могут быть долгими
+    HTTP_CLIENT: HttpClientSettings = HttpClientSettings(
+        limit=10,
+        limit_per_host=10,
+        keepalive_timeout=60,
+        connect_timeout=10,
+        read_timeout=60,
+        total_timeout=100,
+    )
+    CRAWLER_CONCURRENCY: int = 5
+
+    # По умолчанию запрос пользователя выполняет полный обход: альбомы
+    # отправляются по мере загрузки, одинаковые обходы объединяются, обход
+    # останавливается по TARGET_COUNT_ALBUMS и продолжается после перезапуска.
+    # При LAZY_DETAILS = True список альбомов строится только по результатам
+    # поиска, а подробности альбома загружаются при пролистывании.
+    # PREFETCH_ALBUMS - сколько следующих альбомов загружать заранее
+    LAZY_DETAILS: bool = False
+    PREFETCH_ALBUMS: int = 3
+
+    # Постоянный кэш документов master и release
+    PATH_TO_FOLDER_CACHE_DISCOGS: Path = (
+        Path(__file__).resolve().parent.parent.parent / "static" / "cache" / "discogs"
+    )
+    PATH_TO_FILENAME_CACHE_DISCOGS: Path = (
+        PATH_TO_FOLDER_CACHE_DISCOGS / "documents.sqlite3"
+    )
+    # Время жизни документов в кэше по их типу в секундах
+    CACHE_TTL: Dict[str, int] = {
+        "master": 30 * 24 * 60 * 60,
+        "release": 7 * 24 * 60 * 60,
+    }
+    # Сколько секунд устаревший документ еще отдается, если discogs недоступен
+    CACHE_MAX_STALE: int = 30 * 24 * 60 * 60
+    CACHE_MAX_SIZE_MB: int = 100
+
+    # Поля ответов api, которые использует бот(см. app_utils.decoding.project).
+    # Остальные поля(треки, участники, изображения и т.д.) отбрасываются сразу
+    # после разбора и не попадают в кэш. None вместо схемы - ответ целиком
+    DECODE_SCHEMAS: Dict[str, Optional[Dict]] = {
+        "search": {
+            "pagination": {"items": None, "pages": None},
+            "results": {
+                "id": None,
+                "master_id": None,
+                "title": None,
+                "uri": None,
+                "format": None,
+                "year": None,
+                "country": None,
+                "style": None,
+                "cover_image": None,
+                "thumb": None,
+                "resource_url": None,
+                "master_url": None,
+            },
+        },
+        "master": {"main_release": None, "main_release_url": None},
+        "release": {
+            "title": None,
+            "artists": {"name": None},
+            "uri": None,
+            "formats": {"descriptions": None},
+            "released": None,
+            "country": None,
+            "styles": None,
+            # От треков нужно только их количество
+            "tracklist": {},
+            "images": {"uri150": None},
+        },
+    }
+
+    # Постоянное соответствие master id -> id главного релиза. Записи старше
+    # RELEASE_MAP_REFRESH секунд используются, но обновляются в фоне
+    PATH_TO_FILENAME_RELEASE_MAP_DISCOGS: Path = (
+        PATH_TO_FOLDER_CACHE_DISCOGS / "release_map.sqlite3"
+    )
+    RELEASE_MAP_REFRESH: int = 90 * 24 * 60 * 60
+
+    # Фоновый прогрев готовых списков альбомов для всех стилей из DICT_STYLES
+    PATH_TO_FILENAME_SNAPSHOTS_DISCOGS: Path = (
+        PATH_TO_FOLDER_CACHE_DISCOGS / "snapshots.sqlite3"
+    )
+    PREWARM_ENABLED: bool = True
+    PREWARM_INTERVAL: int = 6 * 60 * 60  # пауза между обходами всех стилей
+    PREWARM_CONCURRENCY: int = 1  # количество стилей, обходимых одновременно
+    SNAPSHOT_TTL: int = 12 * 60 * 60  # после этого времени список считается устаревшим
+
+    # Курсоры незавершенных обходов - прерванный перезапуском бота обход
+    # продолжается и его результат отправляется ожидающим пользователям
+    PATH_TO_FILENAME_JOBS_DISCOGS: Path = PATH_TO_FOLDER_CACHE_DISCOGS / "jobs.sqlite3"
+    CHECKPOINT_EVERY: int = 5  # сохранять курсор после стольких альбомов
+    JOB_MAX_AGE: int = 24 * 60 * 60  # более старые курсоры не продолжаются
 
 
 class NewMusicItemsModels(BaseModel):
@@ -1,8 +1,11 @@
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from pathlib import Path
 
 from pydantic import BaseModel
 
+from core.retry import RetryPolicy
+from core.http import HttpClientSettings
+
 
 class Kinopoisk(BaseModel):
     """Модель рекомендательной системы для кинопоиска."""
@@ -11,13 +14,19 @@ class Kinopoisk(BaseModel):
     SERVICE_ID: str = "kinopoisk"
 
     API_KEY: Optional[str] = None
+    # Пул ключей API - запросы распределяются между ключами, у каждого ключа
+    # своя дневная квота. Если пул пуст, используется API_KEY
+    API_KEYS: List[str] = []
+    DAILY_QUOTA_PER_KEY: int = 200
+    # Смещение от UTC часового пояса, в полночь которого сбрасывается квота
+    QUOTA_RESET_UTC_OFFSET: int = 3
 
     # URL для запросов
     URL_SEARCH_VIDEO_NAME: str = (
         "https://api.kinopoisk.dev/v1.4/movie/search?page=1&limit={limit}&query={name}"
     )
     URL_SEARCH_UNIVERSAL_VIDEO: str = (
-        "https://api.kinopoisk.dev/v1.4/movie?page=1&limit={limit}"
+        "https://api.kinopoisk.dev/v1.4/movie?page={page}&limit={limit}"
     )
 
     PATH_TO_FOLDER_DEFOLT_IMAGE_KINOPOISK: Path = (
@@ -32,11 +41,143 @@ class Kinopoisk(BaseModel):
         PATH_TO_FOLDER_DEFOLT_IMAGE_KINOPOISK / "none.png"
     )
 
+    # Кэш поиска фильмов по названию. Результаты хранятся в памяти и, если
+    # SEARCH_CACHE_DISK включен, в постоянном кэше
+    SEARCH_CACHE_MAX_ITEMS: int = 1000
+    SEARCH_CACHE_TTL: int = 24 * 60 * 60
+    SEARCH_CACHE_DISK: bool = True
+    PATH_TO_FOLDER_CACHE_KINOPOISK: Path = (
+        Path(__file__).resolve().parent.parent.parent / "static" / "cache" / "kinopoisk"
+    )
+    PATH_TO_FILENAME_CACHE_KINOPOISK: Path = (
+        PATH_TO_FOLDER_CACHE_KINOPOISK / "documents.sqlite3"
+    )
+    # Время жизни документов в постоянном кэше по их типу в секундах
+    CACHE_TTL: Dict[str, int] = {
+        "search": 7 * 24 * 60 * 60,
+    }
+    CACHE_MAX_SIZE_MB: int = 50
+    # Счетчики использования ключей API за текущие сутки
+    PATH_TO_FILENAME_KEYS_KINOPOISK: Path = (
+        PATH_TO_FOLDER_CACHE_KINOPOISK / "keys.sqlite3"
+    )
+
+    # Локальный каталог фильмов из всех ответов API. Если в каталоге есть
+    # CATALOG_MIN_MOVIES подходящих фильмов, рекомендация составляется без
+    # запросов к API, иначе выборка запрашивается и пополняет каталог
+    CATALOG_ENABLED: bool = True
+    PATH_TO_FILENAME_CATALOG_KINOPOISK: Path = (
+        PATH_TO_FOLDER_CACHE_KINOPOISK / "catalog.sqlite3"
+    )
+    CATALOG_MIN_MOVIES: int = 100
+    CATALOG_MAX_AGE: int = 30 * 24 * 60 * 60  # более старые фильмы не учитываются
+
+    # Поля документа фильма, запрашиваемые у API(selectFields) по месту вызова -
+    # только те, что выводятся пользователю. Пустой список - документ целиком.
+    # Документы без полей из NOT_NULL_FIELDS API не возвращает(notNullFields).
+    # Поиск по названию(/movie/search) эти параметры не поддерживает
+    SELECT_FIELDS: Dict[str, List[str]] = {
+        "recommender": [
+            "id",
+            "name",
+            "alternativeName",
+            "type",
+            "year",
+            "description",
+            "shortDescription",
+            "movieLength",
+            "rating",
+            "genres",
+            "countries",
+            "poster",
+        ],
+    }
+    NOT_NULL_FIELDS: Dict[str, List[str]] = {
+        "recommender": ["name"],
+    }
+    # Поля ответов api, которые использует бот(см. app_utils.decoding.project).
+    # Остальные поля документов фильмов отбрасываются сразу после разбора и не
+    # попадают в каталог и состояние пользователя. None - ответ целиком
+    DECODE_SCHEMAS: Dict[str, Optional[Dict]] = {
+        "movies": {
+            "docs": {
+                "id": None,
+                "name": None,
+                "alternativeName": None,
+                "type": None,
+                "year": None,
+                "description": None,
+                "shortDescription": None,
+                "movieLength": None,
+                "rating": {"kp": None, "imdb": None},
+                "genres": {"name": None},
+                "countries": {"name": None},
+                "poster": {"url": None, "previewUrl": None},
+            },
+            "page": None,
+            "pages": None,
+            "total": None,
+            "limit": None,
+        },
+    }
+
+    # Повторы запроса при ошибках сети, сервера и 429. Пользователь ждет ответ,
+    # поэтому повторов мало и они короткие
+    RETRY: RetryPolicy = RetryPolicy(
+        attempts=2,
+        base_delay=0.5,
+        max_delay=5,
+        budget=10,
+    )
+    # Пул соединений к api.kinopoisk.dev. Страницы рекомендаций запрашиваются
+    # одновременно для нескольких пользователей
+    HTTP_CLIENT: HttpClientSettings = HttpClientSettings(
+        limit=50,
+        limit_per_host=30,
+        keepalive_timeout=30,
+        connect_timeout=5,
+        read_timeout=20,
+        total_timeout=30,
+    )
+
+    # Ключ API добавляется к заголовкам пулом ключей при каждом запросе
     HEADERS: Dict = {
         "accept": "application/json",
-        "X-API-KEY": None,
     }
 
+    # Диапазоны рейтинга для рекомендаций - запрашиваются одновременно
+    RATING_BANDS: List[str] = ["6-10", "1-5"]
+    RECOMMENDER_LIMIT: int = 25  # количество фильмов из одного диапазона
+    RECOMMENDER_TIMEOUT: int = 30  # таймаут одного запроса в секундах
+    # Выборка фильмов одного диапазона запрашивается одновременно страницами.
+    # Страницы, не успевшие за RECOMMENDER_PAGE_DEADLINE, отбрасываются
+    RECOMMENDER_POOL_SIZE: int = 100
+    RECOMMENDER_PAGE_SIZE: int = 50
+    RECOMMENDER_PAGE_DEADLINE: int = 10
+    # Общее время ожидания всех диапазонов, не успевшие диапазоны отбрасываются
+    RECOMMENDER_DEADLINE: int = 30
+    # Когда до конца списка рекомендаций остается столько фильмов, в фоне
+    # догружается следующая страница выборки(по RECOMMENDER_PAGE_SIZE фильмов)
+    RECOMMENDER_PREFETCH_AT: int = 5
+    # Фильмы выборки ранжируются по похожести на исходный фильм(жанры, страны,
+    # год, рейтинг, тип) с учетом разнообразия. Выключено - случайный выбор
+    RANKING_ENABLED: bool = True
+    RANKING_WEIGHTS: Dict[str, float] = {
+        "genres": 0.45,
+        "countries": 0.15,
+        "year": 0.15,
+        "rating": 0.15,
+        "type": 0.10,
+    }
+    RANKING_DIVERSITY: float = 0.15  # 0 - только похожесть, 1 - только разнообразие
+
+    # Общий кэш выборок фильмов по паре жанров, типу и рейтингу. Выборка
+    # старше POOL_CACHE_FRESH_TTL секунд отдается сразу и обновляется в фоне,
+    # старше POOL_CACHE_STALE_TTL - запрашивается заново
+    POOL_CACHE_MAX_ITEMS: int = 500
+    POOL_CACHE_FRESH_TTL: int = 6 * 60 * 60
+    POOL_CACHE_STALE_TTL: int = 7 * 24 * 60 * 60
+
 
 class ViewingAdvieModels(BaseModel):
     """Общий класс для моделей для рекомендаций по названию фильма."""
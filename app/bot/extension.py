@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import Bot, Dispatcher
 
 from bot.config.bot_settings import BotSettings
@@ -6,6 +8,18 @@ from settings.response import app_settings
 from core.logging import LoggerStorage
 from bot.config.models.main import BaseGeneration
 from app_utils.keyboards import get_total_buttons_reply_kb
+from app_utils.rate_limit import AdaptiveRateLimiter
+from app_utils.cache import (
+    DocumentCache,
+    SnapshotStore,
+    ResolutionMap,
+    QueryCache,
+    StaleWhileRevalidateCache,
+)
+from app_utils.single_flight import SingleFlight
+from app_utils.jobs import JobStore
+from app_utils.catalog import MovieCatalog
+from app_utils.keys import ApiKeyPool
 
 
 # Получаем доступ ко всем моделям
@@ -22,6 +36,87 @@ get_button_start_bot_menu = get_total_buttons_reply_kb(
 )
 
 
+# Общий для всех пользователей ограничитель запросов к discogs
+discogs_rate_limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+    rate_per_minute=models_settings.music_models.new_music.discogs.RATE_LIMIT_PER_MINUTE,
+    capacity=models_settings.music_models.new_music.discogs.RATE_LIMIT_BURST,
+    min_rate_per_minute=models_settings.music_models.new_music.discogs.RATE_LIMIT_MIN_PER_MINUTE,
+)
+
+# Постоянный кэш документов discogs
+discogs_cache: DocumentCache = DocumentCache(
+    path=models_settings.music_models.new_music.discogs.PATH_TO_FILENAME_CACHE_DISCOGS,
+    ttl=models_settings.music_models.new_music.discogs.CACHE_TTL,
+    max_size_bytes=models_settings.music_models.new_music.discogs.CACHE_MAX_SIZE_MB
+    * 1024
+    * 1024,
+    max_stale=models_settings.music_models.new_music.discogs.CACHE_MAX_STALE,
+)
+
+# Соответствие master id -> id главного релиза discogs
+discogs_release_map: ResolutionMap = ResolutionMap(
+    path=models_settings.music_models.new_music.discogs.PATH_TO_FILENAME_RELEASE_MAP_DISCOGS,
+)
+
+# Готовые списки альбомов discogs, обновляемые фоновым прогревом
+discogs_snapshots: SnapshotStore = SnapshotStore(
+    path=models_settings.music_models.new_music.discogs.PATH_TO_FILENAME_SNAPSHOTS_DISCOGS,
+)
+
+# Объединение одинаковых одновременных обходов discogs
+discogs_single_flight: SingleFlight = SingleFlight()
+
+# Курсоры незавершенных обходов discogs и ожидающие их пользователи
+discogs_jobs: JobStore = JobStore(
+    path=models_settings.music_models.new_music.discogs.PATH_TO_FILENAME_JOBS_DISCOGS,
+)
+
+# Постоянный кэш документов кинопоиска
+kinopoisk_cache: DocumentCache = DocumentCache(
+    path=models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FILENAME_CACHE_KINOPOISK,
+    ttl=models_settings.video_models.viewing_advice.kinopoisk.CACHE_TTL,
+    max_size_bytes=models_settings.video_models.viewing_advice.kinopoisk.CACHE_MAX_SIZE_MB
+    * 1024
+    * 1024,
+)
+
+# Общий для всех пользователей кэш поиска фильмов по названию
+kinopoisk_search_cache: QueryCache = QueryCache(
+    max_items=models_settings.video_models.viewing_advice.kinopoisk.SEARCH_CACHE_MAX_ITEMS,
+    ttl=models_settings.video_models.viewing_advice.kinopoisk.SEARCH_CACHE_TTL,
+    disk=(
+        kinopoisk_cache
+        if models_settings.video_models.viewing_advice.kinopoisk.SEARCH_CACHE_DISK
+        else None
+    ),
+    kind="search",
+)
+
+# Пул ключей API кинопоиска с дневной квотой на каждый ключ
+kinopoisk_key_pool: ApiKeyPool = ApiKeyPool(
+    path=models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FILENAME_KEYS_KINOPOISK,
+    keys=models_settings.video_models.viewing_advice.kinopoisk.API_KEYS
+    or [models_settings.video_models.viewing_advice.kinopoisk.API_KEY],
+    daily_quota=models_settings.video_models.viewing_advice.kinopoisk.DAILY_QUOTA_PER_KEY,
+    reset_utc_offset=models_settings.video_models.viewing_advice.kinopoisk.QUOTA_RESET_UTC_OFFSET,
+)
+
+# Локальный каталог фильмов кинопоиска
+kinopoisk_catalog: Optional[MovieCatalog] = (
+    MovieCatalog(
+        path=models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FILENAME_CATALOG_KINOPOISK,
+    )
+    if models_settings.video_models.viewing_advice.kinopoisk.CATALOG_ENABLED
+    else None
+)
+
+# Общий для всех пользователей кэш выборок рекомендованных фильмов
+kinopoisk_pool_cache: StaleWhileRevalidateCache = StaleWhileRevalidateCache(
+    max_items=models_settings.video_models.viewing_advice.kinopoisk.POOL_CACHE_MAX_ITEMS,
+    fresh_ttl=models_settings.video_models.viewing_advice.kinopoisk.POOL_CACHE_FRESH_TTL,
+    stale_ttl=models_settings.video_models.viewing_advice.kinopoisk.POOL_CACHE_STALE_TTL,
+)
+
 # Создаем хранилище логгеров
 logging_data = LoggerStorage()
 
@@ -1,191 +1,1064 @@
-from typing import Callable, Dict, List
+from datetime import date
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import asyncio
-import traceback
+import math
 
 import aiohttp
 
 from core.response import ResponseData, LoggingData
-from error_handlers.network import error_handler_for_the_website
+from core.retry import RetryPolicy
+from error_handlers.network import (
+    error_handler_for_the_website,
+    get_retry_after,
+    is_site_unavailable,
+)
+from app_utils.rate_limit import AdaptiveRateLimiter
+from app_utils.cache import DocumentCache, ResolutionMap
+from app_utils.single_flight import Flight, SingleFlight
+from app_utils.jobs import CrawlCheckpoint
+from error_handlers.decorator import safe_async_execution
 
 
-async def get_list_albums_for_discogs(
+# Фоновые задачи предзагрузки подробностей альбомов и обновления соответствий
+background_tasks: set = set()
+# master id, соответствие которых сейчас обновляется в фоне
+refreshing_masters: set = set()
+
+
+def get_headers_for_discogs(discogs_setting) -> Dict:
+    """
+    Возвращает заголовки для запросов к api.discogs.com.
+
+    Ключи передаются в заголовке Authorization, чтобы все запросы(в том числе
+    к master_url и resource_url) считались авторизованными и использовали
+    общую квоту 60 запросов в минуту.
+
+    Args:
+        discogs_setting (_type_): Pydantic model с данными по discogs
+
+    Returns:
+        Dict: Заголовки запроса
+    """
+    headers: Dict = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "application/json",
+    }
+    if discogs_setting.KEY and discogs_setting.SECRET:
+        headers["Authorization"] = (
+            f"Discogs key={discogs_setting.KEY}, secret={discogs_setting.SECRET}"
+        )
+    return headers
+
+
+def get_search_params_for_discogs(
+    style: str,
+    year: int,
+    per_page: int,
+    page: int = 1,
+) -> Dict:
+    """
+    Возвращает параметры запроса поиска альбомов на api.discogs.com.
+
+    Args:
+        style (str): Стиль музыки для поиска
+        year (int): год для поиска альбомов
+        per_page (int): количество альбомов на странице
+        page (int, optional): номер страницы. По умолчанию 1
+
+    Returns:
+        Dict: Параметры запроса
+    """
+    return {
+        "style": style,
+        "year": year,
+        "format": "Album",
+        "per_page": per_page,
+        "page": page,
+        "sort": "year",
+        "sort_order": "desc",
+    }
+
+
+def get_search_years_for_discogs(year: int, months: int) -> List[int]:
+    """
+    Возвращает годы для поиска, покрывающие последние months месяцев.
+
+    Discogs ищет только по году, поэтому например в январе "последние 12
+    месяцев" - это текущий и прошлый год.
+
+    Args:
+        year (int): последний год поиска
+        months (int): количество месяцев для поиска
+
+    Returns:
+        List[int]: годы поиска от последнего к первому
+    """
+    today: date = date.today()
+    first_year: int = (today.year * 12 + today.month - 1 - months) // 12
+    return list(range(year, min(year, first_year) - 1, -1))
+
+
+async def get_search_results_for_discogs(
     style: str,
     per_page: int,
     url: str,
     year: int,
-    update_progress: Callable,
     discogs_setting,
     session: aiohttp.ClientSession,
     logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    headers: Dict,
 ) -> ResponseData:
-
     """
-    Возвращает список альбомов исполнителей по жанру для сайта discogs.com.
+    Возвращает результаты поиска discogs за последние discogs_setting.SEARCH_MONTHS месяцев.
+
+    Первые страницы всех годов запрашиваются одновременно, по их данным о
+    количестве альбомов одновременно запрашиваются недостающие страницы.
+    Результаты объединяются от новых годов к старым, пока не наберется per_page.
 
     Args:
         style (str): Стиль музыки для поиска
-        per_page (int): количество альбомов для поиска
+        per_page (int): количество результатов поиска
         url (str): URL для запроса
-        year (int): год для поиска альбомов
-        update_progress (Callable): функция для отслеживания прогресса
+        year (int): последний год поиска
         discogs_setting (_type_): Pydantic model с данными по discogs
         session (aiohttp.ClientSession): сессия запроса
         logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        headers (Dict): Заголовки запроса
 
     Returns:
         ResponseData: Объект с результатом запроса.
 
         Атрибуты ResponseData:
-            - message (Any | None): Данные успешного ответа (если запрос прошёл успешно).
+            - message (List | None): Список результатов поиска.
             - error (str | None): Описание ошибки, если запрос завершился неудачей.
             - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
             - url (str): URL, по которому выполнялся запрос.
             - method (str): HTTP-метод, использованный при запросе.
     """
-    # формируем параметры для запроса
-    params: Dict = {
-        "key": discogs_setting.KEY,
-        "secret": discogs_setting.SECRET,
-        "style": style,
-        "year": year,
-        "format": "Album",
-        "per_page": per_page,
-        "page": 1,
-        "sort": "year",
-        "sort_order": "desc",
-    }
+    page_size: int = min(per_page, discogs_setting.SEARCH_PAGE_SIZE)
+    years: List[int] = get_search_years_for_discogs(
+        year=year,
+        months=discogs_setting.SEARCH_MONTHS,
+    )
+
+    async def get_page(search_year: int, page: int) -> ResponseData:
+        return await get_data_from_discogs(
+            session=session,
+            url=url,
+            rate_limiter=rate_limiter,
+            logging_data=logging_data,
+            headers=headers,
+            retries=discogs_setting.RATE_LIMIT_RETRIES,
+            backoff=discogs_setting.RATE_LIMIT_BACKOFF,
+            retry=discogs_setting.RETRY,
+            schema=discogs_setting.DECODE_SCHEMAS.get("search"),
+            params=get_search_params_for_discogs(
+                style=style,
+                year=search_year,
+                per_page=page_size,
+                page=page,
+            ),
+        )
+
+    # Первые страницы всех годов
+    pages: Dict[Tuple[int, int], ResponseData] = dict(
+        zip(
+            [(search_year, 1) for search_year in years],
+            await asyncio.gather(*[get_page(search_year, 1) for search_year in years]),
+        )
+    )
+    for response in pages.values():
+        if response.error:
+            return response
+
+    # Определяем сколько страниц каждого года нужно, чтобы набрать per_page
+    remaining: int = per_page
+    next_pages: List[Tuple[int, int]] = []
+    for search_year in years:
+        if remaining <= 0:
+            break
+        pagination: Dict = pages[(search_year, 1)].message["pagination"]
+        count: int = min(pagination["items"], remaining)
+        count_pages: int = min(pagination["pages"], math.ceil(count / page_size))
+        next_pages.extend((search_year, page) for page in range(2, count_pages + 1))
+        remaining -= count
+
+    for key, response in zip(
+        next_pages,
+        await asyncio.gather(*[get_page(*key) for key in next_pages]),
+    ):
+        if response.error:
+            return response
+        pages[key] = response
+
+    results: List = []
+    for key in sorted(pages, key=lambda key: (-key[0], key[1])):
+        results.extend(pages[key].message["results"])
+    return ResponseData(
+        message=results[:per_page],
+        url=url,
+        method="GET",
+        status=200,
+    )
+
+
+def get_id_from_discogs_url(url: str) -> Optional[int]:
+    """
+    Возвращает id ресурса discogs из его URL(например .../masters/123).
+
+    Args:
+        url (str): URL ресурса
+
+    Returns:
+        Optional[int]: id ресурса или None если URL не содержит id
+    """
+    try:
+        return int(url.rstrip("/").rsplit("/", 1)[-1])
+    except (AttributeError, ValueError):
+        return None
 
-    headers: Dict = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json",
-    }
 
-    # формируем запрос для получения списка артистов
-    response_artists_list: ResponseData = await error_handler_for_the_website(
+def get_release_url_for_discogs(master_url: str, release_id: int) -> str:
+    """
+    Возвращает URL релиза на том же API, что и master_url.
+
+    Args:
+        master_url (str): URL master ресурса
+        release_id (int): id релиза
+
+    Returns:
+        str: URL релиза
+    """
+    base_url: str = master_url.rsplit("/masters/", 1)[0]
+    return f"{base_url}/releases/{release_id}"
+
+
+async def get_data_from_discogs(
+    session: aiohttp.ClientSession,
+    url: str,
+    rate_limiter: AdaptiveRateLimiter,
+    logging_data: LoggingData,
+    headers: Dict,
+    timeout: Optional[int] = None,
+    params: Optional[Dict] = None,
+    retries: int = 3,
+    backoff: int = 10,
+    cache: Optional[DocumentCache] = None,
+    cache_kind: Optional[str] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Делает запрос к api.discogs.com с учетом общего ограничения запросов.
+
+    Токен rate_limiter берется перед каждой попыткой запроса к сайту, в том
+    числе перед повторами по политике retry при ошибках сети и сервера. По
+    заголовкам X-Discogs-Ratelimit* из ответа подстраивает скорость
+    rate_limiter. При ответе 429 приостанавливает rate_limiter(на время из
+    Retry-After, если сайт его передал) и повторяет запрос.
+    Если передан cache и cache_kind - сначала ищет документ в кэше и сохраняет
+    в него успешные ответы. Если discogs недоступен, отдает устаревший
+    документ из кэша(см. DocumentCache.max_stale).
+
+    Args:
+        session (aiohttp.ClientSession): сессия запроса
+        url (str): URL для запроса
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        headers (Dict): Заголовки запроса
+        timeout (Optional[int], optional): таймаут запроса в секундах. По умолчанию
+        None - таймауты сессии
+        params (Optional[Dict], optional): Параметры запроса. По умолчанию None
+        retries (int, optional): Количество повторов при ответе 429. По умолчанию 3
+        backoff (int, optional): Пауза в секундах перед повтором, растет с каждой
+        попыткой. По умолчанию 10
+        cache (Optional[DocumentCache], optional): Кэш документов. По умолчанию None
+        cache_kind (Optional[str], optional): Тип документа для кэша. По умолчанию None
+        retry (Optional[RetryPolicy], optional): Политика повторов при ошибках
+        сети и сервера. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа, которые нужно оставить.
+        По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+    """
+    use_cache: bool = bool(cache and cache_kind)
+    if use_cache:
+        document = await cache.get(url)
+        if document is not None:
+            return ResponseData(message=document, url=url, method="GET", status=200)
+
+    attempt: int = 0
+    while True:
+        response: ResponseData = await error_handler_for_the_website(
+            session=session,
+            url=url,
+            logging_data=logging_data,
+            function_name=get_list_albums_for_discogs.__name__,
+            timeout=timeout,
+            headers=headers,
+            params=params,
+            retry=retry,
+            schema=schema,
+            before_attempt=rate_limiter.acquire,
+        )
+        rate_limiter.update_from_headers(response.headers)
+
+        if response.status != 429 or attempt >= retries:
+            if use_cache and not response.error:
+                await cache.set(url, cache_kind, response.message)
+            elif use_cache and is_site_unavailable(response):
+                document = await cache.get(url, allow_stale=True)
+                if document is not None:
+                    logging_data.warning_logger.warning(
+                        f"Discogs недоступен({response.error}), документ {url} "
+                        "отдан из кэша устаревшим"
+                    )
+                    return ResponseData(
+                        message=document, url=url, method="GET", status=200
+                    )
+            return response
+
+        attempt += 1
+        rate_limiter.on_too_many_requests(
+            retry_after=get_retry_after(response.headers) or backoff * attempt
+        )
+
+
+async def get_album_for_discogs(
+    result: Dict,
+    update_progress: Callable,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    headers: Dict,
+    cache: Optional[DocumentCache] = None,
+    release_map: Optional[ResolutionMap] = None,
+) -> Optional[ResponseData]:
+    """
+    Возвращает информацию об альбоме по одному результату поиска discogs.com.
+
+    Args:
+        result (Dict): результат поиска discogs
+        update_progress (Callable): функция для отслеживания прогресса
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        headers (Dict): Заголовки запроса
+        cache (Optional[DocumentCache], optional): Кэш документов. По умолчанию None
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+
+    Returns:
+        Optional[ResponseData]: None если пользователь отменил запрос.
+        Иначе ResponseData где message - модель альбома или None если альбом
+        нужно пропустить, error - ошибка при которой нужно прекратить поиск
+    """
+    url: str = result["resource_url"]
+    master_url: str = result["master_url"]
+    master_id: Optional[int] = get_id_from_discogs_url(master_url)
+    # Главный релиз master почти не меняется - берем его из постоянного
+    # соответствия без запроса master
+    resolved: Optional[Tuple[int, float]] = None
+    if master_id and release_map:
+        resolved = await release_map.get(master_id)
+
+    if resolved:
+        release_id, age = resolved
+        url = get_release_url_for_discogs(master_url=master_url, release_id=release_id)
+        if age > discogs_setting.RELEASE_MAP_REFRESH:
+            refresh_release_map_for_discogs(
+                master_url=master_url,
+                master_id=master_id,
+                discogs_setting=discogs_setting,
+                session=session,
+                logging_data=logging_data,
+                rate_limiter=rate_limiter,
+                headers=headers,
+                release_map=release_map,
+            )
+    elif master_url:
+        # Проверяет на состояние отмены запроса
+        if not await update_progress():
+            return
+
+        # делаем запрос на получение main_release_url
+        response: ResponseData = await get_data_from_discogs(
+            session=session,
+            url=master_url,
+            rate_limiter=rate_limiter,
+            logging_data=logging_data,
+            headers=headers,
+            retries=discogs_setting.RATE_LIMIT_RETRIES,
+            backoff=discogs_setting.RATE_LIMIT_BACKOFF,
+            retry=discogs_setting.RETRY,
+            cache=cache,
+            cache_kind="master",
+            schema=discogs_setting.DECODE_SCHEMAS.get("master"),
+        )
+        # если ресурс не найден то пропускаем
+        if response.status == 404:
+            return ResponseData(url=master_url, method="GET", status=404)
+        if response.error:
+            return response
+        url = response.message["main_release_url"]
+        if master_id and release_map:
+            await release_map.set(master_id, response.message["main_release"])
+
+    # Проверяет на состояние отмены запроса
+    if not await update_progress():
+        return
+
+    # Делаем запрос на получение информацию об альбоме артиста
+    data_artist: ResponseData = await get_data_from_discogs(
         session=session,
         url=url,
+        rate_limiter=rate_limiter,
         logging_data=logging_data,
-        function_name=get_list_albums_for_discogs.__name__,
-        params=params,
         headers=headers,
+        retries=discogs_setting.RATE_LIMIT_RETRIES,
+        backoff=discogs_setting.RATE_LIMIT_BACKOFF,
+        retry=discogs_setting.RETRY,
+        cache=cache,
+        cache_kind="release",
+        schema=discogs_setting.DECODE_SCHEMAS.get("release"),
     )
+    if data_artist.status == 404:
+        return ResponseData(url=url, method="GET", status=404)
+    if data_artist.error:
+        return data_artist
 
-    if response_artists_list.error:
-        return response_artists_list
+    # Проверяет на состояние отмены запроса
+    if not await update_progress():
+        return
 
-    list_artists: List = []
+    music = get_album_from_release(
+        release=data_artist.message,
+        result=result,
+        discogs_setting=discogs_setting,
+    )
+    return ResponseData(message=music, url=url, method="GET", status=200)
+
+
+def get_album_from_release(release: Dict, result: Dict, discogs_setting):
+    """
+    Возвращает модель альбома из документа release.
+
+    Args:
+        release (Dict): документ release discogs
+        result (Dict): результат поиска discogs, по которому найден release
+        discogs_setting (_type_): Pydantic model с данными по discogs
+
+    Returns:
+        _type_: Модель альбома
+    """
+    return discogs_setting.model_validate(
+        {
+            "TITLE": release["title"],
+            "ARTISTS_NAME": release["artists"][0]["name"],
+            "ALBUM_URL": release["uri"],
+            "FORMATS": ", ".join(release["formats"][0]["descriptions"]).strip(", "),
+            "RELEASED": release["released"],
+            "COUNTRY": release["country"],
+            "STYLES": ", ".join(release["styles"]).strip(", "),
+            # Получаем количество песен в альбоме
+            "TRACKLIST": len(release["tracklist"]),
+            "IMG": release["images"][0]["uri150"],
+            "RESOURCE_URL": result["resource_url"],
+            "MASTER_URL": result["master_url"],
+        }
+    )
+
+
+async def update_release_map_for_discogs(
+    master_url: str,
+    master_id: int,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    headers: Dict,
+    release_map: ResolutionMap,
+) -> None:
+    """
+    Запрашивает master без кэша и обновляет соответствие master id -> id главного релиза.
+
+    Args:
+        master_url (str): URL master ресурса
+        master_id (int): id master ресурса
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        headers (Dict): Заголовки запроса
+        release_map (ResolutionMap): Соответствие master id -> id главного релиза
+    """
+    try:
+        response: ResponseData = await get_data_from_discogs(
+            session=session,
+            url=master_url,
+            rate_limiter=rate_limiter,
+            logging_data=logging_data,
+            headers=headers,
+            retries=discogs_setting.RATE_LIMIT_RETRIES,
+            backoff=discogs_setting.RATE_LIMIT_BACKOFF,
+            retry=discogs_setting.RETRY,
+            schema=discogs_setting.DECODE_SCHEMAS.get("master"),
+        )
+        if not response.error:
+            await release_map.set(master_id, response.message["main_release"])
+    except Exception as err:
+        logging_data.warning_logger.warning(
+            f"Не удалось обновить главный релиз master {master_id}: {err}"
+        )
+    finally:
+        refreshing_masters.discard(master_id)
+
+
+def refresh_release_map_for_discogs(
+    master_url: str,
+    master_id: int,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    headers: Dict,
+    release_map: ResolutionMap,
+) -> None:
+    """
+    Запускает в фоне обновление устаревшего соответствия master id -> id главного релиза.
+
+    Одно и то же соответствие одновременно обновляется только один раз.
+    Аргументы как у update_release_map_for_discogs.
+    """
+    if master_id in refreshing_masters:
+        return
+    refreshing_masters.add(master_id)
+
+    task: asyncio.Task = asyncio.ensure_future(
+        update_release_map_for_discogs(
+            master_url=master_url,
+            master_id=master_id,
+            discogs_setting=discogs_setting,
+            session=session,
+            logging_data=logging_data,
+            rate_limiter=rate_limiter,
+            headers=headers,
+            release_map=release_map,
+        )
+    )
+    # Храним ссылку на задачу, чтобы ее не удалил сборщик мусора
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+def get_unique_search_results_for_discogs(results: List) -> List:
+    """
+    Убирает из результатов поиска discogs переиздания одного и того же альбома.
+
+    Результаты с одним master id(или одним id релиза, если master нет)
+    считаются одним альбомом, остается первый из них. Выполняется до
+    запросов подробностей, поэтому на повторы не тратится квота.
+
+    Args:
+        results (List): результаты поиска discogs
 
-    set_repeat: set = set() # для удаления повторов альбомов
-    count: int = 0 # для отображения прогресса
-    for result in response_artists_list.message["results"]:
-        master_url: str = result["master_url"]
+    Returns:
+        List: результаты поиска без повторов
+    """
+    unique_results: List = []
+    set_repeat: set = set()
+    for result in results:
+        if result.get("master_id"):
+            key: Tuple = ("master", result["master_id"])
+        else:
+            key = ("release", result.get("id", result.get("resource_url")))
+        if key in set_repeat:
+            continue
+        set_repeat.add(key)
+        unique_results.append(result)
+    return unique_results
+
+
+def get_album_from_search_result(result: Dict, discogs_setting):
+    """
+    Формирует модель альбома по результату поиска discogs.com без дополнительных запросов.
+
+    Количество песен и точная дата выхода в результатах поиска отсутствуют,
+    они загружаются в get_album_details_for_discogs.
+
+    Args:
+        result (Dict): результат поиска discogs
+        discogs_setting (_type_): Pydantic model с данными по discogs
+
+    Returns:
+        _type_: Модель альбома
+    """
+    # Название в результатах поиска имеет вид "Исполнитель - Альбом"
+    artists_name, _, title = result["title"].partition(" - ")
+    return discogs_setting.model_validate(
+        {
+            "TITLE": title or artists_name,
+            "ARTISTS_NAME": artists_name,
+            "ALBUM_URL": f"https://www.discogs.com{result['uri']}",
+            "FORMATS": ", ".join(result.get("format", [])).strip(", "),
+            "RELEASED": str(result.get("year", "")),
+            "COUNTRY": result.get("country"),
+            "STYLES": ", ".join(result.get("style", [])).strip(", "),
+            "IMG": result.get("cover_image") or result.get("thumb"),
+            "RESOURCE_URL": result["resource_url"],
+            "MASTER_URL": result.get("master_url"),
+        }
+    )
+
+
+async def get_search_albums_for_discogs(
+    style: str,
+    per_page: int,
+    url: str,
+    year: int,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+) -> ResponseData:
+    """
+    Возвращает список альбомов по жанру, построенный только по результатам поиска.
+
+    Запрашивает только страницы поиска discogs.com вместо запросов master и
+    release для каждого альбома.
+
+    Args:
+        style (str): Стиль музыки для поиска
+        per_page (int): количество альбомов для поиска
+        url (str): URL для запроса
+        year (int): год для поиска альбомов
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (List | None): Список моделей альбомов.
+            - error (str | None): Описание ошибки, если запрос завершился неудачей.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе.
+    """
+    response: ResponseData = await get_search_results_for_discogs(
+        style=style,
+        per_page=per_page,
+        url=url,
+        year=year,
+        discogs_setting=discogs_setting,
+        session=session,
+        logging_data=logging_data,
+        rate_limiter=rate_limiter,
+        headers=get_headers_for_discogs(discogs_setting=discogs_setting),
+    )
+    if response.error:
+        return response
+
+    list_artists: List = []
+    set_repeat: set = set()  # для удаления повторов альбомов
+    for result in get_unique_search_results_for_discogs(results=response.message):
         try:
-            if master_url:
-                # Проверяет на состояние отмены запроса
-                cancel = await update_progress()
-                if not cancel:
-                    return
+            music = get_album_from_search_result(
+                result=result,
+                discogs_setting=discogs_setting,
+            )
+        except Exception as err:
+            # В результате не хватает данных для отображения - пропускаем
+            logging_data.warning_logger.warning(
+                f"Результат поиска discogs {result.get('resource_url')} пропущен: {err}"
+            )
+            continue
+        if music.IMG in set_repeat:
+            continue
+        set_repeat.add(music.IMG)
+        list_artists.append(music)
 
-                await asyncio.sleep(2.5)
+    return ResponseData(message=list_artists, url=url, method="GET", status=200)
 
-                # делаем запрос на получение main_release_url
-                response: ResponseData = await error_handler_for_the_website(
-                    session=session,
-                    url=master_url,
-                    logging_data=logging_data,
-                    function_name=get_list_albums_for_discogs.__name__,
-                    timeout=100,
-                    headers=headers,
-                )
-                # если слишком много запросов то пропускаем
-                if response.status == 404:
-                    continue
-                if response.error:
-                    return response
-                main_release_url: str = response.message["main_release_url"]
 
-                # Проверяет на состояние отмены запроса
-                cancel = await update_progress()
+async def get_album_details_for_discogs(
+    album,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: Optional[DocumentCache],
+    single_flight: SingleFlight,
+    release_map: Optional[ResolutionMap] = None,
+):
+    """
+    Загружает подробности альбома(количество песен, форматы, дату выхода).
+
+    Одновременные загрузки одного и того же альбома(например при пролистывании
+    и предзагрузке) объединяются в одну. Если загрузить подробности не удалось,
+    возвращает переданный альбом.
+
+    Args:
+        album (_type_): Модель альбома из результатов поиска
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (Optional[DocumentCache]): Постоянный кэш документов master и release
+        single_flight (SingleFlight): объединение одинаковых загрузок
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+
+    Returns:
+        _type_: Модель альбома с подробностями
+    """
+    if album.TRACKLIST is not None or not album.RESOURCE_URL:
+        return album
+
+    flight: Flight = single_flight.subscribe(
+        key=("discogs_details", album.RESOURCE_URL),
+        factory=lambda flight: safe_async_execution(logging_data=logging_data)(
+            get_album_for_discogs
+        )(
+            result={"resource_url": album.RESOURCE_URL, "master_url": album.MASTER_URL},
+            update_progress=flight.update_progress,
+            discogs_setting=discogs_setting,
+            session=session,
+            logging_data=logging_data,
+            rate_limiter=rate_limiter,
+            headers=get_headers_for_discogs(discogs_setting=discogs_setting),
+            cache=cache,
+            release_map=release_map,
+        ),
+    )
+    response: Optional[ResponseData] = await single_flight.wait(flight)
+    single_flight.unsubscribe(flight)
+
+    if response is None or response.error or response.message is None:
+        return album
+    return response.message
+
+
+def prefetch_album_details_for_discogs(
+    albums_list: List,
+    start: int,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: Optional[DocumentCache],
+    single_flight: SingleFlight,
+    release_map: Optional[ResolutionMap] = None,
+) -> None:
+    """
+    Запускает в фоне загрузку подробностей следующих discogs_setting.PREFETCH_ALBUMS альбомов.
+
+    Загруженные документы попадают в cache, поэтому при пролистывании
+    подробности берутся из него без запросов к сайту.
 
-                if not cancel:
-                    return
+    Args:
+        albums_list (List): Список моделей альбомов
+        start (int): Индекс первого альбома для предзагрузки
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (Optional[DocumentCache]): Постоянный кэш документов master и release
+        single_flight (SingleFlight): объединение одинаковых загрузок
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+    """
+    for album in albums_list[start : start + discogs_setting.PREFETCH_ALBUMS]:
+        if album.TRACKLIST is not None:
+            continue
+        task: asyncio.Task = asyncio.ensure_future(
+            get_album_details_for_discogs(
+                album=album,
+                discogs_setting=discogs_setting,
+                session=session,
+                logging_data=logging_data,
+                rate_limiter=rate_limiter,
+                cache=cache,
+                single_flight=single_flight,
+                release_map=release_map,
+            )
+        )
+        # Храним ссылку на задачу, чтобы ее не удалил сборщик мусора
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
 
-                await asyncio.sleep(2.5)
 
-                # Делаем запрос на получение информацию об альбоме артиста
-                data_artist: ResponseData = await error_handler_for_the_website(
+async def iter_albums_for_discogs(
+    style: str,
+    per_page: int,
+    url: str,
+    year: int,
+    update_progress: Callable,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: Optional[DocumentCache] = None,
+    release_map: Optional[ResolutionMap] = None,
+    target_count: Optional[int] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+) -> AsyncIterator[Optional[ResponseData]]:
+    """
+    Асинхронный генератор альбомов исполнителей по жанру для сайта discogs.com.
+
+    Данные об альбомах запрашиваются одновременно(не более
+    discogs_setting.CRAWLER_CONCURRENCY запросов), темп запросов задает
+    общий для всего бота rate_limiter. Альбомы отдаются по мере получения,
+    повторяющиеся альбомы пропускаются. Если задан target_count - обход
+    останавливается как только найдено target_count разных альбомов.
+    Если передан checkpoint - результаты поиска, обработанные результаты и
+    найденные альбомы сохраняются в него, а при продолжении обхода берутся
+    из него без повторных запросов.
+
+    Args:
+        style (str): Стиль музыки для поиска
+        per_page (int): количество альбомов для поиска
+        url (str): URL для запроса
+        year (int): год для поиска альбомов
+        update_progress (Callable): функция для отслеживания прогресса
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (Optional[DocumentCache], optional): Постоянный кэш документов master и
+        release. По умолчанию None
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+        target_count (Optional[int], optional): Количество разных альбомов, после
+        которого обход останавливается. По умолчанию None - обходятся все результаты
+        checkpoint (Optional[CrawlCheckpoint], optional): Сохраняемый курсор обхода.
+        По умолчанию None
+
+    Yields:
+        Optional[ResponseData]: ResponseData с моделью альбома в message.
+        ResponseData с error или None(пользователь отменил запрос) - последний
+        элемент генератора
+    """
+    headers: Dict = get_headers_for_discogs(discogs_setting=discogs_setting)
+
+    if checkpoint and checkpoint.results is not None:
+        # Продолжаем обход - результаты поиска уже сохранены
+        results: List = checkpoint.results
+    else:
+        # формируем запрос для получения списка артистов
+        response_artists_list: ResponseData = await get_search_results_for_discogs(
+            style=style,
+            per_page=per_page,
+            url=url,
+            year=year,
+            discogs_setting=discogs_setting,
+            session=session,
+            logging_data=logging_data,
+            rate_limiter=rate_limiter,
+            headers=headers,
+        )
+
+        if response_artists_list.error:
+            yield response_artists_list
+            return
+
+        # Переиздания одного альбома убираем до запросов подробностей
+        results = get_unique_search_results_for_discogs(
+            results=response_artists_list.message
+        )
+        if checkpoint:
+            checkpoint.results = results
+            await checkpoint.save()
+
+    set_repeat: set = set()  # для удаления повторов альбомов
+
+    # Сначала отдаем альбомы, найденные до остановки обхода
+    for item in checkpoint.items if checkpoint else []:
+        music = discogs_setting.model_validate(item)
+        if music.IMG in set_repeat:
+            continue
+        set_repeat.add(music.IMG)
+
+        yield ResponseData(message=music, url=music.RESOURCE_URL, method="GET", status=200)
+
+        if target_count and len(set_repeat) >= target_count:
+            return
+
+    # Ограничивает количество одновременных запросов для одного пользователя
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(
+        discogs_setting.CRAWLER_CONCURRENCY
+    )
+
+    async def crawl(index: int, result: Dict) -> Optional[ResponseData]:
+        async with semaphore:
+            try:
+                album: Optional[ResponseData] = await get_album_for_discogs(
+                    result=result,
+                    update_progress=update_progress,
+                    discogs_setting=discogs_setting,
                     session=session,
-                    url=main_release_url,
                     logging_data=logging_data,
-                    function_name=get_list_albums_for_discogs.__name__,
-                    timeout=100,
+                    rate_limiter=rate_limiter,
                     headers=headers,
+                    cache=cache,
+                    release_map=release_map,
                 )
-                if data_artist.status == 404:
-                    continue
-                if data_artist.error:
-                    return data_artist
-
-            else:
-                # Проверяет на состояние отмены запроса
-                cancel = await update_progress()
-                if not cancel:
-                    return
-                await asyncio.sleep(2.5)
-                # Делаем запрос на получение информацию об альбоме артиста
-                data_artist: ResponseData = await error_handler_for_the_website(
-                    session=session,
-                    url=result["resource_url"],
-                    logging_data=logging_data,
-                    function_name=get_list_albums_for_discogs.__name__,
-                    timeout=100,
-                    headers=headers,
+            except Exception as err:
+                # В альбоме не хватает данных для отображения - пропускаем
+                logging_data.warning_logger.warning(
+                    f"Альбом discogs {result.get('resource_url')} пропущен: {err}"
                 )
-                if data_artist.status == 404:
-                    continue
-                if data_artist.error:
-                    return data_artist
-
-            # Проверяет на состояние отмены запроса
-            cancel = await update_progress()
-            if not cancel:
-                return
-            # Получаем количество песен в альбоме
-            tracklist: int = len(data_artist.message["tracklist"])
-
-            img: str = data_artist.message["images"][0]["uri150"]
-            music = discogs_setting.model_validate(
-                {
-                    "TITLE": data_artist.message["title"],
-                    "ARTISTS_NAME": data_artist.message["artists"][0]["name"],
-                    "ALBUM_URL": data_artist.message["uri"],
-                    "FORMATS": ", ".join(
-                        data_artist.message["formats"][0]["descriptions"]
-                    ).strip(", "),
-                    "RELEASED": data_artist.message["released"],
-                    "COUNTRY": data_artist.message["country"],
-                    "STYLES": ", ".join(data_artist.message["styles"]).strip(", "),
-                    "TRACKLIST": tracklist,
-                    "IMG": data_artist.message["images"][0]["uri150"],
-                }
+                album = ResponseData(url=result.get("resource_url"), method="GET")
+
+        # Отмененные и завершившиеся ошибкой результаты при продолжении повторяем
+        if checkpoint and album is not None and not album.error:
+            await checkpoint.add(
+                index=index,
+                item=album.message.dict(exclude_unset=True) if album.message else None,
             )
+        return album
+
+    tasks: List[asyncio.Task] = [
+        asyncio.ensure_future(crawl(index, result))
+        for index, result in enumerate(results)
+        if not checkpoint or index not in checkpoint.processed
+    ]
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            album: Optional[ResponseData] = await task
+            # Пользователь отменил запрос или произошла ошибка
+            if album is None or album.error:
+                yield album
+                return
+            if album.message is None:
+                continue
+
+            # Проверяем есть ли повторящющиеся альбомы
+            if album.message.IMG in set_repeat:
+                continue
+            set_repeat.add(album.message.IMG)
+
+            yield album
+
+            # Найдено достаточно разных альбомов - оставшиеся запросы не нужны
+            if target_count and len(set_repeat) >= target_count:
+                return
+    finally:
+        # Останавливаем оставшиеся запросы при отмене или ошибке
+        for task in tasks:
+            task.cancel()
+        if checkpoint:
+            await checkpoint.save()
+
+
+async def get_list_albums_for_discogs(
+    style: str,
+    per_page: int,
+    url: str,
+    year: int,
+    update_progress: Callable,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: Optional[DocumentCache] = None,
+    on_album: Optional[Callable] = None,
+    release_map: Optional[ResolutionMap] = None,
+    target_count: Optional[int] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+) -> ResponseData:
+    """
+    Возвращает список альбомов исполнителей по жанру для сайта discogs.com.
+
+    Альбомы собираются из iter_albums_for_discogs и сортируются по дате выхода
+    после завершения обхода.
+
+    Args:
+        style (str): Стиль музыки для поиска
+        per_page (int): количество альбомов для поиска
+        url (str): URL для запроса
+        year (int): год для поиска альбомов
+        update_progress (Callable): функция для отслеживания прогресса
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (Optional[DocumentCache], optional): Постоянный кэш документов master и
+        release. По умолчанию None
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+        on_album (Optional[Callable], optional): Вызывается с моделью каждого
+        найденного альбома сразу после его получения. По умолчанию None
+        target_count (Optional[int], optional): Количество разных альбомов, после
+        которого обход останавливается. По умолчанию None - обходятся все результаты
+        checkpoint (Optional[CrawlCheckpoint], optional): Сохраняемый курсор обхода.
+        По умолчанию None
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (Any | None): Данные успешного ответа (если запрос прошёл успешно).
+            - error (str | None): Описание ошибки, если запрос завершился неудачей.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе.
+    """
+    albums = iter_albums_for_discogs(
+        style,
+        per_page,
+        url,
+        year,
+        update_progress,
+        discogs_setting,
+        session,
+        logging_data,
+        rate_limiter,
+        cache,
+        release_map,
+        target_count,
+        checkpoint,
+    )
+
+    list_artists: List = []
+    count: int = 0  # для отображения прогресса
+    try:
+        async for album in albums:
+            # Пользователь отменил запрос
+            if album is None:
+                return
+            if album.error:
+                return album
+
+            list_artists.append(album.message)
+            if on_album:
+                on_album(album.message)
 
             # Обновляем прогресс скачивания
             count += 1
             await update_progress(data_state=count)
+    finally:
+        await albums.aclose()
 
-            # Проверяем есть ли повторящющиеся альбомы
-            len_set: int = len(set_repeat)
-            set_repeat.add(img)
-            if len_set == len(set_repeat):
-                pass
-            else:
-                list_artists.append(music)
-        except Exception as err:
-            print(err)
-    list_artists.sort(key=lambda x: x.dict()["RELEASED"]) # сортируем альбом по дате выхода
+    # Сообщаем текущее состояние квоты discogs
+    budget = rate_limiter.budget
+    logging_data.info_logger.info(
+        f"Discogs {style}: найдено альбомов {len(list_artists)}, квота - "
+        f"использовано {budget.used} из {budget.limit}, осталось {budget.remaining}, "
+        f"скорость {round(rate_limiter.rate_per_minute)} запросов/мин"
+    )
+
+    list_artists.sort(key=lambda x: x.dict()["RELEASED"])  # сортируем альбом по дате выхода
     return ResponseData(
         message=list_artists[::-1],
         url=url,
@@ -220,7 +1093,9 @@ def get_descripions_for_albums(album: Dict) -> ResponseData:
     data += f"Формат {album['FORMATS']}\n"
     data += f"Жанры: {album['STYLES']}\n"
     data += f"Дата выхода: {album['RELEASED']}\n\n"
-    data += f"Количество песне в альбоме: {album['TRACKLIST']}\n\n"
+    # Количество песен неизвестно пока не загружены подробности альбома
+    if album["TRACKLIST"] is not None:
+        data += f"Количество песне в альбоме: {album['TRACKLIST']}\n\n"
     data += album["ALBUM_URL"]
 
     return ResponseData(message=data, url="<unknown>", status=0, method="<unknown>")
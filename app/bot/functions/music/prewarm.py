@@ -0,0 +1,302 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+
+import aiohttp
+
+from core.response import ResponseData, LoggingData
+from app_utils.rate_limit import AdaptiveRateLimiter
+from app_utils.cache import DocumentCache, SnapshotStore, ResolutionMap
+from app_utils.single_flight import Flight, SingleFlight
+from app_utils.jobs import CrawlCheckpoint, JobStore
+from error_handlers.decorator import safe_async_execution
+from bot.functions.music.new_music import get_list_albums_for_discogs
+
+
+def get_snapshot_key_for_discogs(style: str, year: int) -> str:
+    """Возвращает ключ снимка списка альбомов discogs для стиля и года."""
+    return f"discogs:{style}:{year}"
+
+
+async def get_snapshot_albums_for_discogs(
+    snapshots: SnapshotStore,
+    style: str,
+    year: int,
+    discogs_setting,
+) -> Optional[List]:
+    """
+    Возвращает готовый список альбомов из снимка или None если снимка нет или он устарел.
+
+    Args:
+        snapshots (SnapshotStore): хранилище снимков
+        style (str): Стиль музыки
+        year (int): год поиска альбомов
+        discogs_setting (_type_): Pydantic model с данными по discogs
+
+    Returns:
+        Optional[List]: Список моделей альбомов
+    """
+    snapshot: Optional[List] = await snapshots.get(
+        key=get_snapshot_key_for_discogs(style=style, year=year),
+        max_age=discogs_setting.SNAPSHOT_TTL,
+    )
+    if not snapshot:
+        return None
+    return [discogs_setting.model_validate(album) for album in snapshot]
+
+
+async def save_snapshot_albums_for_discogs(
+    snapshots: SnapshotStore,
+    style: str,
+    year: int,
+    albums: List,
+) -> None:
+    """
+    Сохраняет готовый список альбомов в снимок.
+
+    Args:
+        snapshots (SnapshotStore): хранилище снимков
+        style (str): Стиль музыки
+        year (int): год поиска альбомов
+        albums (List): Список моделей альбомов
+    """
+    await snapshots.set(
+        key=get_snapshot_key_for_discogs(style=style, year=year),
+        snapshot=[album.dict(exclude_unset=True) for album in albums],
+    )
+
+
+def get_flight_key_for_discogs(style: str, year: int, per_page: int) -> Tuple:
+    """Возвращает ключ для объединения одинаковых обходов discogs."""
+    return ("discogs", style, year, per_page)
+
+
+async def crawl_albums_for_discogs(
+    style: str,
+    year: int,
+    update_progress: Callable,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: DocumentCache,
+    snapshots: SnapshotStore,
+    on_album: Optional[Callable] = None,
+    release_map: Optional[ResolutionMap] = None,
+    jobs: Optional[JobStore] = None,
+) -> Optional[ResponseData]:
+    """
+    Обходит стиль discogs и сохраняет найденный список альбомов в снимок.
+
+    Если передан jobs - курсор обхода сохраняется в нем, и прерванный обход
+    (например перезапуском бота) продолжается с места остановки.
+
+    Args:
+        style (str): Стиль музыки
+        year (int): год поиска альбомов
+        update_progress (Callable): функция для отслеживания прогресса
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (DocumentCache): Постоянный кэш документов master и release
+        snapshots (SnapshotStore): хранилище снимков
+        on_album (Optional[Callable], optional): Вызывается с моделью каждого
+        найденного альбома сразу после его получения. По умолчанию None
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+        jobs (Optional[JobStore], optional): Хранилище незавершенных обходов.
+        По умолчанию None
+
+    Returns:
+        Optional[ResponseData]: Результат get_list_albums_for_discogs
+    """
+    checkpoint: Optional[CrawlCheckpoint] = None
+    if jobs:
+        checkpoint = await CrawlCheckpoint.load(
+            store=jobs,
+            key=get_snapshot_key_for_discogs(style=style, year=year),
+            params={"style": style, "year": year},
+            max_age=discogs_setting.JOB_MAX_AGE,
+            save_every=discogs_setting.CHECKPOINT_EVERY,
+        )
+
+    response: Optional[ResponseData] = await get_list_albums_for_discogs(
+        style,
+        discogs_setting.COUNT_ALBUMS_SEARCH,
+        discogs_setting.URL_SEARCH,
+        year,
+        update_progress,
+        discogs_setting,
+        session,
+        logging_data,
+        rate_limiter,
+        cache,
+        on_album,
+        release_map,
+        discogs_setting.TARGET_COUNT_ALBUMS,
+        checkpoint,
+    )
+    if response is not None and not response.error and response.message:
+        await save_snapshot_albums_for_discogs(
+            snapshots=snapshots,
+            style=style,
+            year=year,
+            albums=response.message,
+        )
+        # Обход завершен - курсор больше не нужен
+        if jobs:
+            await jobs.delete(checkpoint.key)
+    return response
+
+
+async def prewarm_style_for_discogs(
+    style: str,
+    year: int,
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: DocumentCache,
+    snapshots: SnapshotStore,
+    single_flight: SingleFlight,
+    release_map: Optional[ResolutionMap] = None,
+    jobs: Optional[JobStore] = None,
+) -> None:
+    """
+    Обходит один стиль discogs и сохраняет готовый список альбомов в снимок.
+
+    Если снимок стиля обновлялся недавно - пропускает его. Если этот стиль
+    уже обходится по запросу пользователя - присоединяется к этому обходу.
+
+    Args:
+        style (str): Стиль музыки
+        year (int): год поиска альбомов
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (DocumentCache): Постоянный кэш документов master и release
+        snapshots (SnapshotStore): хранилище снимков
+        single_flight (SingleFlight): объединение одинаковых обходов
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+        jobs (Optional[JobStore], optional): Хранилище незавершенных обходов.
+        По умолчанию None
+    """
+    # Снимок, обновленный меньше PREWARM_INTERVAL назад, не обходим повторно
+    # (например после перезапуска бота)
+    snapshot: Optional[List] = await snapshots.get(
+        key=get_snapshot_key_for_discogs(style=style, year=year),
+        max_age=discogs_setting.PREWARM_INTERVAL,
+    )
+    if snapshot is not None:
+        return
+
+    flight: Flight = single_flight.subscribe(
+        key=get_flight_key_for_discogs(
+            style=style,
+            year=year,
+            per_page=discogs_setting.COUNT_ALBUMS_SEARCH,
+        ),
+        factory=lambda flight: safe_async_execution(logging_data=logging_data)(
+            crawl_albums_for_discogs
+        )(
+            style=style,
+            year=year,
+            update_progress=flight.update_progress,
+            discogs_setting=discogs_setting,
+            session=session,
+            logging_data=logging_data,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            snapshots=snapshots,
+            on_album=flight.add_item,
+            release_map=release_map,
+            jobs=jobs,
+        ),
+    )
+    response: Optional[ResponseData] = await single_flight.wait(flight)
+    # Прогрев больше не ждет результат - отписываемся
+    single_flight.unsubscribe(flight)
+
+    if response is None or response.error or not response.message:
+        logging_data.warning_logger.warning(
+            f"Не удалось прогреть стиль discogs {style}: "
+            f"{response.error if response else '<no response>'}"
+        )
+        return
+
+    logging_data.info_logger.info(
+        f"Стиль discogs {style} прогрет: {len(response.message)} альбомов"
+    )
+
+
+async def run_prewarm_scheduler_for_discogs(
+    discogs_setting,
+    session: aiohttp.ClientSession,
+    logging_data: LoggingData,
+    rate_limiter: AdaptiveRateLimiter,
+    cache: DocumentCache,
+    snapshots: SnapshotStore,
+    single_flight: SingleFlight,
+    release_map: Optional[ResolutionMap] = None,
+    jobs: Optional[JobStore] = None,
+) -> None:
+    """
+    Периодически обходит все стили из DICT_STYLES за текущий год.
+
+    Готовые списки альбомов сохраняются в snapshots и отдаются пользователям
+    сразу. Запросы идут через общий rate_limiter, поэтому прогрев делит
+    квоту discogs с запросами пользователей.
+
+    Args:
+        discogs_setting (_type_): Pydantic model с данными по discogs
+        session (aiohttp.ClientSession): сессия запроса
+        logging_data (LoggingData): Класс содержащий в себе логер и имя роутера
+        rate_limiter (AdaptiveRateLimiter): общий для всего бота ограничитель запросов
+        cache (DocumentCache): Постоянный кэш документов master и release
+        snapshots (SnapshotStore): хранилище снимков
+        single_flight (SingleFlight): объединение одинаковых обходов
+        release_map (Optional[ResolutionMap], optional): Соответствие master id ->
+        id главного релиза. По умолчанию None
+        jobs (Optional[JobStore], optional): Хранилище незавершенных обходов.
+        По умолчанию None
+    """
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(
+        discogs_setting.PREWARM_CONCURRENCY
+    )
+
+    async def prewarm(style: str, year: int) -> None:
+        async with semaphore:
+            try:
+                await prewarm_style_for_discogs(
+                    style=style,
+                    year=year,
+                    discogs_setting=discogs_setting,
+                    session=session,
+                    logging_data=logging_data,
+                    rate_limiter=rate_limiter,
+                    cache=cache,
+                    snapshots=snapshots,
+                    single_flight=single_flight,
+                    release_map=release_map,
+                    jobs=jobs,
+                )
+            except Exception as err:
+                logging_data.error_logger.exception(
+                    f"Ошибка при прогреве стиля discogs {style}: {err}"
+                )
+
+    while True:
+        year: int = datetime.now().year
+        tasks: Dict[str, asyncio.Task] = {
+            style: asyncio.ensure_future(prewarm(style, year))
+            for style in discogs_setting.DICT_STYLES
+        }
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        await asyncio.sleep(discogs_setting.PREWARM_INTERVAL)
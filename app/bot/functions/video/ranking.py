@@ -0,0 +1,183 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Веса признаков при сравнении кандидата с исходным фильмом
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "genres": 0.45,
+    "countries": 0.15,
+    "year": 0.15,
+    "rating": 0.15,
+    "type": 0.10,
+}
+
+
+class CandidateFeatures:
+    """
+    Признаки документов фильмов в виде массивов.
+
+    genres и countries - матрицы принадлежности(строка - документ, столбец -
+    жанр или страна, 1 если значение есть у документа), years и ratings -
+    год выхода и рейтинг кинопоиска(nan если не указаны), types - тип видео.
+    """
+
+    def __init__(self, documents: List[Dict]) -> None:
+        """
+        Кодирует документы за один проход.
+
+        Args:
+            documents (List[Dict]): Документы фильмов
+        """
+        vocabularies: Dict[str, Dict[str, int]] = {"genres": {}, "countries": {}}
+        cells: Dict[str, Tuple[List[int], List[int]]] = {
+            "genres": ([], []),
+            "countries": ([], []),
+        }
+        years: List[float] = []
+        ratings: List[float] = []
+        self.types: List[Optional[str]] = []
+        for row, document in enumerate(documents):
+            for field, vocabulary in vocabularies.items():
+                rows, columns = cells[field]
+                for value in document.get(field) or []:
+                    name: Optional[str] = value.get("name")
+                    if name:
+                        rows.append(row)
+                        columns.append(vocabulary.setdefault(name, len(vocabulary)))
+            years.append(document.get("year") or np.nan)
+            ratings.append((document.get("rating") or {}).get("kp") or np.nan)
+            self.types.append(document.get("type"))
+
+        matrices: Dict[str, np.ndarray] = {}
+        for field, vocabulary in vocabularies.items():
+            matrix: np.ndarray = np.zeros(
+                (len(documents), len(vocabulary)), dtype=np.float32
+            )
+            matrix[cells[field]] = 1
+            matrices[field] = matrix
+        self.genres: np.ndarray = matrices["genres"]
+        self.countries: np.ndarray = matrices["countries"]
+        self.years: np.ndarray = np.array(years, dtype=np.float32)
+        self.ratings: np.ndarray = np.array(ratings, dtype=np.float32)
+
+
+def get_jaccard(matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """
+    Возвращает коэффициент Жаккара каждой строки матрицы с вектором.
+
+    Args:
+        matrix (np.ndarray): Матрица принадлежности кандидатов
+        vector (np.ndarray): Строка принадлежности исходного фильма
+
+    Returns:
+        np.ndarray: Коэффициенты от 0 до 1 для каждой строки
+    """
+    intersection: np.ndarray = matrix @ vector
+    union: np.ndarray = matrix.sum(axis=1) + vector.sum() - intersection
+    return np.divide(
+        intersection,
+        union,
+        out=np.zeros_like(intersection),
+        where=union > 0,
+    )
+
+
+def get_closeness(values: np.ndarray) -> np.ndarray:
+    """
+    Возвращает близость значения каждого кандидата к значению исходного фильма.
+
+    Args:
+        values (np.ndarray): Значения исходного фильма(первый элемент) и
+        кандидатов, nan если значение не указано
+
+    Returns:
+        np.ndarray: Близость от 0 до 1 для каждого кандидата, 0 если значение
+        кандидата или исходного фильма не указано
+    """
+    value_range: float = (
+        float(np.nanmax(values) - np.nanmin(values))
+        if not np.isnan(values).all()
+        else 0
+    )
+    closeness: np.ndarray = 1 - np.abs(values[1:] - values[0]) / (value_range or 1)
+    return np.nan_to_num(closeness, nan=0.0)
+
+
+def rank_candidates(
+    seed: Dict,
+    candidates: List[Dict],
+    limit: int,
+    weights: Optional[Dict[str, float]] = None,
+    diversity: float = 0.15,
+) -> List[Dict]:
+    """
+    Возвращает кандидатов, отсортированных по похожести на исходный фильм.
+
+    Кандидаты кодируются векторами признаков(жанры и страны, год выхода,
+    рейтинг, тип). Похожесть на исходный фильм по каждому признаку считается
+    для всего пула сразу матричными операциями. Затем limit кандидатов выбирается жадно(MMR): каждый следующий
+    кандидат похож на исходный фильм, но отличается по жанрам от уже выбранных.
+
+    Args:
+        seed (Dict): Документ исходного фильма
+        candidates (List[Dict]): Документы кандидатов
+        limit (int): Количество возвращаемых кандидатов
+        weights (Optional[Dict[str, float]], optional): Веса признаков
+        genres, countries, year, rating и type. По умолчанию DEFAULT_WEIGHTS
+        diversity (float, optional): Доля разнообразия от 0(только похожесть)
+        до 1. По умолчанию 0.15
+
+    Returns:
+        List[Dict]: Отобранные кандидаты в порядке выбора
+    """
+    # Исходный фильм в рекомендацию не попадает
+    candidates = [
+        candidate
+        for candidate in candidates
+        if seed.get("id") is None or candidate.get("id") != seed.get("id")
+    ]
+    if not candidates or limit <= 0:
+        return []
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    documents: List[Dict] = [seed] + candidates
+
+    features: CandidateFeatures = CandidateFeatures(documents)
+    genres: np.ndarray = features.genres
+    genres_score: np.ndarray = get_jaccard(genres[1:], genres[0])
+    countries_score: np.ndarray = get_jaccard(
+        features.countries[1:], features.countries[0]
+    )
+
+    # Год и рейтинг нормируются по разбросу значений пула, без значения
+    # похожесть 0
+    year_score: np.ndarray = get_closeness(features.years)
+    rating_score: np.ndarray = get_closeness(features.ratings)
+    type_score: np.ndarray = (
+        np.array(features.types[1:], dtype=object) == features.types[0]
+    ).astype(np.float32)
+
+    scores: np.ndarray = (
+        weights["genres"] * genres_score
+        + weights["countries"] * countries_score
+        + weights["year"] * year_score
+        + weights["rating"] * rating_score
+        + weights["type"] * type_score
+    )
+
+    # Похожесть кандидатов между собой по жанрам(косинус)
+    norms: np.ndarray = np.linalg.norm(genres[1:], axis=1)
+    normalized: np.ndarray = genres[1:] / np.where(norms > 0, norms, 1)[:, None]
+
+    selected: List[int] = []
+    max_similarity: np.ndarray = np.zeros(len(candidates), dtype=np.float32)
+    available: np.ndarray = np.ones(len(candidates), dtype=bool)
+    for _ in range(min(limit, len(candidates))):
+        mmr: np.ndarray = (1 - diversity) * scores - diversity * max_similarity
+        mmr[~available] = -np.inf
+        index: int = int(np.argmax(mmr))
+        selected.append(index)
+        available[index] = False
+        max_similarity = np.maximum(max_similarity, normalized @ normalized[index])
+
+    return [candidates[index] for index in selected]
@@ -1,10 +1,329 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Union
+import asyncio
+import math
 import random
 import aiohttp
 
 
 from error_handlers.network import error_handler_for_the_website
+from error_handlers.decorator import safe_async_execution
 from core.response import LoggingData, ResponseData
+from app_utils.cache import QueryCache, StaleWhileRevalidateCache
+from app_utils.catalog import MovieCatalog
+from app_utils.keys import ApiKeyPool
+from core.retry import RetryPolicy
+from bot.functions.video.ranking import rank_candidates
+from settings.response import messages
+
+
+async def get_response_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: Dict,
+    logging_data: LoggingData,
+    function_name: str,
+    timeout: Optional[int] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Выполняет запрос к API кинопоиска с ключом из пула ключей.
+
+    Ключ берется из пула только перед запросом к API - ответ из http_cache
+    квоту не расходует. Если API отвечает, что квота ключа исчерпана или ключ
+    недействителен(401, 403), ключ отмечается исчерпанным до конца суток и
+    запрос повторяется со следующим ключом.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        url (str): URL для запроса
+        headers (Dict): Заголовки для запроса без ключа
+        logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        function_name (str): Имя функции для логгирования ошибок
+        timeout (Optional[int], optional): Таймаут запроса в секундах. По умолчанию
+        None - таймауты сессии
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Ответ error_handler_for_the_website или API_QUOTA_ERROR,
+        если квота всех ключей исчерпана
+    """
+    if key_pool is None:
+        return await error_handler_for_the_website(
+            session=session,
+            url=url,
+            logging_data=logging_data,
+            function_name=function_name,
+            headers=headers,
+            timeout=timeout,
+            retry=retry,
+            schema=schema,
+        )
+
+    used_keys: List[str] = []
+
+    async def get_key_headers() -> Union[Dict, ResponseData]:
+        """Берет ключ для очередной попытки запроса к API."""
+        key: Optional[str] = await key_pool.acquire()
+        if key is None:
+            logging_data.warning_logger.warning(
+                f"Квота всех ключей кинопоиска исчерпана: {key_pool.stats}"
+            )
+            return ResponseData(
+                error=messages.API_QUOTA_ERROR,
+                status=0,
+                url=url,
+                method="GET",
+            )
+        used_keys.append(key)
+        return {"X-API-KEY": key}
+
+    while True:
+        response: ResponseData = await error_handler_for_the_website(
+            session=session,
+            url=url,
+            logging_data=logging_data,
+            function_name=function_name,
+            headers=headers,
+            timeout=timeout,
+            retry=retry,
+            schema=schema,
+            before_attempt=get_key_headers,
+        )
+        if response.status not in (401, 403):
+            return response
+
+        await key_pool.mark_exhausted(used_keys[-1])
+        logging_data.warning_logger.warning(
+            f"Ключ кинопоиска исчерпан: {key_pool.stats}"
+        )
+
+
+async def get_video_by_name_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    url_search_video_name: str,
+    name: str,
+    headers: Dict,
+    logging_data: LoggingData,
+    search_cache: Optional[QueryCache] = None,
+    limit: int = 10,
+    timeout: Optional[int] = None,
+    catalog: Optional[MovieCatalog] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Возвращает фильмы по названию из сайта https://www.kinopoisk.ru/.
+
+    Результаты поиска общие для всех пользователей и берутся из search_cache
+    по нормализованному названию и limit, если уже запрашивались.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        url_search_video_name (str): Шаблон URL для запроса с полями {limit} и {name}
+        name (str): Название фильма
+        headers (Dict): Заголовки для запроса
+        logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        search_cache (Optional[QueryCache], optional): Кэш поиска. По умолчанию None
+        limit (int, optional): Количество фильмов в ответе. По умолчанию 10
+        timeout (Optional[int], optional): Таймаут запроса в секундах. По умолчанию
+        None - таймауты сессии
+        catalog (Optional[MovieCatalog], optional): Локальный каталог фильмов,
+        пополняемый найденными фильмами. По умолчанию None
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (Dict | None): Ответ сайта с найденными фильмами в "docs"
+            - error (str | None): Описание ошибки, если запрос завершился неудачей.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе
+    """
+    url: str = url_search_video_name.format(limit=limit, name=name)
+    if search_cache is not None:
+        cached: Optional[Dict] = await search_cache.get(name, params=(limit,))
+        if cached is not None:
+            logging_data.info_logger.info(
+                f"Кэш поиска кинопоиска: {search_cache.stats}"
+            )
+            return ResponseData(message=cached, url=url, method="GET", status=200)
+
+    video_name: ResponseData = await get_response_for_kinopoisk(
+        session=session,
+        url=url,
+        logging_data=logging_data,
+        function_name=get_video_by_name_for_kinopoisk.__name__,
+        headers=headers,
+        timeout=timeout,
+        key_pool=key_pool,
+        retry=retry,
+        schema=schema,
+    )
+    if catalog is not None and video_name.message and not video_name.error:
+        await catalog.add(video_name.message.get("docs") or [])
+    if search_cache is not None and video_name.message and not video_name.error:
+        await search_cache.set(name, video_name.message, params=(limit,))
+        logging_data.info_logger.info(f"Кэш поиска кинопоиска: {search_cache.stats}")
+    return video_name
+
+
+def get_projection_params_for_kinopoisk(
+    select_fields: Optional[List[str]] = None,
+    not_null_fields: Optional[List[str]] = None,
+) -> str:
+    """
+    Возвращает параметры URL, ограничивающие поля документов фильмов в ответе API.
+
+    Args:
+        select_fields (Optional[List[str]], optional): Поля, которые вернет API.
+        По умолчанию None - все поля
+        not_null_fields (Optional[List[str]], optional): Поля, которые должны быть
+        заполнены у возвращаемых документов. По умолчанию None
+
+    Returns:
+        str: Параметры вида &selectFields=name&notNullFields=name
+    """
+    params: str = ""
+    for field in select_fields or []:
+        params += f"&selectFields={field}"
+    for field in not_null_fields or []:
+        params += f"&notNullFields={field}"
+    return params
+
+
+async def get_pool_video_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    url_search_universal_video: str,
+    filters: str,
+    headers: Dict,
+    logging_data: LoggingData,
+    timeout: int,
+    pool_size: int = 250,
+    page_size: int = 50,
+    page_deadline: Optional[float] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Возвращает выборку фильмов из сайта https://www.kinopoisk.ru/.
+
+    Выборка из pool_size фильмов запрашивается одновременно страницами по
+    page_size фильмов. Страницы, не успевшие за page_deadline, отбрасываются,
+    если к этому времени пришла хотя бы одна страница.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        url_search_universal_video (str): Шаблон URL для запроса с полями {page} и {limit}
+        filters (str): Параметры фильтрации выборки, добавляемые к URL
+        headers (Dict): Заголовки для запроса
+        logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        timeout (int): Таймаут запроса одной страницы в секундах
+        pool_size (int, optional): Размер выборки фильмов. По умолчанию 250
+        page_size (int, optional): Количество фильмов на странице. По умолчанию 50
+        page_deadline (Optional[float], optional): Время ожидания всех страниц в
+        секундах. По умолчанию None - ждать все страницы
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (List | None): Список из словарей фильмов выборки
+            - error (str | None): Описание ошибки, если ни одна страница не пришла.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе
+    """
+    tasks: List[asyncio.Task] = [
+        asyncio.ensure_future(
+            get_response_for_kinopoisk(
+                session=session,
+                url=url_search_universal_video.format(page=page, limit=page_size)
+                + filters,
+                headers=headers,
+                timeout=timeout,
+                logging_data=logging_data,
+                function_name=get_pool_video_for_kinopoisk.__name__,
+                key_pool=key_pool,
+                retry=retry,
+                schema=schema,
+            )
+        )
+        for page in range(1, math.ceil(pool_size / page_size) + 1)
+    ]
+
+    def is_success(task: asyncio.Task) -> bool:
+        return (
+            not task.cancelled()
+            and task.exception() is None
+            and not task.result().error
+        )
+
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=page_deadline)
+        # Ни одна страница не успела - ждем первую успешную в пределах timeout
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        end_time: float = loop.time() + timeout
+        while pending and not any(is_success(task) for task in done):
+            new_done: Set[asyncio.Task]
+            new_done, pending = await asyncio.wait(
+                pending,
+                timeout=max(0, end_time - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not new_done:
+                break
+            done |= new_done
+    finally:
+        # Медленные страницы отбрасываем
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    array_recommender: List = []
+    for task in tasks:
+        if task in done and is_success(task):
+            array_recommender.extend(task.result().message.get("docs"))
+
+    if not array_recommender:
+        # Возвращаем ошибку первой завершившейся страницы
+        for task in tasks:
+            if task in done and not task.cancelled() and task.exception() is None:
+                return task.result()
+        return ResponseData(
+            error=messages.TIMEOUT_ERROR,
+            status=0,
+            url=url_search_universal_video,
+            method="GET",
+        )
+
+    return ResponseData(
+        message=array_recommender,
+        url=url_search_universal_video,
+        method="GET",
+        status=200,
+    )
 
 
 async def get_recommender_video_for_kinopoisk(
@@ -17,20 +336,73 @@ async def get_recommender_video_for_kinopoisk(
     headers: Dict,
     logging_data: LoggingData,
     timeout: int,
+    pool_size: int = 250,
+    page_size: int = 50,
+    page_deadline: Optional[float] = None,
+    pool_cache: Optional[StaleWhileRevalidateCache] = None,
+    select_fields: Optional[List[str]] = None,
+    not_null_fields: Optional[List[str]] = None,
+    catalog: Optional[MovieCatalog] = None,
+    catalog_min_size: int = 100,
+    catalog_max_age: Optional[int] = None,
+    seed: Optional[Dict] = None,
+    ranking_weights: Optional[Dict[str, float]] = None,
+    ranking_diversity: float = 0.15,
+    cursor: Optional[Dict] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
 ) -> ResponseData:
-    aiohttp.ClientSession
     """
     Возвращает рекомендованные фильмы из сайта  https://www.kinopoisk.ru/.
 
+    Если в catalog достаточно подходящих фильмов, рекомендация составляется
+    из него без запросов к API. Иначе выборка фильмов запрашивается через
+    get_pool_video_for_kinopoisk или берется из pool_cache и пополняет catalog.
+    Из выборки выбирается limit фильмов, похожих на seed, или случайных.
+
     Args:
         session (aiohttp.ClientSession): Сессия для запроса
-        url_search_universal_video (str): URL для запроса
+        url_search_universal_video (str): Шаблон URL для запроса с полями {page} и {limit}
         list_genres (List): Список жанров фильма
         limit (int): Количество выдаваемых фильмов
         type_video (str): Тип видео
         rating (str): Рейтинг видео
         headers (Dict): Заголовки для запроса
         logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        timeout (int): Таймаут запроса одной страницы в секундах
+        pool_size (int, optional): Размер выборки фильмов. По умолчанию 250
+        page_size (int, optional): Количество фильмов на странице. По умолчанию 50
+        page_deadline (Optional[float], optional): Время ожидания всех страниц в
+        секундах. По умолчанию None - ждать все страницы
+        pool_cache (Optional[StaleWhileRevalidateCache], optional): Общий кэш
+        выборок фильмов. По умолчанию None
+        select_fields (Optional[List[str]], optional): Поля документов фильмов,
+        запрашиваемые у API. По умолчанию None - все поля
+        not_null_fields (Optional[List[str]], optional): Поля, обязательные для
+        документов фильмов. По умолчанию None
+        catalog (Optional[MovieCatalog], optional): Локальный каталог фильмов.
+        По умолчанию None
+        catalog_min_size (int, optional): Минимальное количество подходящих
+        фильмов в каталоге, при котором API не запрашивается. По умолчанию 100
+        catalog_max_age (Optional[int], optional): Максимальный возраст фильмов
+        каталога в секундах. По умолчанию None - любой
+        seed (Optional[Dict], optional): Документ исходного фильма. Если передан,
+        фильмы выбираются по похожести на него через rank_candidates, иначе
+        случайно. По умолчанию None
+        ranking_weights (Optional[Dict[str, float]], optional): Веса признаков
+        для rank_candidates. По умолчанию None - DEFAULT_WEIGHTS
+        ranking_diversity (float, optional): Доля разнообразия для
+        rank_candidates. По умолчанию 0.15
+        cursor (Optional[Dict], optional): Словарь, в который записывается курсор
+        продолжения выборки для get_next_page_video_for_kinopoisk: фильтры
+        (filters) и следующая страница(page). По умолчанию None
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
 
     Returns:
         ResponseData: Объект с результатом запроса.
@@ -50,31 +422,382 @@ async def get_recommender_video_for_kinopoisk(
     if len(array_genres) > 1:
         array_genres = random.sample(array_genres, 2)
 
+    # Фильтры одинаковые для всех страниц выборки
+    filters: str = ""
     for genre in array_genres:
-        url_search_universal_video: str = (
-            url_search_universal_video + f"&genres.name={genre}"
+        filters += f"&genres.name={genre}"
+    filters += f"&type={type_video}"
+    filters += f"&rating.kp={rating}"
+    # Запрашиваем только выводимые поля - меньше ответ и данные в состоянии FSM
+    filters += get_projection_params_for_kinopoisk(
+        select_fields=select_fields,
+        not_null_fields=not_null_fields,
+    )
+    # Пока выборка не получена из API, продолжать ее нужно с первой страницы
+    if cursor is not None:
+        cursor.update(filters=filters, page=1)
+
+    def choose(movies: List[Dict]) -> List[Dict]:
+        if seed is not None:
+            return rank_candidates(
+                seed=seed,
+                candidates=movies,
+                limit=limit,
+                weights=ranking_weights,
+                diversity=ranking_diversity,
+            )
+        # Копируем выборку, чтобы не перемешивать общую выборку из кэша
+        movies = list(movies)
+        random.shuffle(movies)
+        return movies[:limit]
+
+    async def find_in_catalog() -> List[Dict]:
+        return await catalog.find(
+            genres=array_genres,
+            type_video=type_video,
+            rating=rating,
+            max_age=catalog_max_age,
+            limit=pool_size,
         )
-        # url = url + f"&genres.name={genre}"
 
-    url_search_universal_video += f"&type={type_video}"
-    url_search_universal_video += f"&rating.kp={rating}"
+    # Документы каталога читаются, только если подходящих фильмов достаточно
+    if catalog is not None:
+        count: int = await catalog.count(
+            genres=array_genres,
+            type_video=type_video,
+            rating=rating,
+            max_age=catalog_max_age,
+        )
+        if count >= catalog_min_size:
+            return ResponseData(
+                message=choose(await find_in_catalog()),
+                url=url_search_universal_video,
+                method="GET",
+                status=200,
+            )
 
-    array_recommender: ResponseData = await error_handler_for_the_website(
-        session=session,
+    async def get_pool() -> ResponseData:
+        pool: ResponseData = await get_pool_video_for_kinopoisk(
+            session=session,
+            url_search_universal_video=url_search_universal_video,
+            filters=filters,
+            headers=headers,
+            logging_data=logging_data,
+            timeout=timeout,
+            pool_size=pool_size,
+            page_size=page_size,
+            page_deadline=page_deadline,
+            key_pool=key_pool,
+            retry=retry,
+            schema=schema,
+        )
+        # Пополняем каталог фильмами выборки
+        if catalog is not None and not pool.error:
+            await catalog.add(pool.message)
+        return pool
+
+    # Выборка зависит только от пары жанров, типа и рейтинга - берем ее из
+    # общего кэша, если ее уже запрашивали
+    if pool_cache is not None:
+        pool: ResponseData = await pool_cache.get(
+            key=(tuple(sorted(array_genres)), type_video, rating),
+            fetch=get_pool,
+            is_valid=lambda response: not response.error,
+        )
+    else:
+        pool = await get_pool()
+    if pool.error:
+        # Сайт недоступен - отвечаем хотя бы фильмами из каталога
+        movies: List[Dict] = await find_in_catalog() if catalog is not None else []
+        if movies:
+            logging_data.warning_logger.warning(
+                f"Рекомендация из каталога без запроса к сайту: {pool.error}"
+            )
+            return ResponseData(
+                message=choose(movies),
+                url=url_search_universal_video,
+                method="GET",
+                status=200,
+            )
+        return pool
+    if cursor is not None:
+        cursor["page"] = math.ceil(pool_size / page_size) + 1
+
+    return ResponseData(
+        message=choose(pool.message),
         url=url_search_universal_video,
-        headers=headers,
-        timeout=timeout,
-        logging_data=logging_data,
-        function_name=get_recommender_video_for_kinopoisk.__name__,
+        method="GET",
+        status=200,
     )
-    if array_recommender.error:
-        return array_recommender
 
-    array_recommender = array_recommender.message.get("docs")
-    random.shuffle(array_recommender)
 
+async def get_recommender_video_by_ratings_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    url_search_universal_video: str,
+    list_genres: List,
+    limit: int,
+    type_video: str,
+    ratings: List[str],
+    headers: Dict,
+    logging_data: LoggingData,
+    timeout: int,
+    deadline: float,
+    pool_size: int = 250,
+    page_size: int = 50,
+    page_deadline: Optional[float] = None,
+    pool_cache: Optional[StaleWhileRevalidateCache] = None,
+    select_fields: Optional[List[str]] = None,
+    not_null_fields: Optional[List[str]] = None,
+    catalog: Optional[MovieCatalog] = None,
+    catalog_min_size: int = 100,
+    catalog_max_age: Optional[int] = None,
+    seed: Optional[Dict] = None,
+    ranking_weights: Optional[Dict[str, float]] = None,
+    ranking_diversity: float = 0.15,
+    cursors: Optional[List[Dict]] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Возвращает рекомендованные фильмы для нескольких диапазонов рейтинга одновременно.
+
+    Запросы по всем диапазонам выполняются одновременно с общим ограничением
+    по времени deadline. Диапазоны, не успевшие за deadline или завершившиеся
+    ошибкой, не попадают в результат.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        url_search_universal_video (str): URL для запроса
+        list_genres (List): Список жанров фильма
+        limit (int): Количество выдаваемых фильмов для одного диапазона
+        type_video (str): Тип видео
+        ratings (List[str]): Диапазоны рейтинга видео(например ["6-10", "1-5"])
+        headers (Dict): Заголовки для запроса
+        logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        timeout (int): Таймаут одного запроса в секундах
+        deadline (float): Общее время ожидания всех диапазонов в секундах
+        pool_size (int, optional): Размер выборки фильмов для одного диапазона.
+        По умолчанию 250
+        page_size (int, optional): Количество фильмов на странице. По умолчанию 50
+        page_deadline (Optional[float], optional): Время ожидания страниц одного
+        диапазона в секундах. По умолчанию None - ждать все страницы
+        pool_cache (Optional[StaleWhileRevalidateCache], optional): Общий кэш
+        выборок фильмов. По умолчанию None
+        select_fields (Optional[List[str]], optional): Поля документов фильмов,
+        запрашиваемые у API. По умолчанию None - все поля
+        not_null_fields (Optional[List[str]], optional): Поля, обязательные для
+        документов фильмов. По умолчанию None
+        catalog (Optional[MovieCatalog], optional): Локальный каталог фильмов.
+        По умолчанию None
+        catalog_min_size (int, optional): Минимальное количество подходящих
+        фильмов в каталоге, при котором API не запрашивается. По умолчанию 100
+        catalog_max_age (Optional[int], optional): Максимальный возраст фильмов
+        каталога в секундах. По умолчанию None - любой
+        seed (Optional[Dict], optional): Документ исходного фильма. Если передан,
+        фильмы выбираются по похожести на него через rank_candidates, иначе
+        случайно. По умолчанию None
+        ranking_weights (Optional[Dict[str, float]], optional): Веса признаков
+        для rank_candidates. По умолчанию None - DEFAULT_WEIGHTS
+        ranking_diversity (float, optional): Доля разнообразия для
+        rank_candidates. По умолчанию 0.15
+        cursors (Optional[List[Dict]], optional): Список, в который добавляются
+        курсоры продолжения выборки каждого диапазона в порядке ratings, в том
+        числе не успевших за deadline. По умолчанию None
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (List | None): Общий список рекомендованных фильмов по всем
+              успевшим диапазонам в порядке ratings
+            - error (str | None): Ошибка первого диапазона, если ни один диапазон
+              не вернул фильмы. TIMEOUT_ERROR если ни один не успел за deadline.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе
+    """
+    func = safe_async_execution(logging_data=logging_data)(
+        get_recommender_video_for_kinopoisk
+    )
+    band_cursors: List[Dict] = [{} for _ in ratings]
+    tasks: List[asyncio.Task] = [
+        asyncio.ensure_future(
+            func(
+                session,
+                url_search_universal_video,
+                list_genres,
+                limit,
+                type_video,
+                rating,
+                headers,
+                logging_data,
+                timeout,
+                pool_size,
+                page_size,
+                page_deadline,
+                pool_cache,
+                select_fields,
+                not_null_fields,
+                catalog,
+                catalog_min_size,
+                catalog_max_age,
+                seed,
+                ranking_weights,
+                ranking_diversity,
+                cursor,
+                key_pool,
+                retry,
+                schema,
+            )
+        )
+        for rating, cursor in zip(ratings, band_cursors)
+    ]
+    try:
+        await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        # Диапазоны не успевшие за deadline отбрасываем
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    recommender_video_list: List = []
+    errors: List[ResponseData] = []
+    for rating, task in zip(ratings, tasks):
+        if task.cancelled() or not task.done():
+            logging_data.warning_logger.warning(
+                f"Диапазон рейтинга {rating} не успел за {deadline} секунд"
+            )
+            errors.append(
+                ResponseData(
+                    error=messages.TIMEOUT_ERROR,
+                    status=0,
+                    url=url_search_universal_video,
+                    method="GET",
+                )
+            )
+            continue
+
+        response: ResponseData = task.result()
+        if response.error:
+            errors.append(response)
+        else:
+            recommender_video_list.extend(response.message)
+
+    if cursors is not None:
+        cursors.extend(cursor for cursor in band_cursors if cursor)
+
+    if not recommender_video_list and errors:
+        return errors[0]
+
+    return ResponseData(
+        message=recommender_video_list,
+        url=url_search_universal_video,
+        method="GET",
+        status=200,
+    )
+
+
+async def get_next_page_video_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    url_search_universal_video: str,
+    cursors: List[Dict],
+    headers: Dict,
+    logging_data: LoggingData,
+    timeout: int,
+    page_size: int = 50,
+    exclude_ids: Optional[Set[int]] = None,
+    catalog: Optional[MovieCatalog] = None,
+    key_pool: Optional[ApiKeyPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+) -> ResponseData:
+    """
+    Возвращает фильмы следующей страницы выборки рекомендаций.
+
+    Курсоры перебираются по порядку, у первого неисчерпанного курсора
+    запрашивается страница cursor["page"]. Если на странице нет новых фильмов,
+    запрашивается страница следующего курсора. Курсоры изменяются на месте:
+    page увеличивается, в pages записывается количество страниц выборки.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        url_search_universal_video (str): Шаблон URL для запроса с полями {page} и {limit}
+        cursors (List[Dict]): Курсоры выборок из get_recommender_video_for_kinopoisk
+        headers (Dict): Заголовки для запроса
+        logging_data (LoggingData): Обьект класса LoggingData сорежащий логгер и имя роутера
+        timeout (int): Таймаут запроса в секундах
+        page_size (int, optional): Количество фильмов на странице, должно совпадать
+        с размером страниц выборки. По умолчанию 50
+        exclude_ids (Optional[Set[int]], optional): id уже показанных фильмов.
+        По умолчанию None
+        catalog (Optional[MovieCatalog], optional): Локальный каталог фильмов,
+        пополняемый фильмами страницы. По умолчанию None
+        key_pool (Optional[ApiKeyPool], optional): Пул ключей API. По умолчанию
+        None - ключ передается в headers
+        retry (Optional[RetryPolicy], optional): Политика повторов запроса при
+        временных ошибках. По умолчанию None
+        schema (Optional[Dict], optional): Поля ответа API, которые нужно
+        оставить. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Объект с результатом запроса.
+
+        Атрибуты ResponseData:
+            - message (List | None): Список новых фильмов, пустой если все
+              курсоры исчерпаны
+            - error (str | None): Ошибка последнего запроса, если новых фильмов нет.
+            - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
+            - url (str): URL, по которому выполнялся запрос.
+            - method (str): HTTP-метод, использованный при запросе
+    """
+    exclude_ids = exclude_ids or set()
+    error: Optional[ResponseData] = None
+    for cursor in cursors:
+        if cursor.get("pages") is not None and cursor["page"] > cursor["pages"]:
+            continue
+
+        response: ResponseData = await get_response_for_kinopoisk(
+            session=session,
+            url=url_search_universal_video.format(page=cursor["page"], limit=page_size)
+            + cursor["filters"],
+            headers=headers,
+            timeout=timeout,
+            logging_data=logging_data,
+            function_name=get_next_page_video_for_kinopoisk.__name__,
+            key_pool=key_pool,
+            retry=retry,
+            schema=schema,
+        )
+        if response.error:
+            error = response
+            continue
+
+        cursor["page"] += 1
+        cursor["pages"] = response.message.get("pages", 0)
+        docs: List[Dict] = response.message.get("docs") or []
+        if catalog is not None:
+            await catalog.add(docs)
+
+        movies: List[Dict] = [doc for doc in docs if doc.get("id") not in exclude_ids]
+        if movies:
+            return ResponseData(
+                message=movies,
+                url=url_search_universal_video,
+                method="GET",
+                status=200,
+            )
+
+    if error is not None:
+        return error
     return ResponseData(
-        message=array_recommender[:limit],
+        message=[],
         url=url_search_universal_video,
         method="GET",
         status=200,
@@ -1,13 +1,35 @@
-import aiohttp
+import asyncio
 
-from bot.extension import bot, dp, bot_settings, main_logger, models_settings
+from bot.extension import (
+    bot,
+    dp,
+    bot_settings,
+    main_logger,
+    models_settings,
+    discogs_cache,
+    discogs_snapshots,
+    discogs_release_map,
+    discogs_jobs,
+    kinopoisk_cache,
+    kinopoisk_catalog,
+    kinopoisk_key_pool,
+    discogs_rate_limiter,
+    discogs_single_flight,
+    music_logger,
+)
 from bot.views import main_router
+from bot.functions.music.prewarm import run_prewarm_scheduler_for_discogs
+from bot.views.music.new_music_items.discogs import resume_album_crawls_for_discogs
 from app_utils.filesistem import ensure_derictories
+from settings.response import circuit_breakers, app_settings, http_cache
+from app_utils.http import create_client_session
 
 # создаем общие пути
 ensure_derictories(
     bot_settings.PATH_BOT_STATIC_FOLDER,
     models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FOLDER_DEFOLT_IMAGE_KINOPOISK,
+    models_settings.music_models.new_music.discogs.PATH_TO_FOLDER_CACHE_DISCOGS,
+    models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FOLDER_CACHE_KINOPOISK,
 )
 
 
@@ -24,16 +46,71 @@ async def run_rec_content_bot():
 
         dp.include_router(main_router)
 
-        # Создаем глобальную сессию для всего бота. Будет доступ в роутерах через
-        # название указанное ниже
-        async with aiohttp.ClientSession() as session:
+        discogs_setting = models_settings.music_models.new_music.discogs
+        kinopoisk_setting = models_settings.video_models.viewing_advice.kinopoisk
+
+        # Создаем сессии бота со своим пулом соединений для каждого сервиса.
+        # Будет доступ в роутерах через названия указанные ниже. Роутеры
+        # сервисов получают свою сессию под именем session(ServiceSessionMiddleware)
+        async with create_client_session(
+            app_settings.HTTP_CLIENT
+        ) as session, create_client_session(
+            discogs_setting.HTTP_CLIENT
+        ) as discogs_session, create_client_session(
+            kinopoisk_setting.HTTP_CLIENT
+        ) as kinopoisk_session:
             dp["session"] = session
+            dp["discogs_session"] = discogs_session
+            dp["kinopoisk_session"] = kinopoisk_session
+
+            # Фоновый прогрев списков альбомов discogs для всех стилей
+            prewarm_task = None
+            if discogs_setting.PREWARM_ENABLED:
+                prewarm_task = asyncio.create_task(
+                    run_prewarm_scheduler_for_discogs(
+                        discogs_setting=discogs_setting,
+                        session=discogs_session,
+                        logging_data=music_logger,
+                        rate_limiter=discogs_rate_limiter,
+                        cache=discogs_cache,
+                        snapshots=discogs_snapshots,
+                        single_flight=discogs_single_flight,
+                        release_map=discogs_release_map,
+                        jobs=discogs_jobs,
+                    )
+                )
+
+            # Продолжаем обходы discogs, прерванные перезапуском бота
+            resume_task = asyncio.create_task(
+                resume_album_crawls_for_discogs(session=discogs_session)
+            )
 
             main_logger.info_logger.info(msg=f"{bot_settings.BOT_NAME} запущен")
 
-            await dp.start_polling(bot)
+            try:
+                await dp.start_polling(bot)
+            finally:
+                main_logger.info_logger.info(
+                    msg=f"Выключатели запросов: {circuit_breakers.stats}"
+                )
+                main_logger.info_logger.info(
+                    msg=f"Кэш HTTP-ответов: {http_cache.stats}"
+                )
+                resume_task.cancel()
+                if prewarm_task:
+                    prewarm_task.cancel()
 
     except Exception as err:
         main_logger.error_logger.exception(
             f"Критическая ошибка при работа бота {bot_settings.BOT_NAME}: {err}"
         )
+    finally:
+        discogs_cache.close()
+        discogs_snapshots.close()
+        discogs_release_map.close()
+        discogs_jobs.close()
+        kinopoisk_cache.close()
+        kinopoisk_key_pool.close()
+        http_cache.close()
+        if kinopoisk_catalog:
+            kinopoisk_catalog.close()
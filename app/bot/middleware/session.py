@@ -0,0 +1,24 @@
+from typing import Optional, Any
+
+from aiogram import BaseMiddleware
+
+
+class ServiceSessionMiddleware(BaseMiddleware):
+    """Middleware подставляющий в хендлеры routera сессию его сервиса."""
+
+    def __init__(self, session_name: str) -> None:
+        """
+        Инициализация параметров.
+
+        Args:
+            session_name (str): Имя сессии сервиса в диспетчере(dp[session_name])
+        """
+        super().__init__()
+        self.session_name: str = session_name
+
+    async def __call__(self, handler, event, data) -> Optional[Any]:
+        """Заменяет общую сессию session на сессию сервиса, если она создана."""
+        session = data.get(self.session_name)
+        if session is not None:
+            data["session"] = session
+        return await handler(event, data)
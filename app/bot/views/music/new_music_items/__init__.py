@@ -1,5 +1,12 @@
 from bot.views.music.new_music_items.new_music import router as new_music_router
 from bot.views.music.new_music_items.discogs import router as new_music_discogs_router
+from bot.middleware.session import ServiceSessionMiddleware
 
 
 new_music_router.include_router(new_music_discogs_router)
+
+# Хендлеры discogs получают сессию с пулом соединений discogs
+new_music_discogs_router.message.middleware(ServiceSessionMiddleware("discogs_session"))
+new_music_discogs_router.callback_query.middleware(
+    ServiceSessionMiddleware("discogs_session")
+)
@@ -7,19 +7,40 @@ from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, InputMedi
 from aiogram.filters.state import StateFilter
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
 import aiohttp
 
-from bot.extension import models_settings, music_logger, bot, get_button_start_bot_menu
+from bot.extension import (
+    models_settings,
+    music_logger,
+    bot,
+    get_button_start_bot_menu,
+    discogs_rate_limiter,
+    discogs_cache,
+    discogs_snapshots,
+    discogs_single_flight,
+    discogs_release_map,
+    discogs_jobs,
+    dp,
+)
 from bot.functions.music.new_music import (
-    get_list_albums_for_discogs,
     get_descripions_for_albums,
+    get_search_albums_for_discogs,
+    get_album_details_for_discogs,
+    prefetch_album_details_for_discogs,
+)
+from bot.functions.music.prewarm import (
+    get_snapshot_albums_for_discogs,
+    get_snapshot_key_for_discogs,
+    get_flight_key_for_discogs,
+    crawl_albums_for_discogs,
 )
 from app_utils.keyboards import (
     get_total_buttons_inline_kb,
     get_button_for_forward_or_back,
     get_reply_cancel_button,
 )
-from app_utils.fsm import async_make_update_progress
+from app_utils.single_flight import Flight
 from error_handlers.decorator import safe_async_execution
 from core.response import InlineKeyboardData, ResponseData
 from settings.response import messages
@@ -172,6 +193,174 @@ async def get_message_for_cancel_new_music_discogs_handler(
     await message.reply(text=messages.WAIT_AND_CANCEL_MESSAGE)
 
 
+async def send_albums_for_discogs(
+    chat_id: int,
+    state: FSMContext,
+    albums_list: List,
+) -> Message:
+    """
+    Работа с FSMNewMusicDiscogs.
+
+    Отправляет пользователю первый альбом с кнопками для пролистывания и встает
+    в состояние albums_list. Возвращает сообщение с альбомом.
+    """
+    album_artist: Dict = albums_list[0].dict()  # достаем первый альбом
+    img: str = album_artist["IMG"]  # url картинки
+
+    result: ResponseData = get_descripions_for_albums(
+        album_artist
+    )  # описание альбома
+    album: str = result.message
+
+    album_message: Message = await bot.send_photo(
+        chat_id=chat_id,
+        photo=img,
+        caption=album,
+        reply_markup=get_button_for_forward_or_back(
+            list_albums=albums_list, count=0, step=1, prefix="discogs"
+        ),
+    )
+    await bot.send_message(
+        chat_id=chat_id,
+        text=messages.MENU_CANCEL_MESSAGE,
+        reply_markup=get_reply_cancel_button(),
+    )
+    # Встаем в состояние albums_list для дальнейшего пролистывания албомов
+    await state.set_state(FSMNewMusicDiscogs.albums_list)
+    await state.update_data(albums_list=albums_list, albums_count=0)
+    return album_message
+
+
+async def update_albums_for_discogs(
+    chat_id: int,
+    state: FSMContext,
+    album_message: Message,
+    albums_list: List,
+) -> None:
+    """
+    Работа с FSMNewMusicDiscogs.
+
+    Заменяет список альбомов для пролистывания и обновляет кнопки у
+    показанного пользователю альбома.
+    """
+    data: Dict = await state.get_data()
+    old_albums_list: List = data.get("albums_list", [])
+    count: int = data.get("albums_count", 0)
+
+    # Находим показанный альбом в новом списке(порядок мог измениться)
+    if count < len(old_albums_list) and old_albums_list[count] in albums_list:
+        count = albums_list.index(old_albums_list[count])
+
+    await state.update_data(albums_list=albums_list, albums_count=count)
+    try:
+        await bot.edit_message_reply_markup(
+            chat_id=chat_id,
+            message_id=album_message.message_id,
+            reply_markup=get_button_for_forward_or_back(
+                list_albums=albums_list, count=count, prefix="discogs"
+            ),
+        )
+    except Exception as err:
+        # Кнопки не изменились - это не ошибка
+        if "message is not modified" not in str(err):
+            music_logger.error_logger.exception(
+                f"Не удалось обновить кнопки альбома в чате {chat_id}: {err}"
+            )
+
+
+async def get_lazy_albums_for_discogs(
+    call: CallbackQuery,
+    state: FSMContext,
+    session: aiohttp.ClientSession,
+    genre: str,
+    year: int,
+) -> None:
+    """
+    Работа с FSMNewMusicDiscogs.
+
+    Отправляет пользователю альбомы, найденные одним запросом поиска.
+    Подробности первого альбома загружаются сразу, следующих - заранее в фоне.
+    """
+    discogs_setting = models_settings.music_models.new_music.discogs
+
+    await bot.send_message(
+        chat_id=call.message.chat.id,
+        text=messages.WAIT_MESSAGE,
+        reply_markup=get_reply_cancel_button(),
+    )
+
+    # Оборочиваем функцию в декоратор для отлова всех возможных ошибок
+    decorator_funtion = safe_async_execution(
+        logging_data=music_logger,
+    )
+    func = decorator_funtion(get_search_albums_for_discogs)
+    data: ResponseData = await func(
+        style=genre,
+        per_page=discogs_setting.COUNT_ALBUMS_SEARCH,
+        url=discogs_setting.URL_SEARCH,
+        year=year,
+        discogs_setting=discogs_setting,
+        session=session,
+        logging_data=music_logger,
+        rate_limiter=discogs_rate_limiter,
+    )
+
+    # Пользователь нажал кнопку отмены во время запроса
+    if (await state.get_data()).get("cancel", None):
+        await bot.send_message(
+            chat_id=call.message.chat.id,
+            text=messages.BUTTON_CANCEL_MESSAGE,
+            reply_markup=ReplyKeyboardRemove(),
+        )
+        await state.clear()
+        await call.message.answer(
+            text=messages.START_BOT_MESSAGE,
+            reply_markup=get_button_start_bot_menu,
+        )
+        return
+
+    if data.error or not data.message:
+        await state.clear()
+        await bot.send_message(
+            chat_id=call.message.chat.id,
+            text=str(data.error or messages.NOT_FOUND_ALBUMS_MESSAGE),
+            reply_markup=ReplyKeyboardRemove(),
+        )
+        await call.message.answer(
+            text=messages.START_BOT_MESSAGE,
+            reply_markup=get_button_start_bot_menu,
+        )
+        return
+
+    albums_list: List = data.message
+    albums_list[0] = await get_album_details_for_discogs(
+        album=albums_list[0],
+        discogs_setting=discogs_setting,
+        session=session,
+        logging_data=music_logger,
+        rate_limiter=discogs_rate_limiter,
+        cache=discogs_cache,
+        single_flight=discogs_single_flight,
+        release_map=discogs_release_map,
+    )
+    prefetch_album_details_for_discogs(
+        albums_list=albums_list,
+        start=1,
+        discogs_setting=discogs_setting,
+        session=session,
+        logging_data=music_logger,
+        rate_limiter=discogs_rate_limiter,
+        cache=discogs_cache,
+        single_flight=discogs_single_flight,
+        release_map=discogs_release_map,
+    )
+    await send_albums_for_discogs(
+        chat_id=call.message.chat.id,
+        state=state,
+        albums_list=albums_list,
+    )
+
+
 @router.callback_query(F.data.startswith("nm_discogs+"))
 async def get_album_artists_by_genre_for_site_discogs(
     call: CallbackQuery, state: FSMContext, session: aiohttp.ClientSession
@@ -179,10 +368,41 @@ async def get_album_artists_by_genre_for_site_discogs(
     """Возвращает найденных исполнителей для discogs и кнопки назад и вперед."""
     await call.message.delete_reply_markup()
 
+    # Получаем жанр, год и необходимое количество альбомов для поиске
+    _, genre = call.data.split("+")
+    year: int = datetime.now().year
+
+    # Если фоновый прогрев уже собрал альбомы для жанра - отдаем их сразу
+    snapshot: Optional[List] = await get_snapshot_albums_for_discogs(
+        snapshots=discogs_snapshots,
+        style=genre,
+        year=year,
+        discogs_setting=models_settings.music_models.new_music.discogs,
+    )
+    if snapshot:
+        await send_albums_for_discogs(
+            chat_id=call.message.chat.id,
+            state=state,
+            albums_list=snapshot,
+        )
+        return
+
     # Встаем в состояние cancel для того чтобы отправлять сообщение пользователю если
     # он ввел текст при запросе и для отмены запроса
     await state.set_state(FSMNewMusicDiscogs.cancel)
 
+    # Строим список по результатам поиска, подробности альбомов загружаем
+    # при пролистывании
+    if models_settings.music_models.new_music.discogs.LAZY_DETAILS:
+        await get_lazy_albums_for_discogs(
+            call=call,
+            state=state,
+            session=session,
+            genre=genre,
+            year=year,
+        )
+        return
+
     await bot.send_message(
         chat_id=call.message.chat.id,
         text=messages.WAIT_LONG_RESPONSE_MESSAGE.format(
@@ -191,34 +411,51 @@ async def get_album_artists_by_genre_for_site_discogs(
         ),
         reply_markup=get_reply_cancel_button(),
     )
-    # Получаем жанр, год и необходимое количество альбомов для поиске
-    _, genre = call.data.split("+")
-    year: int = datetime.now().year
     total_count_album: int = (
         models_settings.music_models.new_music.discogs.COUNT_ALBUMS_SEARCH
     )
-
-    # Функция для отслеживания прогресса
-    update_progress = async_make_update_progress(state=state)
+    # Обход останавливается после TARGET_COUNT_ALBUMS разных альбомов
+    target_count_album: int = (
+        models_settings.music_models.new_music.discogs.TARGET_COUNT_ALBUMS
+        or total_count_album
+    )
 
     # Оборочиваем функцию в декоратор для отлова всех возможных ошибок
     decorator_funtion = safe_async_execution(
         logging_data=music_logger,
     )
-    func = decorator_funtion(get_list_albums_for_discogs)
-
-    # Формируем Task для отслеживания прогресса и возможности отмены задачи
-    progress_task = asyncio.create_task(
-        func(
+    func = decorator_funtion(crawl_albums_for_discogs)
+
+    # Присоединяемся к уже идущему обходу жанра или запускаем новый Task.
+    # Прогресс и результат обхода общие для всех пользователей выбравших жанр
+    flight: Flight = discogs_single_flight.subscribe(
+        key=get_flight_key_for_discogs(
+            style=genre,
+            year=year,
+            per_page=total_count_album,
+        ),
+        factory=lambda flight: func(
             genre,
-            total_count_album,
-            models_settings.music_models.new_music.discogs.URL_SEARCH,
             year,
-            update_progress,
+            flight.update_progress,
             models_settings.music_models.new_music.discogs,
             session,
             music_logger,
-        )
+            discogs_rate_limiter,
+            discogs_cache,
+            discogs_snapshots,
+            flight.add_item,
+            discogs_release_map,
+            discogs_jobs,
+        ),
+    )
+
+    # Запоминаем чат, чтобы отправить результат и после перезапуска бота
+    job_key: str = get_snapshot_key_for_discogs(style=genre, year=year)
+    await discogs_jobs.add_chat(
+        key=job_key,
+        chat_id=call.message.chat.id,
+        user_id=call.from_user.id,
     )
 
     # Формируем сообщение пользователю во время обработки запроса
@@ -228,25 +465,45 @@ async def get_album_artists_by_genre_for_site_discogs(
 
     # Текущий прогресс скачивания
     current_progress: int = 0
+    # Сообщение с альбомом и количество показанных альбомов
+    album_message: Optional[Message] = None
+    count_albums: int = 0
 
     # Встаем в цикл пока Task не завершится
-    while not progress_task.done():
+    cancel: bool = False
+    while not flight.task.done():
         data: Dict = await state.get_data()
 
-        # если пользователь нажал кнопку отмены
-        if data.get("cancel", None):
-            progress_task.cancel()
-
-            # позволяем task завершится корректно
-            try:
-                await progress_task
-            except asyncio.CancelledError:
-                pass
+        # если пользователь нажал кнопку отмены - отписываемся от обхода.
+        # Обход остановится только если его больше никто не ждет
+        if data.get("cancel", None) or (
+            album_message and await state.get_state() is None
+        ):
+            discogs_single_flight.unsubscribe(flight)
+            cancel = True
             # Выходим из цикла
             break
 
-        digit: int = data.get("data_state", 0)  # сколько альбомов загружено
-        percent: int = round((digit / total_count_album) * 100)  # количество прогресса
+        # Показываем первый найденный альбом сразу, остальные добавляем
+        # в список для пролистывания по мере получения
+        if len(flight.items) > count_albums:
+            count_albums = len(flight.items)
+            if album_message is None:
+                album_message = await send_albums_for_discogs(
+                    chat_id=call.message.chat.id,
+                    state=state,
+                    albums_list=list(flight.items),
+                )
+            else:
+                await update_albums_for_discogs(
+                    chat_id=call.message.chat.id,
+                    state=state,
+                    album_message=album_message,
+                    albums_list=list(flight.items),
+                )
+
+        digit: int = flight.progress  # сколько альбомов загружено
+        percent: int = round((digit / target_count_album) * 100)  # количество прогресса
         # в процентах
         try:
             # Обновляем прогресс если не равны
@@ -259,25 +516,20 @@ async def get_album_artists_by_genre_for_site_discogs(
             print(err)
         await asyncio.sleep(2)
 
-    # Получаем все альбомы
-    data = await progress_task
+    # Результат обхода больше не нужно отправлять после перезапуска
+    await discogs_jobs.remove_chat(key=job_key, chat_id=call.message.chat.id)
 
     # Проверяем на состояние отмены
-    cancel: Dict = await state.get_data()
-    if cancel.get("cancel", None):
+    if cancel:
+        # Если альбомы уже показывались - отмена обработана в cancel_new_music_discogs_handler
+        if album_message:
+            return
 
-        # Отправляем пользователю сообщения для ожидания отмены всех задач
         await bot.send_message(
             chat_id=call.message.chat.id,
             text=messages.BUTTON_CANCEL_MESSAGE,
             reply_markup=ReplyKeyboardRemove(),
         )
-
-        # Ждем пока отменятся все таски чтобы корректно сделать state.clear
-        while not progress_task.done():
-            await bot.send_chat_action(call.message.chat.id, "typing")
-            await asyncio.sleep(0.5)
-
         await state.clear()
         await bot.send_message(
             chat_id=call.message.chat.id,
@@ -287,57 +539,94 @@ async def get_album_artists_by_genre_for_site_discogs(
             text=messages.START_BOT_MESSAGE,
             reply_markup=get_button_start_bot_menu,
         )
-    else:
-        # Проверяем что запрос прошел успешно
-        if data.message:
-
-            album_artist: Dict = data.message[0].dict()  # достаем первый альбом
-            img: str = album_artist["IMG"]  # url картинки
+        return
 
-            result: ResponseData = get_descripions_for_albums(
-                album_artist
-            )  # описание альбома
-            album: str = result.message
+    # Получаем все альбомы
+    data: Optional[ResponseData] = await discogs_single_flight.wait(flight)
+    discogs_single_flight.unsubscribe(flight)
 
-            await bot.send_message(
-                chat_id=call.message.chat.id,
-                text=messages.END_RESPONSE_MESSAGE,
+    # Проверяем что запрос прошел успешно
+    if data and isinstance(data.message, list) and data.message:
+        try:
+            await progress_message.edit_text(text=messages.END_RESPONSE_MESSAGE)
+        except Exception as err:
+            music_logger.error_logger.exception(
+                f"Не удалось обновить сообщение о прогрессе: {err}"
             )
-            # Ставим на засыпание чтобы пользователь сперва увидел сообщение о загрузке
-            await asyncio.sleep(1)
 
-            await bot.send_photo(
+        # Применяем итоговую сортировку по дате выхода
+        if album_message:
+            await update_albums_for_discogs(
                 chat_id=call.message.chat.id,
-                photo=img,
-                caption=album,
-                reply_markup=get_button_for_forward_or_back(
-                    list_albums=album_artist, count=0, step=1, prefix="discogs"
-                ),
+                state=state,
+                album_message=album_message,
+                albums_list=data.message,
             )
-            await bot.send_message(
+        else:
+            await send_albums_for_discogs(
                 chat_id=call.message.chat.id,
-                text=messages.MENU_CANCEL_MESSAGE,
+                state=state,
+                albums_list=data.message,
             )
-            # Встаем в состояние albums_list для дальнейшего пролистывания албомов
-            await state.set_state(FSMNewMusicDiscogs.albums_list)
-            await state.update_data(albums_list=data.message)
-        else:
-            await state.clear()
-            await bot.send_message(chat_id=call.message.chat.id, text=str(data.error))
-            await call.message.answer(
-                text=messages.START_BOT_MESSAGE,
-                reply_markup=get_button_start_bot_menu,
+    elif album_message:
+        # Обход прервался, но часть альбомов уже показана - оставляем их
+        try:
+            await progress_message.edit_text(text=messages.END_RESPONSE_MESSAGE)
+        except Exception as err:
+            music_logger.error_logger.exception(
+                f"Не удалось обновить сообщение о прогрессе: {err}"
             )
+    else:
+        await state.clear()
+        await bot.send_message(
+            chat_id=call.message.chat.id,
+            text=str(data.error if data else messages.SERVER_ERROR),
+        )
+        await call.message.answer(
+            text=messages.START_BOT_MESSAGE,
+            reply_markup=get_button_start_bot_menu,
+        )
 
 
 @router.callback_query(FSMNewMusicDiscogs.albums_list, F.data.startswith("discogs"))
-async def leafing_through_albums(call: CallbackQuery, state: FSMContext):
+async def leafing_through_albums(
+    call: CallbackQuery, state: FSMContext, session: aiohttp.ClientSession
+):
     """Листает альбомы назад и вперед."""
+    discogs_setting = models_settings.music_models.new_music.discogs
     data: Dict = await state.get_data()
 
     # Получаем данные об альбоме
     _, button, count = call.data.split(" ")
     albums_list: List = data["albums_list"]
+
+    # Загружаем подробности альбома если они еще не загружены
+    if albums_list[int(count)].TRACKLIST is None:
+        albums_list[int(count)] = await get_album_details_for_discogs(
+            album=albums_list[int(count)],
+            discogs_setting=discogs_setting,
+            session=session,
+            logging_data=music_logger,
+            rate_limiter=discogs_rate_limiter,
+            cache=discogs_cache,
+            single_flight=discogs_single_flight,
+            release_map=discogs_release_map,
+        )
+    # Заранее загружаем подробности альбомов в направлении пролистывания
+    prefetch_album_details_for_discogs(
+        albums_list=albums_list,
+        start=int(count) + 1
+        if button == "forward"
+        else max(0, int(count) - discogs_setting.PREFETCH_ALBUMS),
+        discogs_setting=discogs_setting,
+        session=session,
+        logging_data=music_logger,
+        rate_limiter=discogs_rate_limiter,
+        cache=discogs_cache,
+        single_flight=discogs_single_flight,
+        release_map=discogs_release_map,
+    )
+    await state.update_data(albums_list=albums_list, albums_count=int(count))
     album: Dict = albums_list[int(count)].dict()
     img: str = album["IMG"]
 
@@ -353,3 +642,131 @@ async def leafing_through_albums(call: CallbackQuery, state: FSMContext):
             count=int(count), list_albums=albums_list, prefix="discogs"
         ),
     )
+
+
+async def resume_album_crawl_for_discogs(
+    session: aiohttp.ClientSession,
+    key: str,
+    job_state: Dict,
+    chats: List,
+) -> None:
+    """
+    Продолжает прерванный обход discogs и отправляет результат ожидающим чатам.
+
+    Args:
+        session (aiohttp.ClientSession): сессия запроса
+        key (str): Ключ обхода
+        job_state (Dict): Сохраненный курсор обхода
+        chats (List): Список [chat_id, user_id] ожидающих чатов
+    """
+    discogs_setting = models_settings.music_models.new_music.discogs
+    params: Dict = job_state.get("params", {})
+
+    data: Optional[ResponseData] = None
+    if params:
+        for chat_id, _ in chats:
+            try:
+                await bot.send_message(
+                    chat_id=chat_id, text=messages.RESUME_RESPONSE_MESSAGE
+                )
+            except Exception as err:
+                music_logger.error_logger.exception(
+                    f"Не удалось уведомить чат {chat_id} о продолжении обхода {key}: {err}"
+                )
+
+        # Оборочиваем функцию в декоратор для отлова всех возможных ошибок
+        func = safe_async_execution(logging_data=music_logger)(crawl_albums_for_discogs)
+        flight: Flight = discogs_single_flight.subscribe(
+            key=get_flight_key_for_discogs(
+                style=params["style"],
+                year=params["year"],
+                per_page=discogs_setting.COUNT_ALBUMS_SEARCH,
+            ),
+            factory=lambda flight: func(
+                params["style"],
+                params["year"],
+                flight.update_progress,
+                discogs_setting,
+                session,
+                music_logger,
+                discogs_rate_limiter,
+                discogs_cache,
+                discogs_snapshots,
+                flight.add_item,
+                discogs_release_map,
+                discogs_jobs,
+            ),
+        )
+        data = await discogs_single_flight.wait(flight)
+        discogs_single_flight.unsubscribe(flight)
+
+    for chat_id, user_id in chats:
+        await discogs_jobs.remove_chat(key=key, chat_id=chat_id)
+        state: FSMContext = FSMContext(
+            storage=dp.storage,
+            key=StorageKey(bot_id=bot.id, chat_id=chat_id, user_id=user_id),
+        )
+        # Пользователь уже начал новый запрос - не мешаем ему
+        if await state.get_state() is not None:
+            continue
+
+        try:
+            if data and isinstance(data.message, list) and data.message:
+                await bot.send_message(
+                    chat_id=chat_id, text=messages.END_RESPONSE_MESSAGE
+                )
+                await send_albums_for_discogs(
+                    chat_id=chat_id,
+                    state=state,
+                    albums_list=data.message,
+                )
+            else:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=str(
+                        data.error
+                        if data and data.error
+                        else messages.TRY_REPSONSE_MESSAGE
+                    ),
+                    reply_markup=ReplyKeyboardRemove(),
+                )
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=messages.START_BOT_MESSAGE,
+                    reply_markup=get_button_start_bot_menu,
+                )
+        except Exception as err:
+            music_logger.error_logger.exception(
+                f"Не удалось отправить результат обхода {key} в чат {chat_id}: {err}"
+            )
+
+
+async def resume_album_crawls_for_discogs(session: aiohttp.ClientSession) -> None:
+    """
+    Продолжает обходы discogs, прерванные перезапуском бота.
+
+    Args:
+        session (aiohttp.ClientSession): сессия запроса
+    """
+    pending: List = await discogs_jobs.pending(
+        max_age=models_settings.music_models.new_music.discogs.JOB_MAX_AGE,
+    )
+    # Ошибка одного обхода не должна прерывать остальные
+    results: List = await asyncio.gather(
+        *[
+            resume_album_crawl_for_discogs(
+                session=session,
+                key=key,
+                job_state=job_state,
+                chats=chats,
+            )
+            for key, job_state, chats in pending
+        ],
+        return_exceptions=True,
+    )
+    for (key, _, _), result in zip(pending, results):
+        if isinstance(result, Exception):
+            music_logger.error_logger.error(
+                f"Не удалось продолжить обход discogs {key}: {result!r}",
+                exc_info=result,
+            )
@@ -4,9 +4,18 @@ from bot.views.video.viewing_advice.kinopoisk import (
 )
 from bot.extension import video_logger
 from bot.middleware.errors import RouterErrorMiddleware
+from bot.middleware.session import ServiceSessionMiddleware
 
 video_viewing_advice_router.include_router(video_viewing_advice_kinopoisk_router)
 
+# Хендлеры кинопоиска получают сессию с пулом соединений кинопоиска
+video_viewing_advice_kinopoisk_router.message.middleware(
+    ServiceSessionMiddleware("kinopoisk_session")
+)
+video_viewing_advice_kinopoisk_router.callback_query.middleware(
+    ServiceSessionMiddleware("kinopoisk_session")
+)
+
 video_viewing_advice_router.message.middleware(
     RouterErrorMiddleware(logger=video_logger.error_logger)
 )
@@ -1,4 +1,5 @@
 from typing import Dict, List, Optional
+import asyncio
 from random import shuffle
 
 from aiogram import Router, F
@@ -9,27 +10,43 @@ from aiogram.types import (
     FSInputFile,
     InputMediaPhoto,
 )
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters.state import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import aiohttp
 
 
-from bot.extension import models_settings, get_button_start_bot_menu, bot, video_logger
+from bot.extension import (
+    models_settings,
+    get_button_start_bot_menu,
+    bot,
+    video_logger,
+    kinopoisk_search_cache,
+    kinopoisk_pool_cache,
+    kinopoisk_catalog,
+    kinopoisk_key_pool,
+)
 from bot.functions.video.viewing_advice import (
-    get_recommender_video_for_kinopoisk,
+    get_video_by_name_for_kinopoisk,
+    get_recommender_video_by_ratings_for_kinopoisk,
     get_description_video_from_kinopoisk,
+    get_next_page_video_for_kinopoisk,
 )
+from bot.functions.video.ranking import rank_candidates
 from core.response import ResponseData
 from app_utils.keyboards import get_reply_cancel_button, get_button_for_forward_or_back
 from settings.response import messages
-from error_handlers.network import error_handler_for_the_website
 from error_handlers.decorator import safe_async_execution
 
 router: Router = Router(
     name=models_settings.video_models.viewing_advice.kinopoisk.SERVICE_ID,
 )
 
+# Фоновые догрузки рекомендаций и чаты, для которых они сейчас идут
+background_tasks: set = set()
+loading_chats: set = set()
+
 
 class FSMVideoKinopoisk(StatesGroup):
     spam: State = State()
@@ -116,18 +133,21 @@ async def get_data_recominder(
     )
 
     headers: Dict = models_settings.video_models.viewing_advice.kinopoisk.HEADERS
-    headers["X-API-KEY"] = models_settings.video_models.viewing_advice.kinopoisk.API_KEY
 
-    video_name: ResponseData = await error_handler_for_the_website(
+    video_name: ResponseData = await get_video_by_name_for_kinopoisk(
         session=session,
-        url=models_settings.video_models.viewing_advice.kinopoisk.URL_SEARCH_VIDEO_NAME.format(
-            limit=10,
-            name=message.text,
-        ),
-        logging_data=video_logger,
-        function_name=get_data_recominder.__name__,
+        url_search_video_name=models_settings.video_models.viewing_advice.kinopoisk.URL_SEARCH_VIDEO_NAME,
+        name=message.text,
         headers=headers,
-        timeout=30,
+        logging_data=video_logger,
+        search_cache=kinopoisk_search_cache,
+        limit=10,
+        catalog=kinopoisk_catalog,
+        key_pool=kinopoisk_key_pool,
+        retry=models_settings.video_models.viewing_advice.kinopoisk.RETRY,
+        schema=models_settings.video_models.viewing_advice.kinopoisk.DECODE_SCHEMAS.get(
+            "movies"
+        ),
     )
     if video_name.message:
         # Проверка на наличие фильмов по запросу для рекомендации
@@ -141,77 +161,55 @@ async def get_data_recominder(
         else:
             json_kinopoisk: Dict = result[0]
 
-            # Получаем url с лимитом видео для поиска
-            url: str = models_settings.video_models.viewing_advice.kinopoisk.URL_SEARCH_UNIVERSAL_VIDEO.format(
-                limit=250
+            # Шаблон url для поиска, страницы выборки запрашиваются одновременно
+            url: str = (
+                models_settings.video_models.viewing_advice.kinopoisk.URL_SEARCH_UNIVERSAL_VIDEO
             )
 
+            kinopoisk_setting = models_settings.video_models.viewing_advice.kinopoisk
             decorator_function = safe_async_execution(logging_data=video_logger)
-            func = decorator_function(get_recommender_video_for_kinopoisk)
+            func = decorator_function(get_recommender_video_by_ratings_for_kinopoisk)
 
-            # Делает первый запрос с рейтингом 1-5
+            # Запрашиваем все диапазоны рейтинга одновременно. Диапазоны, не
+            # успевшие за RECOMMENDER_DEADLINE, в рекомендацию не попадают.
+            # В cursors записываются курсоры для догрузки следующих страниц
+            cursors: List[Dict] = []
             recommender_video_list_1: ResponseData = await func(
                 session,
                 url,
                 json_kinopoisk.get("genres"),
-                25,
+                kinopoisk_setting.RECOMMENDER_LIMIT,
                 json_kinopoisk.get("type"),
-                "6-10",
+                kinopoisk_setting.RATING_BANDS,
                 headers,
                 video_logger,
-                30,
+                kinopoisk_setting.RECOMMENDER_TIMEOUT,
+                kinopoisk_setting.RECOMMENDER_DEADLINE,
+                kinopoisk_setting.RECOMMENDER_POOL_SIZE,
+                kinopoisk_setting.RECOMMENDER_PAGE_SIZE,
+                kinopoisk_setting.RECOMMENDER_PAGE_DEADLINE,
+                kinopoisk_pool_cache,
+                kinopoisk_setting.SELECT_FIELDS.get("recommender"),
+                kinopoisk_setting.NOT_NULL_FIELDS.get("recommender"),
+                kinopoisk_catalog,
+                kinopoisk_setting.CATALOG_MIN_MOVIES,
+                kinopoisk_setting.CATALOG_MAX_AGE,
+                json_kinopoisk if kinopoisk_setting.RANKING_ENABLED else None,
+                kinopoisk_setting.RANKING_WEIGHTS,
+                kinopoisk_setting.RANKING_DIVERSITY,
+                cursors,
+                kinopoisk_key_pool,
+                kinopoisk_setting.RETRY,
+                kinopoisk_setting.DECODE_SCHEMAS.get("movies"),
             )
 
-            # Если произошел TIMEOUT_ERROR пробуем делать запрос с  меньшей выборкой
-            error = recommender_video_list_1.error
-            if error == messages.TIMEOUT_ERROR:
-                url: str = models_settings.video_models.viewing_advice.kinopoisk.URL_SEARCH_UNIVERSAL_VIDEO.format(
-                    limit=10
-                )
-
-                decorator_function = safe_async_execution(logging_data=video_logger)
-                func = decorator_function(get_recommender_video_for_kinopoisk)
-
-                recommender_video_list_1: ResponseData = await func(
-                    session,
-                    url,
-                    json_kinopoisk.get("genres"),
-                    25,
-                    json_kinopoisk.get("type"),
-                    "6-10",
-                    headers,
-                    video_logger,
-                    30,
-                )
-
             if recommender_video_list_1.message:
-                decorator_function = safe_async_execution(logging_data=video_logger)
-                func = decorator_function(get_recommender_video_for_kinopoisk)
-
-                # Делает второй запрос с рейтингом 6-10
-                recommender_video_list_2: ResponseData = await func(
-                    session,
-                    url,
-                    json_kinopoisk.get("genres"),
-                    25,
-                    json_kinopoisk.get("type"),
-                    "1-5",
-                    headers,
-                    video_logger,
-                    30,
-                )
                 # Состваляет общий рекомендательный список
-                recommender_video_list: List = []
+                recommender_video_list: List = list(recommender_video_list_1.message)
 
-                # Если второй запрос выдал ошибку составляем рекомендацию по первому запросу
-                if recommender_video_list_2.error:
-                    pass
-                else:
-                    recommender_video_list.extend(recommender_video_list_2.message)
-                recommender_video_list.extend(recommender_video_list_1.message)
-
-                # Перемешивает список
-                shuffle(recommender_video_list)
+                # Перемешивает список, если он не отсортирован по похожести
+                if not kinopoisk_setting.RANKING_ENABLED:
+                    shuffle(recommender_video_list)
 
                 # Получаем описание видео
                 description_video: ResponseData = get_description_video_from_kinopoisk(
@@ -226,7 +224,7 @@ async def get_data_recominder(
                     photo = recommender_video_list[0]["poster"].get("url", 0)
 
                 if photo:
-                    await bot.send_photo(
+                    sent_message: Message = await bot.send_photo(
                         chat_id=message.chat.id,
                         photo=photo,
                         caption=description_video.message,
@@ -239,7 +237,7 @@ async def get_data_recominder(
                     )
                 else:
 
-                    await bot.send_photo(
+                    sent_message = await bot.send_photo(
                         chat_id=message.chat.id,
                         photo=FSInputFile(
                             path=models_settings.video_models.viewing_advice.kinopoisk.PATH_TO_FILENAME_DEFOLTE_IMAGE_KINOPOISK,
@@ -259,7 +257,15 @@ async def get_data_recominder(
                     reply_markup=get_reply_cancel_button(),
                 )
                 await state.set_state(FSMVideoKinopoisk.recommender_list)
-                await state.update_data(recommender_list=recommender_video_list)
+                await state.update_data(
+                    recommender_list=recommender_video_list,
+                    recommender_cursors=cursors,
+                    recommender_seed=(
+                        json_kinopoisk if kinopoisk_setting.RANKING_ENABLED else None
+                    ),
+                    recommender_message_id=sent_message.message_id,
+                    recommender_count=0,
+                )
             else:
                 await state.set_state(FSMVideoKinopoisk.description)
                 await message.answer(
@@ -281,16 +287,37 @@ async def get_data_recominder(
 async def scrolls_through_the_list_of_recommendations(
     call: CallbackQuery,
     state: FSMContext,
+    session: aiohttp.ClientSession,
 ) -> None:
     """
     Работа с FSM RecomenderSystemFSM.
 
-    Пролистывает видео по результатам кинопоиска.
+    Пролистывает видео по результатам кинопоиска. Когда до конца списка остается
+    RECOMMENDER_PREFETCH_AT фильмов, в фоне догружается следующая страница.
     """
     _, _, count = call.data.split(" ")
+    await state.update_data(recommender_count=int(count))
     data: Dict = await state.get_data()
     recommender_list = data["recommender_list"]
 
+    kinopoisk_setting = models_settings.video_models.viewing_advice.kinopoisk
+    if (
+        len(recommender_list) - int(count) <= kinopoisk_setting.RECOMMENDER_PREFETCH_AT
+        and data.get("recommender_cursors")
+        and call.message.chat.id not in loading_chats
+    ):
+        loading_chats.add(call.message.chat.id)
+        task: asyncio.Task = asyncio.create_task(
+            load_next_recommendations_for_kinopoisk(
+                session=session,
+                state=state,
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+            )
+        )
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
     description: ResponseData = get_description_video_from_kinopoisk(
         data=recommender_list[int(count)],
     )
@@ -347,3 +374,94 @@ async def scrolls_through_the_list_of_recommendations(
                 count=int(count),
             ),
         )
+
+
+async def load_next_recommendations_for_kinopoisk(
+    session: aiohttp.ClientSession,
+    state: FSMContext,
+    chat_id: int,
+    message_id: int,
+) -> None:
+    """
+    Догружает следующую страницу выборки и добавляет ее в конец списка рекомендаций.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для запроса
+        state (FSMContext): Состояние пользователя со списком рекомендаций
+        chat_id (int): id чата
+        message_id (int): id сообщения со списком рекомендаций
+    """
+    try:
+        kinopoisk_setting = models_settings.video_models.viewing_advice.kinopoisk
+        data: Dict = await state.get_data()
+        cursors: List[Dict] = data.get("recommender_cursors") or []
+
+        headers: Dict = kinopoisk_setting.HEADERS
+
+        next_page: ResponseData = await get_next_page_video_for_kinopoisk(
+            session=session,
+            url_search_universal_video=kinopoisk_setting.URL_SEARCH_UNIVERSAL_VIDEO,
+            cursors=cursors,
+            headers=headers,
+            logging_data=video_logger,
+            timeout=kinopoisk_setting.RECOMMENDER_TIMEOUT,
+            page_size=kinopoisk_setting.RECOMMENDER_PAGE_SIZE,
+            exclude_ids={movie.get("id") for movie in data["recommender_list"]},
+            catalog=kinopoisk_catalog,
+            key_pool=kinopoisk_key_pool,
+            retry=kinopoisk_setting.RETRY,
+            schema=kinopoisk_setting.DECODE_SCHEMAS.get("movies"),
+        )
+        movies: List[Dict] = next_page.message or []
+        if next_page.error:
+            video_logger.warning_logger.warning(
+                f"Не удалось догрузить рекомендации: {next_page.error}"
+            )
+        seed: Optional[Dict] = data.get("recommender_seed")
+        if movies and seed is not None:
+            movies = rank_candidates(
+                seed=seed,
+                candidates=movies,
+                limit=len(movies),
+                weights=kinopoisk_setting.RANKING_WEIGHTS,
+                diversity=kinopoisk_setting.RANKING_DIVERSITY,
+            )
+
+        # Пока шла загрузка пользователь мог выйти из списка или начать новый
+        data = await state.get_data()
+        if (
+            await state.get_state() != FSMVideoKinopoisk.recommender_list.state
+            or data.get("recommender_message_id") != message_id
+        ):
+            return
+
+        recommender_list: List = data["recommender_list"] + movies
+        await state.update_data(
+            recommender_list=recommender_list,
+            recommender_cursors=cursors,
+        )
+        if not movies:
+            return
+
+        # Обновляем кнопки текущего фильма - у последнего появится "Вперед"
+        try:
+            await bot.edit_message_reply_markup(
+                chat_id=chat_id,
+                message_id=message_id,
+                reply_markup=get_button_for_forward_or_back(
+                    prefix="kinopoisk",
+                    list_albums=recommender_list,
+                    count=data.get("recommender_count", 0),
+                ),
+            )
+        except TelegramBadRequest as err:
+            # Кнопки не изменились - это не ошибка
+            if "message is not modified" not in str(err):
+                raise
+    except Exception as err:
+        # Задача фоновая - ошибка иначе потеряется
+        video_logger.error_logger.exception(
+            f"Ошибка догрузки рекомендаций в чате {chat_id}: {err}"
+        )
+    finally:
+        loading_chats.discard(chat_id)
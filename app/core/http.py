@@ -0,0 +1,43 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class HttpClientSettings(BaseModel):
+    """
+    Настройки пула соединений и таймаутов HTTP-клиента одного сервиса.
+
+    limit - всего одновременных соединений клиента, limit_per_host - к одному
+    хосту(0 - без ограничения). Открытые соединения переиспользуются
+    keepalive_timeout секунд. Адреса хостов кэшируются на ttl_dns_cache секунд.
+    Таймауты по умолчанию применяются к запросам, в которые таймаут не передан:
+    connect_timeout - на получение соединения, read_timeout - между частями
+    ответа, total_timeout - на весь запрос.
+    """
+
+    limit: int = 100
+    limit_per_host: int = 0
+    keepalive_timeout: float = 15.0
+    use_dns_cache: bool = True
+    ttl_dns_cache: Optional[int] = 300
+    # Пауза в секундах перед попыткой подключения по следующему адресу хоста
+    # (IPv4/IPv6). None - адреса перебираются по очереди
+    happy_eyeballs_delay: Optional[float] = 0.25
+    connect_timeout: Optional[float] = 10.0
+    read_timeout: Optional[float] = 30.0
+    total_timeout: Optional[float] = 60.0
+
+
+class HttpCachePolicy(BaseModel):
+    """
+    Правило кэширования ответов GET-запросов, URL которых подходит под pattern.
+
+    Ответ младше fresh_ttl секунд отдается без запроса к сайту. Более старый
+    ответ, но младше max_age секунд, проверяется условным запросом
+    (If-None-Match / If-Modified-Since) - при ответе 304 отдается
+    сохраненное тело. Ответы старше max_age запрашиваются заново.
+    """
+
+    pattern: str  # регулярное выражение для URL
+    fresh_ttl: int = 0
+    max_age: int = 24 * 60 * 60
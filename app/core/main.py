@@ -1,7 +1,10 @@
+from typing import List
 from pathlib import Path
 
 from pydantic import BaseModel
 
+from core.http import HttpClientSettings, HttpCachePolicy
+
 
 class AppSettings(BaseModel):
     """Общие настроцки для всего приложения."""
@@ -17,3 +20,46 @@ class AppSettings(BaseModel):
         "[%(asctime)s] - %(module)s:%(lineno)s - [%(levelname)s - %(message)s]"
     )
     DATE_FORMAT: str = "%Y-%m-%D %H-%M-%S"
+
+    # HTTP-клиент для запросов без отдельного клиента сервиса
+    HTTP_CLIENT: HttpClientSettings = HttpClientSettings()
+
+    # Автоматический выключатель запросов для каждого хоста. Если среди
+    # последних запросов к хосту доля ошибок сети, ответов 5xx и ответов дольше
+    # SLOW_CALL_SECONDS достигает FAILURE_RATE, запросы к нему OPEN_SECONDS
+    # секунд сразу завершаются ошибкой, затем пропускаются пробные запросы
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_MIN_CALLS: int = 5
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_WINDOW_SECONDS: int = 60
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: int = 30
+    CIRCUIT_BREAKER_OPEN_SECONDS: int = 30
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 1
+
+    # Кэш ответов GET-запросов с проверкой актуальности по ETag и
+    # Last-Modified. Кэшируются только URL из HTTP_CACHE_POLICIES
+    HTTP_CACHE_ENABLED: bool = True
+    PATH_TO_FILENAME_HTTP_CACHE: Path = (
+        ROOT_DIR / "bot" / "static" / "cache" / "http" / "responses.sqlite3"
+    )
+    HTTP_CACHE_MAX_SIZE_MB: int = 100
+    # Документы release и master discogs сюда не входят - их хранит кэш
+    # документов discogs
+    HTTP_CACHE_POLICIES: List[HttpCachePolicy] = [
+        HttpCachePolicy(
+            pattern=r"^https://api\.discogs\.com/database/search",
+            fresh_ttl=60 * 60,
+            max_age=7 * 24 * 60 * 60,
+        ),
+        HttpCachePolicy(
+            pattern=r"^https://api\.kinopoisk\.dev/v1\.4/movie/search",
+            fresh_ttl=60 * 60,
+            max_age=7 * 24 * 60 * 60,
+        ),
+        HttpCachePolicy(
+            pattern=r"^https://api\.kinopoisk\.dev/v1\.4/movie\?",
+            fresh_ttl=10 * 60,
+            max_age=24 * 60 * 60,
+        ),
+    ]
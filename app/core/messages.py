@@ -19,6 +19,8 @@ class DefaultMessages(BaseModel):
     UNKNOWN_STATUS_ERROR: str = "🚫 Сайт вернул неожиданный ответ."
     SERVER_ERROR: str = "⚙️ Внутренняя ошибка сервера."
     TIMEOUT_ERROR: str = "⌛ Сервер не ответил вовремя."
+    SERVICE_UNAVAILABLE_ERROR: str = "🔌 Сайт временно недоступен. Попробуйте позже."
+    API_QUOTA_ERROR: str = "📉 Дневной лимит запросов к сайту исчерпан. Попробуйте завтра."
 
     # Сообщения при обработках запроса пользователя
     TRY_REPSONSE_MESSAGE: str = "👣 Попробуйте, снова, сделать запрос..."
@@ -27,6 +29,10 @@ class DefaultMessages(BaseModel):
         " от {start} секунд до {end} минут. Пожалуйста, наберитесь терпения"
     )
     WAIT_MESSAGE: str = "⏳ Идет обработка запроса..."
+    RESUME_RESPONSE_MESSAGE: str = (
+        "🔄 Бот был перезапущен. Продолжаем обработку вашего запроса..."
+    )
+    NOT_FOUND_ALBUMS_MESSAGE: str = "🔎 По вашему запросу альбомы не найдены"
     WAIT_AND_CANCEL_MESSAGE: str = (
         "⏳ Идет обработка запроса...Дождитесь" " обработки или нажмите Отмена"
     )
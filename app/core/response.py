@@ -1,4 +1,4 @@
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 from dataclasses import dataclass
 from logging import Logger
 
@@ -13,6 +13,7 @@ class ResponseData(BaseModel):
     url: Optional[str] = None
     status: Optional[int] = None
     method: Optional[str] = None
+    headers: Optional[Dict] = None
 
 
 @dataclass
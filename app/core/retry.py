@@ -0,0 +1,69 @@
+from typing import List, Optional
+import random
+
+from pydantic import BaseModel
+
+
+class RetryPolicy(BaseModel):
+    """
+    Политика повторов запроса при временных ошибках сайта.
+
+    Пауза перед повтором растет экспоненциально(base_delay * 2 ** попытка, не
+    больше max_delay) со случайным разбросом, чтобы одновременные запросы не
+    повторялись разом. Заголовок Retry-After задает минимальную паузу. Сумма
+    пауз всех повторов не превышает budget секунд.
+    """
+
+    attempts: int = 3  # общее количество попыток, включая первую
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    budget: float = 60.0
+    # HTTP-коды ответа, при которых запрос повторяется. Ошибки сети и таймауты
+    # повторяются всегда
+    statuses: List[int] = [429, 500, 502, 503, 504]
+    # Методы, повтор которых безопасен. Остальные повторяются только если
+    # retry_non_idempotent включен
+    idempotent_methods: List[str] = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+    retry_non_idempotent: bool = False
+
+    def allows(self, method: str) -> bool:
+        """
+        Проверяет можно ли повторять запрос этим методом.
+
+        Args:
+            method (str): HTTP-метод запроса
+
+        Returns:
+            bool: True если повтор разрешен
+        """
+        return self.retry_non_idempotent or method.upper() in self.idempotent_methods
+
+    def get_delay(
+        self,
+        attempt: int,
+        spent: float,
+        retry_after: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Возвращает паузу перед следующей попыткой.
+
+        Args:
+            attempt (int): Номер завершившейся попытки, начиная с 1
+            spent (float): Сумма пауз предыдущих повторов в секундах
+            retry_after (Optional[float], optional): Пауза из заголовка
+            Retry-After в секундах. По умолчанию None
+
+        Returns:
+            Optional[float]: Пауза в секундах или None, если попытки или
+            бюджет повторов исчерпаны
+        """
+        if attempt >= self.attempts:
+            return None
+
+        ceiling: float = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay: float = ceiling / 2 + random.uniform(0, ceiling / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if spent + delay > self.budget:
+            return None
+        return delay
@@ -1,11 +1,19 @@
-from typing import Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import asyncio
+import time
 
 import aiohttp
 
 from error_handlers.format import format_errors_message
 from core.response import ResponseData, LoggingData
-from settings.response import messages
+from core.retry import RetryPolicy
+from settings.response import messages, circuit_breakers, http_cache
+from app_utils.circuit_breaker import CircuitBreaker
+from app_utils.cache import CachedResponse
+from app_utils.decoding import loads, project
+from core.http import HttpCachePolicy
 
 
 async def safe_read_response(resp):
@@ -27,28 +35,380 @@ async def safe_read_response(resp):
         return "<no body>"
 
 
+def get_header(headers: Optional[Dict], name: str) -> Optional[str]:
+    """
+    Возвращает значение заголовка без учета регистра имени.
+
+    Args:
+        headers (Optional[Dict]): Заголовки ответа
+        name (str): Имя заголовка
+
+    Returns:
+        Optional[str]: Значение заголовка или None, если его нет
+    """
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def get_retry_after(headers: Optional[Dict]) -> Optional[float]:
+    """
+    Возвращает паузу из заголовка Retry-After в секундах.
+
+    Args:
+        headers (Optional[Dict]): Заголовки ответа
+
+    Returns:
+        Optional[float]: Пауза в секундах или None, если заголовка нет или он
+        в неизвестном формате
+    """
+    value: Optional[str] = get_header(headers, "Retry-After")
+    if value is None:
+        return None
+
+    # Retry-After задается числом секунд или HTTP-датой
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_site_unavailable(response: ResponseData) -> bool:
+    """
+    Проверяет, что запрос не выполнен из-за сайта: ошибка сети, таймаут,
+    открытый выключатель или ответ 5xx.
+
+    Args:
+        response (ResponseData): Ответ запроса
+
+    Returns:
+        bool: True, если сайт недоступен
+    """
+    if (response.status or 0) >= 500:
+        return True
+    return response.status == 0 and response.error in (
+        messages.NETWORK_ERROR,
+        messages.TIMEOUT_ERROR,
+        messages.SERVICE_UNAVAILABLE_ERROR,
+    )
+
+
+def decode_body(body: bytes, data_type: str = "JSON") -> Any:
+    """
+    Возвращает тело ответа в формате data_type.
+
+    Args:
+        body (bytes): Тело ответа
+        data_type (str, optional): Тип данных('JSON', 'TEXT', 'BYTES').
+        По умолчанию JSON
+
+    Returns:
+        Any: Тело ответа
+
+    Raises:
+        ValueError: Тело ответа не в формате data_type
+    """
+    if data_type.upper() == "JSON":
+        return loads(body)
+    elif data_type.upper() == "TEXT":
+        return body.decode("utf-8")
+    return body
+
+
 async def error_handler_for_the_website(
     session: aiohttp.ClientSession,
     url: str,
     logging_data: LoggingData,
     data_type="JSON",
-    timeout=15,
+    timeout=None,
     method="GET",
     data=None,
     headers=None,
     function_name=None,
     json=None,
     params=None,
+    retry: Optional[RetryPolicy] = None,
+    schema: Optional[Dict] = None,
+    before_attempt: Optional[Callable[[], Awaitable[Any]]] = None,
 ) -> ResponseData:
     """
-    Асинхронный запрос с обработками ошибок для сайтов.
+    Асинхронный запрос с обработками ошибок, повторами и кэшем ответов для сайтов.
+
+    Если URL GET-запроса подходит под правило http_cache, ответ берется из
+    кэша без запроса к сайту, пока он свежий. Устаревший ответ проверяется
+    условным запросом(If-None-Match / If-Modified-Since) и при ответе 304
+    отдается из кэша со статусом 200. Если сайт недоступен(см.
+    is_site_unavailable), отдается сохраненный ответ не старше max_age правила.
+    Аргументы кроме schema такие же как у
+    request_with_retry - before_attempt вызывается только для запросов к
+    сайту, ответ из кэша его не расходует.
+
+    Args:
+        schema (Optional[Dict], optional): Схема полей json ответа(см.
+        app_utils.decoding.project) - остальные поля отбрасываются сразу после
+        разбора. По умолчанию None - ответ целиком
+
+    Returns:
+        ResponseData: Ответ сайта или кэша
+    """
+    policy: Optional[HttpCachePolicy] = (
+        http_cache.get_policy(url) if method.upper() == "GET" else None
+    )
+    if policy is None:
+        response: ResponseData = await request_with_retry(
+            session=session,
+            url=url,
+            logging_data=logging_data,
+            data_type=data_type,
+            timeout=timeout,
+            method=method,
+            data=data,
+            headers=headers,
+            function_name=function_name,
+            json=json,
+            params=params,
+            retry=retry,
+            before_attempt=before_attempt,
+        )
+        if schema is not None and not response.error:
+            response.message = project(response.message, schema)
+        return response
+
+    key: str = http_cache.get_key(url=url, params=params)
+    cached: Optional[CachedResponse] = await http_cache.get(key, policy.max_age)
+    if cached is not None and time.time() - cached.stored_at < policy.fresh_ttl:
+        http_cache.hits += 1
+        # Запрос не выполнялся - заголовков ответа нет
+        return ResponseData(
+            message=project(decode_body(cached.body, data_type), schema),
+            status=200,
+            url=url,
+            method=method,
+        )
+
+    # Тело запрашивается байтами, чтобы сохранить его в кэш как есть
+    response = await request_with_retry(
+        session=session,
+        url=url,
+        logging_data=logging_data,
+        data_type="BYTES",
+        timeout=timeout,
+        method=method,
+        data=data,
+        headers={**(headers or {}), **cached.validators} if cached else headers,
+        function_name=function_name,
+        json=json,
+        params=params,
+        retry=retry,
+        before_attempt=before_attempt,
+    )
+    etag: Optional[str] = get_header(response.headers, "ETag")
+    last_modified: Optional[str] = get_header(response.headers, "Last-Modified")
+
+    # Ответ из кэша отдается со статусом 200, ответ сайта - со своим статусом
+    status: int = 200
+    if response.status == 304 and cached is not None:
+        http_cache.revalidated += 1
+        await http_cache.refresh(key, etag, last_modified)
+        body: bytes = cached.body
+    elif response.status in (200, 202) and not response.error:
+        # Успешные ответы, как и в request_to_the_website
+        http_cache.misses += 1
+        body = response.message
+        status = response.status
+        cache_control: str = (
+            get_header(response.headers, "Cache-Control") or ""
+        ).lower()
+        # Без валидаторов и времени свежести сохраненный ответ не пригодится.
+        # 202 - запрос принят, но еще не выполнен, его тело не сохраняется
+        if (
+            response.status == 200
+            and "no-store" not in cache_control
+            and (etag or last_modified or policy.fresh_ttl)
+        ):
+            await http_cache.set(key, body, etag, last_modified)
+    elif cached is not None and is_site_unavailable(response):
+        http_cache.stale_hits += 1
+        logging_data.warning_logger.warning(
+            f"Сайт недоступен({response.error}), ответ {method} {url} "
+            "отдан из кэша устаревшим"
+        )
+        body = cached.body
+    else:
+        return response
+
+    try:
+        message: Any = project(decode_body(body, data_type), schema)
+    except ValueError as err:
+        logging_data.error_logger.error(
+            msg=format_errors_message(
+                name_router=logging_data.router_name,
+                method=method,
+                status=response.status,
+                url=url,
+                error_text=f"Ответ не в формате {data_type}: {err}",
+                function_name=function_name,
+            )
+        )
+        return ResponseData(
+            error=messages.UNKNOWN_STATUS_ERROR,
+            status=response.status,
+            url=url,
+            method=method,
+            headers=response.headers,
+        )
+
+    return ResponseData(
+        message=message,
+        status=status,
+        url=url,
+        method=method,
+        headers=response.headers,
+    )
+
+
+async def request_with_retry(
+    session: aiohttp.ClientSession,
+    url: str,
+    logging_data: LoggingData,
+    data_type="JSON",
+    timeout=None,
+    method="GET",
+    data=None,
+    headers=None,
+    function_name=None,
+    json=None,
+    params=None,
+    retry: Optional[RetryPolicy] = None,
+    before_attempt: Optional[Callable[[], Awaitable[Any]]] = None,
+) -> ResponseData:
+    """
+    Асинхронный запрос с обработками ошибок и повторами для сайтов.
+
+    Если передан retry, запрос повторяется при ошибках сети, таймаутах и
+    HTTP-кодах из retry.statuses с паузами по политике повторов. Аргументы
+    кроме retry и before_attempt такие же как у request_to_the_website.
+
+    Args:
+        retry (Optional[RetryPolicy], optional): Политика повторов. По умолчанию
+        None - одна попытка
+        before_attempt (Optional[Callable[[], Awaitable[Any]]], optional):
+        Вызывается перед каждой попыткой, например, чтобы взять токен
+        ограничителя запросов или ключ API. Если возвращает словарь - он
+        добавляется к заголовкам попытки, если ResponseData - запрос не
+        выполняется и возвращается этот ответ. По умолчанию None
+
+    Returns:
+        ResponseData: Ответ последней попытки request_to_the_website
+    """
+    breaker: Optional[CircuitBreaker] = circuit_breakers.get(url)
+    attempt: int = 1
+    spent: float = 0.0
+    while True:
+        # Хост недавно не отвечал - не ждем таймаут, а сразу возвращаем ошибку
+        if breaker is not None and not breaker.allow():
+            logging_data.warning_logger.warning(
+                f"Запрос {method} {url} отклонен: выключатель {breaker.stats}"
+            )
+            return ResponseData(
+                error=messages.SERVICE_UNAVAILABLE_ERROR,
+                status=0,
+                url=url,
+                method=method,
+            )
+
+        response: Optional[ResponseData] = None
+        try:
+            # Каждая попытка, в том числе повтор, - отдельный запрос к сайту
+            extra: Any = await before_attempt() if before_attempt else None
+            if isinstance(extra, ResponseData):
+                return extra
+            started_at: float = time.monotonic()
+            response = await request_to_the_website(
+                session=session,
+                url=url,
+                logging_data=logging_data,
+                data_type=data_type,
+                timeout=timeout,
+                method=method,
+                data=data,
+                headers={**(headers or {}), **extra} if extra else headers,
+                function_name=function_name,
+                json=json,
+                params=params,
+            )
+        finally:
+            # Запрос не выполнен(отмена, ошибка или отказ before_attempt) -
+            # освобождаем место пробного запроса, иначе выключатель останется
+            # полуоткрытым без свободных проб
+            if response is None and breaker is not None:
+                breaker.release()
+
+        network_error: bool = response.status == 0 and response.error in (
+            messages.NETWORK_ERROR,
+            messages.TIMEOUT_ERROR,
+        )
+        if breaker is not None:
+            breaker.record(
+                failed=network_error or (response.status or 0) >= 500,
+                duration=time.monotonic() - started_at,
+            )
+
+        if retry is None or not retry.allows(method):
+            return response
+
+        if not (network_error or response.status in retry.statuses):
+            return response
+
+        delay: Optional[float] = retry.get_delay(
+            attempt=attempt,
+            spent=spent,
+            retry_after=get_retry_after(response.headers),
+        )
+        if delay is None:
+            return response
+
+        logging_data.warning_logger.warning(
+            f"Повтор запроса {method} {url} через {delay:.1f} с "
+            f"(попытка {attempt + 1} из {retry.attempts}, статус {response.status})"
+        )
+        await asyncio.sleep(delay)
+        spent += delay
+        attempt += 1
+
+
+async def request_to_the_website(
+    session: aiohttp.ClientSession,
+    url: str,
+    logging_data: LoggingData,
+    data_type="JSON",
+    timeout=None,
+    method="GET",
+    data=None,
+    headers=None,
+    function_name=None,
+    json=None,
+    params=None,
+) -> ResponseData:
+    """
+    Асинхронный запрос с обработками ошибок для сайтов - одна попытка.
 
     Args:
         session (_type_): асинхронная сессия запроса
         url (str): URL сайта
         logging_data: (LoggingData): Класс содержащий логгер и имя роутера для логгирования
         data_type (str, optional): Тип возвращаемых данных.По умолчанию JSON('JSON', 'TEXT', 'BYTES')
-        timeout (int, optional): таймаут запроса в секундах
+        timeout (Optional[float], optional): таймаут всего запроса в секундах.
+        По умолчанию None - таймауты сессии
         method (str, optional): Метод запроса. 'POST' или "GET"
         data (_type_, optional): Данные для POST запроса
         headers (dict): Заголовки запроса
@@ -63,8 +423,20 @@ async def error_handler_for_the_website(
             - status (int): HTTP-код ответа. 0 — если ошибка возникла на клиентской стороне.
             - url (str): URL, по которому выполнялся запрос.
             - method (str): HTTP-метод, использованный при запросе.
+            - headers (Dict | None): Заголовки ответа, если сервер ответил.
     """
-    timeout_cfg: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=timeout)
+    # Таймауты подключения и чтения берутся из сессии, переданный таймаут
+    # ограничивает только весь запрос
+    timeout_cfg: aiohttp.ClientTimeout = (
+        session.timeout
+        if timeout is None
+        else aiohttp.ClientTimeout(
+            total=timeout,
+            connect=session.timeout.connect,
+            sock_connect=session.timeout.sock_connect,
+            sock_read=session.timeout.sock_read,
+        )
+    )
     try:
         async with session.request(
             method=method,
@@ -76,6 +448,19 @@ async def error_handler_for_the_website(
             allow_redirects=True,
             params=params,
         ) as resp:
+            # Ответ на условный запрос - сохраненное тело не изменилось. 304 на
+            # обычный запрос обрабатывается как неизвестный статус
+            if resp.status == 304 and (
+                get_header(headers, "If-None-Match")
+                or get_header(headers, "If-Modified-Since")
+            ):
+                return ResponseData(
+                    status=resp.status,
+                    url=url,
+                    method=resp.method,
+                    headers=dict(resp.headers),
+                )
+
             # Для удобного логгирования
             if resp.status in [403, 404, 429]:
 
@@ -114,6 +499,7 @@ async def error_handler_for_the_website(
                     error=error_message_str,
                     url=url,
                     method=resp.method,
+                    headers=dict(resp.headers),
                 )
 
             elif resp.status != 200 and resp.status != 202:
@@ -137,14 +523,16 @@ async def error_handler_for_the_website(
                     error=messages.UNKNOWN_STATUS_ERROR,
                     url=url,
                     method=resp.method,
+                    headers=dict(resp.headers),
                 )
             if data_type.upper() == "JSON":
-                message_body = await resp.json()
+                message_body = await resp.json(loads=loads)
                 return ResponseData(
                     message=message_body,
                     status=resp.status,
                     url=url,
                     method=resp.method,
+                    headers=dict(resp.headers),
                 )
             elif data_type.upper() == "TEXT":
                 message_body: str = await resp.text()
@@ -153,6 +541,7 @@ async def error_handler_for_the_website(
                     status=resp.status,
                     url=url,
                     method=resp.method,
+                    headers=dict(resp.headers),
                 )
             else:
                 message_body: bytes = await resp.read()
@@ -161,9 +550,12 @@ async def error_handler_for_the_website(
                     status=resp.status,
                     url=url,
                     method=resp.method,
+                    headers=dict(resp.headers),
                 )
-    except aiohttp.ClientError as err:
-        error_message: str = f"Ошибка сети при запросе:\n{err}"
+    # Таймауты подключения и чтения(ServerTimeoutError) тоже ClientError,
+    # поэтому проверяются первыми
+    except asyncio.TimeoutError as err:
+        error_message: str = f"Ожидание от сервера истекло:\n{err}"
 
         logging_data.error_logger.exception(
             msg=format_errors_message(
@@ -177,13 +569,13 @@ async def error_handler_for_the_website(
         )
 
         return ResponseData(
-            error=messages.NETWORK_ERROR,
+            error=messages.TIMEOUT_ERROR,
             status=0,
             url=url,
             method=method,
         )
-    except asyncio.TimeoutError as err:
-        error_message: str = f"Ожидание от сервера истекло:\n{err}"
+    except aiohttp.ClientError as err:
+        error_message: str = f"Ошибка сети при запросе:\n{err}"
 
         logging_data.error_logger.exception(
             msg=format_errors_message(
@@ -197,7 +589,7 @@ async def error_handler_for_the_website(
         )
 
         return ResponseData(
-            error=messages.TIMEOUT_ERROR,
+            error=messages.NETWORK_ERROR,
             status=0,
             url=url,
             method=method,
@@ -1,6 +1,8 @@
 from core.messages import DefaultMessages
 from core.main import AppSettings
 from app_utils.logging import setup_bot_logging
+from app_utils.circuit_breaker import CircuitBreakerRegistry
+from app_utils.cache import HttpCache
 
 # Настройки всего приложения
 app_settings: AppSettings = AppSettings()
@@ -16,3 +18,24 @@ root_info_logger, root_warning_logger, root_error_logger = setup_bot_logging(
     date_format=app_settings.DATE_FORMAT,
     log_format=app_settings.LOG_FORMAT,
 )
+
+# Автоматические выключатели запросов для каждого хоста
+circuit_breakers: CircuitBreakerRegistry = CircuitBreakerRegistry(
+    enabled=app_settings.CIRCUIT_BREAKER_ENABLED,
+    failure_rate=app_settings.CIRCUIT_BREAKER_FAILURE_RATE,
+    min_calls=app_settings.CIRCUIT_BREAKER_MIN_CALLS,
+    window_size=app_settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+    window_seconds=app_settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+    slow_call_seconds=app_settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+    open_seconds=app_settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+    half_open_calls=app_settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+    logger=root_warning_logger,
+)
+
+# Кэш ответов GET-запросов с условными запросами(ETag / Last-Modified)
+http_cache: HttpCache = HttpCache(
+    path=app_settings.PATH_TO_FILENAME_HTTP_CACHE,
+    policies=app_settings.HTTP_CACHE_POLICIES,
+    max_size_bytes=app_settings.HTTP_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    enabled=app_settings.HTTP_CACHE_ENABLED,
+)